@@ -48,6 +48,12 @@ MAX_CONNECTIONS_PER_IP = int(
 MAX_FIELD_LENGTH = int(
     os.getenv("MAX_FIELD_LENGTH", "1024")
 )  # Caracteres máximos por campo
+INGEST_MAX_CONCURRENCY = int(
+    os.getenv("INGEST_MAX_CONCURRENCY", "200")
+)  # Conexiones de ingesta atendidas a la vez
+TLS_HANDSHAKE_TIMEOUT = float(
+    os.getenv("TLS_HANDSHAKE_TIMEOUT", "10")
+)  # Segundos máximos para completar el handshake TLS
 
 # Puertos de red
 SERVER_PORT = int(os.getenv("SERVER_PORT", "5255"))  # Puerto TCP del servidor
@@ -58,22 +64,76 @@ BROADCAST_INTERVAL = int(
 
 # Rutas de archivos
 DB_PATH = os.getenv("DB_PATH", "data/specs.db")  # Ruta de base de datos SQLite
+DB_WRITER_BATCH_SIZE = int(
+    os.getenv("DB_WRITER_BATCH_SIZE", "200")
+)  # Operaciones máximas por transacción del escritor de DB
+DB_WRITER_BATCH_MS = float(
+    os.getenv("DB_WRITER_BATCH_MS", "50")
+)  # Ventana (ms) para agrupar escrituras en una misma transacción
 OUTPUT_DIR = os.getenv("OUTPUT_DIR", "output")  # Directorio de salida
 
 # Configuración de escaneo
 SCAN_SUBNET_START = os.getenv("SCAN_SUBNET_START", "10.100.0.0")
 SCAN_SUBNET_END = os.getenv("SCAN_SUBNET_END", "10.119.0.0")
 PING_TIMEOUT = float(os.getenv("PING_TIMEOUT", "1.0"))
+LIVENESS_TTL = float(os.getenv("LIVENESS_TTL", "15.0"))
 SCAN_PER_HOST_TIMEOUT = float(os.getenv("SCAN_PER_HOST_TIMEOUT", "0.8"))
 SCAN_PER_SUBNET_TIMEOUT = float(os.getenv("SCAN_PER_SUBNET_TIMEOUT", "8.0"))
 SCAN_PROBE_TIMEOUT = float(os.getenv("SCAN_PROBE_TIMEOUT", "0.9"))
+SCAN_PROBE = os.getenv("SCAN_PROBE", "icmp")  # "icmp" o "tcp:5256,445,135"
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "1"))  # 0 = un proceso por núcleo
+SCAN_SHARD_MIN_HOSTS = int(
+    os.getenv("SCAN_SHARD_MIN_HOSTS", "4096")
+)  # Hosts mínimos para repartir el sweep entre procesos
+SCAN_CHECKPOINT_INTERVAL = float(
+    os.getenv("SCAN_CHECKPOINT_INTERVAL", "10")
+)  # Segundos entre guardados del avance del escaneo (--resume)
+SCAN_HOSTS_BATCH = int(
+    os.getenv("SCAN_HOSTS_BATCH", "256")
+)  # Hosts por UPSERT en la tabla `hosts` durante el escaneo
 PING_BATCH_SIZE = int(os.getenv("PING_BATCH_SIZE", "20"))
+SPECS_FETCH_CONCURRENCY = int(os.getenv("SPECS_FETCH_CONCURRENCY", "10"))
+
+# Concurrencia adaptativa (AIMD) del escáner y de los pings de la consulta:
+# límites, incremento por ronda, salto de timeouts y lag del loop que recortan
+ADAPTIVE_CONCURRENCY_MIN = int(os.getenv("ADAPTIVE_CONCURRENCY_MIN", "10"))
+ADAPTIVE_CONCURRENCY_MAX = int(os.getenv("ADAPTIVE_CONCURRENCY_MAX", "1000"))
+ADAPTIVE_CONCURRENCY_STEP = int(os.getenv("ADAPTIVE_CONCURRENCY_STEP", "10"))
+ADAPTIVE_LOSS_SPIKE = float(
+    os.getenv("ADAPTIVE_LOSS_SPIKE", "0.2")
+)  # Aumento de la tasa de timeouts sobre la habitual
+ADAPTIVE_MAX_LOOP_LAG_MS = float(os.getenv("ADAPTIVE_MAX_LOOP_LAG_MS", "100"))
+
+# Latidos UDP de los daemons (vivacidad pasiva, sin ping)
+HEARTBEAT_PORT = int(os.getenv("HEARTBEAT_PORT", "5257"))
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "30"))  # segundos
+HEARTBEAT_MISSED_LIMIT = int(
+    os.getenv("HEARTBEAT_MISSED_LIMIT", "3")
+)  # Latidos perdidos antes de marcar inactivo
+
+# Sondeo de estado UDP de los daemons (mismo número que el puerto TCP)
+STATUS_PORT = int(os.getenv("STATUS_PORT", "5256"))
+STATUS_PROBE_TIMEOUT = float(
+    os.getenv("STATUS_PROBE_TIMEOUT", "0.5")
+)  # Segundos de espera por ronda
+STATUS_PROBE_RETRIES = int(
+    os.getenv("STATUS_PROBE_RETRIES", "2")
+)  # Rondas extra para los equipos que no respondieron
 
 # Configuración TLS/SSL
 USE_TLS = os.getenv("USE_TLS", "true").lower() in ("true", "1", "yes")
 TLS_CERT_PATH = os.getenv("TLS_CERT_PATH", "config/server.crt")
 TLS_KEY_PATH = os.getenv("TLS_KEY_PATH", "config/server.key")
 
+# Protocolo de mensajes (cabecera con longitud; false = JSON crudo legacy)
+FRAMED_PROTOCOL = os.getenv("FRAMED_PROTOCOL", "true").lower() in ("true", "1", "yes")
+# Compresiones del payload por preferencia ("none" = desactivada); el servidor
+# las anuncia en GET_SPECS y el cliente elige la primera que también soporte
+PAYLOAD_COMPRESSION = os.getenv("PAYLOAD_COMPRESSION", "zstd,zlib")
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))  # zlib 1-9, zstd 1-22
+# Horas máximas que el daemon responde "not modified" sin una recolección completa
+SPECS_MAX_AGE_HOURS = float(os.getenv("SPECS_MAX_AGE_HOURS", "168"))
+
 
 def generate_auth_token(secret: str | None = None) -> str:
     """Genera token de autenticación usando HMAC-SHA256.
@@ -20,3 +20,325 @@ def run_async(async_func, *args, **kwargs):
         return loop.run_until_complete(async_func(*args, **kwargs))
     finally:
         loop.close()
+
+
+async def ventana_deslizante(elementos, trabajo, limite, al_completar=None):
+    """Ejecuta `trabajo(elemento)` manteniendo exactamente `limite` en vuelo.
+
+    A diferencia de partir la lista en lotes y esperar cada lote con `gather`
+    (donde un elemento lento de 30 s frena a todo su lote), aquí `limite`
+    workers toman el siguiente elemento en cuanto terminan el anterior, así
+    que el tiempo total tiende a (trabajo total / limite).
+
+    Args:
+        elementos: Iterable o iterable asíncrono (se consume de forma perezosa,
+            sin materializar la lista completa)
+        trabajo: Corrutina `async def trabajo(elemento)`
+        limite: Máximo de trabajos simultáneos, o un `ControlAIMD` que lo
+            ajusta mientras corre (el trabajo informa cada resultado con
+            `control.registrar(exito)`)
+        al_completar: Callback opcional `(elemento, resultado)` llamado apenas
+            termina cada trabajo (resultado es la excepción si falló)
+
+    Si se cancela, los workers dejan de tomar elementos y los trabajos que
+    terminan después no se informan: un trabajo que convierte la cancelación
+    en un resultado (p. ej. un timeout que devuelve None) no debe quedar
+    registrado como "completado sin respuesta".
+
+    Returns:
+        int: Cantidad de elementos procesados
+    """
+    es_asincrono = hasattr(elementos, "__aiter__")
+    iterador = elementos.__aiter__() if es_asincrono else iter(elementos)
+    candado = asyncio.Lock()  # Un generador async no admite __anext__ concurrente
+    agotado = object()
+    procesados = 0
+    detenido = False  # Cancelado: ningún resultado más se informa
+
+    # Con ControlAIMD se lanzan `maximo` workers, pero solo `control.limite`
+    # pueden tener un trabajo en vuelo; el resto espera su turno en `cupo`
+    control = limite if isinstance(limite, ControlAIMD) else None
+    workers = control.maximo if control else max(1, int(limite))
+    en_vuelo = 0
+    cupo = asyncio.Condition()
+    propio = control is not None and not control.activo
+    if propio:
+        control.iniciar()
+
+    async def tomar_cupo():
+        nonlocal en_vuelo
+        async with cupo:
+            await cupo.wait_for(lambda: en_vuelo < control.limite)
+            en_vuelo += 1
+
+    async def liberar_cupo():
+        nonlocal en_vuelo
+        async with cupo:
+            en_vuelo -= 1
+            cupo.notify(max(1, control.limite - en_vuelo))
+
+    async def siguiente():
+        if not es_asincrono:
+            return next(iterador, agotado)
+        async with candado:
+            try:
+                return await iterador.__anext__()
+            except StopAsyncIteration:
+                return agotado
+
+    async def worker():
+        nonlocal procesados
+        while not detenido:
+            if control:
+                await tomar_cupo()
+            try:
+                elemento = await siguiente()
+                if elemento is agotado or detenido:
+                    return
+                try:
+                    resultado = await trabajo(elemento)
+                except Exception as e:
+                    resultado = e
+                if detenido:
+                    return  # Terminó por la cancelación: el resultado no vale
+                procesados += 1
+                if al_completar:
+                    al_completar(elemento, resultado)
+            finally:
+                if control:
+                    await liberar_cupo()
+
+    # `wait` (no `gather`) para marcar `detenido` ANTES de cancelar los workers:
+    # `gather` los cancela primero y alguno podría seguir informando resultados
+    tareas = [asyncio.ensure_future(worker()) for _ in range(workers)]
+    try:
+        await asyncio.wait(tareas, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        detenido = True
+        for tarea in tareas:
+            tarea.cancel()
+        resultados = await asyncio.gather(*tareas, return_exceptions=True)
+        if propio:
+            await control.detener()
+    for resultado in resultados:
+        if isinstance(resultado, Exception):
+            raise resultado
+    return procesados
+
+
+async def iterar_cola(cola, fin):
+    """Iterador asíncrono sobre `cola` hasta recibir el centinela `fin`.
+
+    Permite encadenar etapas con `ventana_deslizante`: una etapa produce en la
+    cola y la siguiente la consume con su propio límite de concurrencia.
+    """
+    while True:
+        elemento = await cola.get()
+        if elemento is fin:
+            await cola.put(fin)  # Dejar el centinela para otros consumidores
+            return
+        yield elemento
+
+
+class MedidorLatenciaLoop:
+    """Mide el retraso (lag) del event loop mientras corre una consulta.
+
+    Una tarea duerme `intervalo` segundos en bucle y registra cuánto tarde
+    despierta respecto de lo pedido: si alguna corrutina bloquea el loop (por
+    ejemplo, una escritura sqlite síncrona), ese retraso aparece aquí y todos
+    los pings y lecturas de socket en vuelo lo sufren.
+
+    Uso (dentro de una corrutina):
+        medidor = MedidorLatenciaLoop()
+        medidor.iniciar()
+        ...
+        print(await medidor.detener())
+    """
+
+    def __init__(self, intervalo: float = 0.01):
+        self.intervalo = intervalo
+        self.muestras = []
+        self._tarea = None
+
+    def iniciar(self):
+        """Comienza a medir en el event loop actual."""
+        self.muestras = []
+        self._tarea = asyncio.get_running_loop().create_task(self._medir())
+
+    async def detener(self) -> dict:
+        """Deja de medir y devuelve el resumen (ver `resumen`)."""
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        return self.resumen()
+
+    def resumen(self) -> dict:
+        """{muestras, p50_ms, p95_ms, max_ms} del retraso medido."""
+        if not self.muestras:
+            return {"muestras": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordenadas = sorted(self.muestras)
+
+        def percentil(p):
+            return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+        return {
+            "muestras": len(ordenadas),
+            "p50_ms": round(percentil(0.50) * 1000, 2),
+            "p95_ms": round(percentil(0.95) * 1000, 2),
+            "max_ms": round(ordenadas[-1] * 1000, 2),
+        }
+
+    async def _medir(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            inicio = loop.time()
+            await asyncio.sleep(self.intervalo)
+            self.muestras.append(max(0.0, loop.time() - inicio - self.intervalo))
+
+
+class ControlAIMD:
+    """Límite de concurrencia adaptativo (additive increase, multiplicative decrease).
+
+    Como el control de congestión de TCP: cada ronda (tantos resultados como
+    el límite actual) se compara la tasa de timeouts con la tasa habitual. Si
+    no se dispara, el límite sube `paso`; si se dispara en más de
+    `salto_perdida`, o el event loop se retrasó más de `lag_max_ms` (CPU o
+    sockets del servidor saturados), el límite se multiplica por `factor`.
+    Siempre dentro de [minimo, maximo].
+
+    La tasa habitual es un promedio móvil: en un barrido de una red casi vacía
+    los timeouts son lo normal y no frenan el escaneo, solo un salto brusco.
+
+    Uso:
+        control = ControlAIMD(inicial=50)
+        async def trabajo(ip):
+            ok = await ping(ip)
+            control.registrar(ok)
+        await ventana_deslizante(ips, trabajo, control)
+        print(control.resumen())
+    """
+
+    def __init__(
+        self,
+        inicial=None,
+        minimo=None,
+        maximo=None,
+        paso=None,
+        factor: float = 0.5,
+        salto_perdida=None,
+        lag_max_ms=None,
+    ):
+        try:
+            from config.security_config import (
+                ADAPTIVE_CONCURRENCY_MAX,
+                ADAPTIVE_CONCURRENCY_MIN,
+                ADAPTIVE_CONCURRENCY_STEP,
+                ADAPTIVE_LOSS_SPIKE,
+                ADAPTIVE_MAX_LOOP_LAG_MS,
+            )
+        except ImportError:
+            ADAPTIVE_CONCURRENCY_MIN = 10
+            ADAPTIVE_CONCURRENCY_MAX = 1000
+            ADAPTIVE_CONCURRENCY_STEP = 10
+            ADAPTIVE_LOSS_SPIKE = 0.2
+            ADAPTIVE_MAX_LOOP_LAG_MS = 100.0
+
+        self.minimo = max(1, int(minimo or ADAPTIVE_CONCURRENCY_MIN))
+        self.maximo = max(self.minimo, int(maximo or ADAPTIVE_CONCURRENCY_MAX))
+        self.paso = max(1, int(paso or ADAPTIVE_CONCURRENCY_STEP))
+        self.factor = factor
+        self.salto_perdida = (
+            ADAPTIVE_LOSS_SPIKE if salto_perdida is None else salto_perdida
+        )
+        self.lag_max = (lag_max_ms or ADAPTIVE_MAX_LOOP_LAG_MS) / 1000
+        self.limite = self._acotar(inicial or self.minimo)
+
+        self._exitos = 0
+        self._fallos = 0
+        self._tasa_habitual = None
+        self._lag_ronda = 0.0
+        self._tarea = None
+
+        self.estadisticas = {
+            "rondas": 0,
+            "aumentos": 0,
+            "recortes": 0,
+            "recortes_por_lag": 0,
+            "pico": self.limite,
+        }
+
+    @property
+    def activo(self) -> bool:
+        """True mientras mide el lag del loop (entre iniciar y detener)."""
+        return self._tarea is not None
+
+    def registrar(self, exito: bool):
+        """Informa un resultado: `exito` False = timeout o pérdida."""
+        if exito:
+            self._exitos += 1
+        else:
+            self._fallos += 1
+        if self._exitos + self._fallos >= self.limite:
+            self._ajustar()
+
+    def iniciar(self):
+        """Comienza a medir el lag del event loop actual."""
+        self._tarea = asyncio.get_running_loop().create_task(self._vigilar())
+
+    async def detener(self):
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    def resumen(self) -> str:
+        """Texto con el límite final y los ajustes, para los logs."""
+        e = self.estadisticas
+        return (
+            f"concurrencia adaptativa: límite {self.limite} "
+            f"(rango {self.minimo}-{self.maximo}, pico {e['pico']}), "
+            f"{e['aumentos']} aumentos, {e['recortes']} recortes "
+            f"({e['recortes_por_lag']} por lag del loop)"
+        )
+
+    def _acotar(self, valor) -> int:
+        return max(self.minimo, min(self.maximo, int(valor)))
+
+    def _ajustar(self):
+        """Cierra una ronda: sube o recorta el límite."""
+        tasa = self._fallos / (self._exitos + self._fallos)
+        habitual = tasa if self._tasa_habitual is None else self._tasa_habitual
+        self.estadisticas["rondas"] += 1
+
+        if self._lag_ronda > self.lag_max:
+            self.limite = self._acotar(self.limite * self.factor)
+            self.estadisticas["recortes"] += 1
+            self.estadisticas["recortes_por_lag"] += 1
+        elif tasa > habitual + self.salto_perdida:
+            self.limite = self._acotar(self.limite * self.factor)
+            self.estadisticas["recortes"] += 1
+        else:
+            self.limite = self._acotar(self.limite + self.paso)
+            self.estadisticas["aumentos"] += 1
+        self.estadisticas["pico"] = max(self.estadisticas["pico"], self.limite)
+
+        self._tasa_habitual = 0.8 * habitual + 0.2 * tasa
+        self._exitos = self._fallos = 0
+        self._lag_ronda = 0.0
+
+    async def _vigilar(self, intervalo: float = 0.05):
+        """Guarda el mayor retraso del loop visto en la ronda actual."""
+        loop = asyncio.get_running_loop()
+        while True:
+            inicio = loop.time()
+            await asyncio.sleep(intervalo)
+            lag = loop.time() - inicio - intervalo
+            if lag > self._lag_ronda:
+                self._lag_ronda = lag
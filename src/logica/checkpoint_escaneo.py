@@ -0,0 +1,164 @@
+"""Checkpoints en disco para reanudar escaneos largos.
+
+Un escaneo interrumpido (UI cerrada, caída, reinicio) volvía a empezar de cero
+y el CSV solo se escribía al final. Durante el sweep se guarda periódicamente
+el avance en un JSON (por defecto `output/scan_checkpoint.json`):
+
+    {"version": 1, "huella": ..., "completados": [[inicio, fin], ...],
+     "activos": [...], "puertos": {ip: {puerto: estado}}, "fecha": ...}
+
+- `completados` son los hosts ya barridos como intervalos enteros: un /12 a
+  medio barrer ocupa unos pocos intervalos, no un millón de IPs.
+- `huella` resume los rangos y la sonda: un checkpoint solo se reanuda con la
+  misma configuración (otro rango empieza de cero y lo reemplaza).
+
+Con `--resume` el escáner carga el checkpoint, suma sus activos y barre solo
+los hosts que faltan; `main()` lo borra una vez escrito el CSV.
+"""
+
+from datetime import datetime
+from hashlib import sha256
+from json import dump, dumps, load
+from os import replace
+from pathlib import Path
+from time import time
+from typing import Dict, Iterable, Optional
+
+from logica.scan_rangos_ip import ConjuntoIPs, ip_a_entero
+from logica.sondeo_tcp import parsear_sonda
+
+VERSION = 1
+
+
+def calcular_huella(rangos: ConjuntoIPs, probe: Optional[str]) -> str:
+    """Huella de la configuración del escaneo (intervalos exactos y sonda)."""
+    tipo, puertos = parsear_sonda(probe)
+    canonico = dumps(
+        {"rangos": rangos.intervalos, "sonda": [tipo, sorted(puertos)]},
+        sort_keys=True,
+    )
+    return sha256(canonico.encode("utf-8")).hexdigest()
+
+
+class CheckpointEscaneo:
+    """Avance de un escaneo: hosts barridos, activos y puertos (modo TCP).
+
+    Uso:
+        checkpoint = CheckpointEscaneo(ruta, calcular_huella(rangos, probe))
+        if reanudar and checkpoint.cargar():
+            pendientes = rangos.restar(checkpoint.completados)
+        ...
+        checkpoint.registrar(ip, activo)  # Guarda cada `intervalo` segundos
+        checkpoint.guardar()              # Al terminar o al interrumpirse
+    """
+
+    def __init__(self, ruta, huella: str, intervalo: Optional[float] = None):
+        try:
+            from config.security_config import SCAN_CHECKPOINT_INTERVAL
+        except ImportError:
+            SCAN_CHECKPOINT_INTERVAL = 10.0
+
+        self.ruta = Path(ruta)
+        self.huella = huella
+        self.intervalo = SCAN_CHECKPOINT_INTERVAL if intervalo is None else intervalo
+        self.completados = ConjuntoIPs()
+        self.activos = set()
+        self.puertos: Dict[str, Dict[int, str]] = {}
+        self.fecha = None  # Timestamp del checkpoint cargado
+        self._ultimo_guardado = time()
+
+    def cargar(self) -> bool:
+        """Carga el checkpoint del disco si corresponde a esta configuración.
+
+        Returns:
+            bool: True si se cargó; False si no existe, no se puede leer o es
+                de otro escaneo
+        """
+        datos = leer_checkpoint(self.ruta)
+        if not datos or datos.get("huella") != self.huella:
+            return False
+        self.completados = ConjuntoIPs(tuple(par) for par in datos["completados"])
+        self.activos = set(datos.get("activos", []))
+        self.puertos = {
+            ip: {int(puerto): estado for puerto, estado in estados.items()}
+            for ip, estados in datos.get("puertos", {}).items()
+        }
+        self.fecha = datos.get("fecha")
+        return True
+
+    def registrar(self, ip: str, activo: bool, estados: Optional[dict] = None):
+        """Marca `ip` como barrida (firma de `al_completar` más los puertos)."""
+        self.completados.agregar(ip_a_entero(ip))
+        if activo:
+            self.activos.add(ip)
+        if estados:
+            self.puertos[ip] = estados
+        self._guardar_si_corresponde()
+
+    def registrar_activo(self, ip: str):
+        """Suma `ip` a los activos sin darla por barrida (respondió a SSDP/mDNS).
+
+        Sigue pendiente para el sweep: en modo TCP interesan sus puertos.
+        """
+        self.activos.add(ip)
+        self._guardar_si_corresponde()
+
+    def registrar_lote(
+        self,
+        enteros: Iterable[int],
+        activos: Iterable[str],
+        puertos: Optional[dict] = None,
+    ):
+        """Como `registrar`, para los avances de los procesos del sweep."""
+        for valor in enteros:
+            self.completados.agregar(valor)
+        self.activos.update(activos)
+        if puertos:
+            self.puertos.update(puertos)
+        self._guardar_si_corresponde()
+
+    def guardar(self):
+        """Escribe el checkpoint (archivo temporal + reemplazo atómico)."""
+        datos = {
+            "version": VERSION,
+            "huella": self.huella,
+            "completados": self.completados.intervalos,
+            "activos": sorted(self.activos),
+            "puertos": self.puertos,
+            "fecha": datetime.now().timestamp(),
+        }
+        temporal = self.ruta.with_suffix(".tmp")
+        try:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporal, "w", encoding="utf-8") as f:
+                dump(datos, f)
+            replace(temporal, self.ruta)
+        except OSError as e:
+            print(f"[WARN] No se pudo guardar el checkpoint del escaneo: {e}")
+        self._ultimo_guardado = time()
+
+    def _guardar_si_corresponde(self):
+        if time() - self._ultimo_guardado >= self.intervalo:
+            self.guardar()
+
+
+def leer_checkpoint(ruta) -> Optional[dict]:
+    """Devuelve el contenido del checkpoint, o None si no existe o no es válido."""
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(datos, dict) or datos.get("version") != VERSION:
+        return None
+    return datos
+
+
+def borrar_checkpoint(ruta):
+    """Elimina el checkpoint (escaneo terminado y CSV escrito)."""
+    try:
+        Path(ruta).unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"[WARN] No se pudo borrar el checkpoint del escaneo: {e}")
@@ -0,0 +1,202 @@
+"""Descubrimiento SSDP/mDNS asíncrono para el escáner.
+
+Reemplaza los bucles `select()` síncronos (un segmento por vez, bloqueando un
+hilo del executor durante todo el timeout y mDNS solo si SSDP no encontraba
+nada). Aquí:
+
+- Un socket SSDP y uno mDNS, compartidos por todos los segmentos: el M-SEARCH
+  va al grupo multicast y al broadcast dirigido de cada segmento a la vez, y
+  la consulta mDNS al grupo 224.0.0.251.
+- Las respuestas llegan por `DatagramProtocol` y `descubrir()` las entrega
+  como flujo asíncrono `(ip, protocolo)` a medida que llegan, sin esperar al
+  timeout, para que el escáner las mezcle con los resultados del sweep.
+
+Para pruebas sin red real, `iniciar_respondedor()` levanta un equipo simulado
+en loopback y `descubrir(..., destinos_ssdp=[("127.0.0.1", puerto)])` lo usa
+en lugar de los grupos multicast.
+"""
+
+from asyncio import (
+    DatagramProtocol,
+    Queue,
+    TimeoutError,
+    get_running_loop,
+    wait_for,
+)
+from socket import (
+    AF_INET,
+    IP_MULTICAST_TTL,
+    IPPROTO_IP,
+    IPPROTO_UDP,
+    SO_BROADCAST,
+    SO_REUSEADDR,
+    SOCK_DGRAM,
+    SOL_SOCKET,
+    socket,
+)
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+SSDP_GRUPO = ("239.255.255.250", 1900)
+MDNS_GRUPO = ("224.0.0.251", 5353)
+
+SSDP_MSEARCH = "\r\n".join(
+    [
+        "M-SEARCH * HTTP/1.1",
+        "HOST:239.255.255.250:1900",
+        'MAN:"ssdp:discover"',
+        "MX:2",
+        "ST:ssdp:all",
+        "",
+        "",
+    ]
+).encode("utf-8")
+
+MDNS_SIMPLE = b"\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00"
+
+Destino = Tuple[str, int]
+
+
+class _ProtocoloDescubrimiento(DatagramProtocol):
+    """Encola la IP de origen de cada respuesta recibida."""
+
+    def __init__(self, cola: Queue, protocolo: str):
+        self.cola = cola
+        self.protocolo = protocolo
+
+    def datagram_received(self, datos, addr):
+        self.cola.put_nowait((addr[0], self.protocolo))
+
+    def error_received(self, exc):
+        pass  # ICMP de destinos inalcanzables: no son respuestas
+
+
+def _socket_udp(iface_ip: Optional[str], broadcast: bool) -> socket:
+    """Socket UDP no bloqueante con TTL multicast 1 (no sale del segmento)."""
+    sock = socket(AF_INET, SOCK_DGRAM, IPPROTO_UDP)
+    sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+    if broadcast:
+        sock.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+    try:
+        sock.setsockopt(IPPROTO_IP, IP_MULTICAST_TTL, 1)
+    except OSError:
+        pass
+    sock.bind((iface_ip or "0.0.0.0", 0))
+    sock.setblocking(False)
+    return sock
+
+
+def destinos_broadcast(redes: Iterable, puerto: int) -> List[Destino]:
+    """Broadcast dirigido de cada red (sin repetir; /31 y /32 no tienen)."""
+    destinos = {
+        (str(red.broadcast_address), puerto) for red in redes if red.prefixlen <= 30
+    }
+    return sorted(destinos)
+
+
+async def descubrir(
+    redes: Iterable,
+    timeout: float,
+    use_broadcast: bool = True,
+    iface_ip: Optional[str] = None,
+    destinos_ssdp: Optional[List[Destino]] = None,
+    destinos_mdns: Optional[List[Destino]] = None,
+) -> AsyncIterator[Tuple[str, str]]:
+    """Envía SSDP y mDNS a todos los segmentos a la vez y genera los que responden.
+
+    Args:
+        redes: Segmentos (ipaddress.IPv4Network) a los que enviar el broadcast
+            dirigido de SSDP
+        timeout: Segundos que se escuchan respuestas desde el envío
+        use_broadcast: Si False, solo multicast (sin broadcast dirigido)
+        iface_ip: IP local desde la que enviar (default: todas)
+        destinos_ssdp: Reemplaza los destinos SSDP (pruebas con respondedores
+            en loopback)
+        destinos_mdns: Reemplaza los destinos mDNS
+
+    Yields:
+        tuple: (ip, "ssdp" | "mdns"), cada IP una sola vez
+    """
+    loop = get_running_loop()
+    cola: Queue = Queue()
+
+    if destinos_ssdp is None:
+        destinos_ssdp = [SSDP_GRUPO]
+        if use_broadcast:
+            destinos_ssdp += destinos_broadcast(redes, SSDP_GRUPO[1])
+    if destinos_mdns is None:
+        destinos_mdns = [MDNS_GRUPO]
+
+    transportes = []
+    try:
+        for protocolo, mensaje, destinos in (
+            ("ssdp", SSDP_MSEARCH, destinos_ssdp),
+            ("mdns", MDNS_SIMPLE, destinos_mdns),
+        ):
+            if not destinos:
+                continue
+            transporte, _ = await loop.create_datagram_endpoint(
+                lambda p=protocolo: _ProtocoloDescubrimiento(cola, p),
+                sock=_socket_udp(iface_ip, use_broadcast),
+            )
+            transportes.append(transporte)
+            for destino in destinos:
+                transporte.sendto(mensaje, destino)
+
+        vistos = set()
+        limite = loop.time() + timeout
+        while True:
+            restante = limite - loop.time()
+            if restante <= 0:
+                break
+            try:
+                ip, protocolo = await wait_for(cola.get(), timeout=restante)
+            except TimeoutError:
+                break
+            if ip not in vistos:
+                vistos.add(ip)
+                yield ip, protocolo
+    finally:
+        for transporte in transportes:
+            transporte.close()
+
+
+# ------------------ RESPONDEDOR SIMULADO ------------------
+class RespondedorDescubrimiento(DatagramProtocol):
+    """Responde M-SEARCH y consultas mDNS como lo haría un equipo de la red.
+
+    Pensado para pruebas y laboratorio: escuchando en una IP de loopback
+    permite ejercitar `descubrir()` y el escáner sin dispositivos reales.
+    """
+
+    RESPUESTA_SSDP = b"HTTP/1.1 200 OK\r\nST: upnp:rootdevice\r\nEXT:\r\n\r\n"
+
+    def __init__(self):
+        self.transporte = None
+        self.consultas = 0
+
+    def connection_made(self, transport):
+        self.transporte = transport
+
+    def datagram_received(self, datos, addr):
+        if datos.startswith(b"M-SEARCH"):
+            respuesta = self.RESPUESTA_SSDP
+        elif len(datos) >= 12:
+            # Cabecera DNS con el mismo id y QR=1/AA=1, sin registros
+            respuesta = datos[:2] + b"\x84\x00" + b"\x00" * 8
+        else:
+            return
+        self.consultas += 1
+        self.transporte.sendto(respuesta, addr)
+
+
+async def iniciar_respondedor(host: str = "127.0.0.1", port: int = 0):
+    """Levanta un `RespondedorDescubrimiento` en `host:port` (0 = puerto libre).
+
+    Returns:
+        tuple: (transporte, respondedor, puerto); cerrar con transporte.close()
+    """
+    loop = get_running_loop()
+    transporte, respondedor = await loop.create_datagram_endpoint(
+        RespondedorDescubrimiento, local_addr=(host, port)
+    )
+    return transporte, respondedor, transporte.get_extra_info("sockname")[1]
@@ -0,0 +1,314 @@
+"""Servicio compartido de estado de conexión (liveness) de los dispositivos.
+
+La UI (timer de estados), el monitor periódico y la consulta de dispositivos
+hacían ping a los mismos hosts por separado y podían mostrar estados
+distintos. Este servicio es el único que sondea: mantiene en memoria
+`ip → EstadoConexion(activo, rtt_ms, ultimo_cambio, ultima_verificacion)` y
+sirve desde el cache las consultas repetidas dentro del TTL, de modo que la
+cantidad de pings no depende de cuántos consumidores haya.
+
+Los equipos cuyo daemon envía latidos UDP (`logica.latidos`) no se sondean:
+su estado sale del último latido recibido y pasan a inactivos después de
+HEARTBEAT_MISSED_LIMIT latidos perdidos, aunque su firewall bloquee ICMP.
+
+Uso:
+    from logica.estado_conexion import obtener_servicio_conexion
+
+    servicio = obtener_servicio_conexion()
+    estados = await servicio.consultar(ips)       # cache o ping (ping_many)
+    estado = servicio.obtener(ip)                 # solo cache, sin red
+    servicio.suscribir(callback)                  # callback(ip, anterior, nuevo)
+
+Es seguro usarlo desde varios hilos y event loops a la vez: si dos
+consumidores piden la misma IP expirada, solo uno hace el ping y el otro
+espera su resultado.
+"""
+
+from asyncio import CancelledError, wrap_future
+from concurrent.futures import Future
+from threading import Event, Lock, Thread
+from time import time
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+
+from logica.async_utils import run_async
+from logica.ping_utils import ping_many
+
+
+class EstadoConexion(NamedTuple):
+    """Último estado conocido de una IP (tiempos en segundos epoch)."""
+
+    activo: bool
+    rtt_ms: Optional[float]
+    ultimo_cambio: float
+    ultima_verificacion: float
+
+
+class ServicioEstadoConexion:
+    """Tabla de estados con TTL, sondeo periódico y suscripción a cambios."""
+
+    def __init__(self, ttl: Optional[float] = None, timeout: Optional[float] = None):
+        try:
+            from config.security_config import (
+                HEARTBEAT_INTERVAL,
+                HEARTBEAT_MISSED_LIMIT,
+                LIVENESS_TTL,
+                PING_TIMEOUT,
+            )
+        except ImportError:
+            LIVENESS_TTL = 15.0
+            PING_TIMEOUT = 1.0
+            HEARTBEAT_INTERVAL = 30.0
+            HEARTBEAT_MISSED_LIMIT = 3
+
+        self.ttl = ttl if ttl is not None else LIVENESS_TTL
+        self.timeout = timeout or PING_TIMEOUT
+        # Sin latido durante K intervalos => inactivo
+        self.vencimiento_latido = HEARTBEAT_INTERVAL * HEARTBEAT_MISSED_LIMIT
+
+        self._estados: Dict[str, EstadoConexion] = {}
+        self._latidos: Dict[str, tuple] = {}  # ip -> (recibido, datos del latido)
+        self._en_vuelo: Dict[str, Future] = {}
+        self._suscriptores = []
+        self._lock = Lock()
+
+        self._hilo: Optional[Thread] = None
+        self._detener = Event()
+
+        # Estadísticas: consultas servidas desde cache vs pings realizados
+        self.estadisticas = {
+            "consultas": 0,
+            "desde_cache": 0,
+            "pings": 0,
+            "por_latido": 0,
+        }
+
+    # ------------------ LECTURA ------------------
+    def obtener(self, ip: str) -> Optional[EstadoConexion]:
+        """Estado en cache de `ip` (aunque haya expirado), sin hacer ping."""
+        with self._lock:
+            return self._estados.get(ip)
+
+    def instantanea(self) -> Dict[str, EstadoConexion]:
+        """Copia de toda la tabla de estados."""
+        with self._lock:
+            return dict(self._estados)
+
+    async def consultar(
+        self,
+        ips: Iterable[str],
+        timeout: Optional[float] = None,
+        ttl: Optional[float] = None,
+    ) -> Dict[str, EstadoConexion]:
+        """Devuelve el estado de cada IP, haciendo ping solo a las expiradas.
+
+        Args:
+            ips: Direcciones a consultar
+            timeout: Segundos de espera por ping (default PING_TIMEOUT)
+            ttl: Antigüedad máxima aceptada del cache (default LIVENESS_TTL;
+                0 fuerza el ping)
+
+        Returns:
+            dict: {ip: EstadoConexion}
+        """
+        timeout = timeout or self.timeout
+        ttl = self.ttl if ttl is None else ttl
+        ahora = time()
+
+        resultado: Dict[str, EstadoConexion] = {}
+        ajenos: Dict[str, Future] = {}  # IPs que ya está sondeando otro consumidor
+        propios: Dict[str, Future] = {}
+
+        cambios = []
+        with self._lock:
+            for ip in dict.fromkeys(ips):
+                self.estadisticas["consultas"] += 1
+                estado = self._estados.get(ip)
+                if ip in self._latidos:
+                    # Estado pasivo: lo determina el último latido, sin ping
+                    self.estadisticas["por_latido"] += 1
+                    resultado[ip] = self._estado_por_latido(ip, ahora, cambios)
+                elif estado and ahora - estado.ultima_verificacion < ttl:
+                    self.estadisticas["desde_cache"] += 1
+                    resultado[ip] = estado
+                elif ip in self._en_vuelo:
+                    ajenos[ip] = self._en_vuelo[ip]
+                else:
+                    propios[ip] = self._en_vuelo[ip] = Future()
+            suscriptores = list(self._suscriptores)
+        self._notificar(cambios, suscriptores)
+
+        if propios:
+            try:
+                rtts = await ping_many(list(propios), timeout)
+            except Exception:
+                rtts = {}
+            except BaseException:
+                # Cancelado: liberar las IPs para que otro consumidor las sondee
+                with self._lock:
+                    for ip, futuro in propios.items():
+                        self._en_vuelo.pop(ip, None)
+                        futuro.cancel()
+                raise
+            resultado.update(self._registrar(rtts, propios))
+
+        for ip, futuro in ajenos.items():
+            try:
+                resultado[ip] = await wrap_future(futuro)
+            except CancelledError:
+                if not futuro.cancelled():
+                    raise
+                # Quien sondeaba fue cancelado: hacer el ping aquí
+                resultado[ip] = (await self.consultar([ip], timeout, 0))[ip]
+
+        return resultado
+
+    async def verificar(self, ip: str, timeout: Optional[float] = None) -> bool:
+        """True si `ip` está activa (desde cache si está vigente)."""
+        estados = await self.consultar([ip], timeout)
+        return estados[ip].activo
+
+    # ------------------ LATIDOS ------------------
+    def registrar_latido(self, ip: str, datos: Optional[dict] = None):
+        """Registra un latido recibido del daemon de `ip` (lo marca activo)."""
+        ahora = time()
+        cambios = []
+        with self._lock:
+            self._latidos[ip] = (ahora, datos or {})
+            self._estado_por_latido(ip, ahora, cambios)
+            suscriptores = list(self._suscriptores)
+        self._notificar(cambios, suscriptores)
+
+    def revisar_latidos(self) -> list:
+        """Marca inactivos los equipos que dejaron de enviar latidos.
+
+        Returns:
+            list: IPs que pasaron a inactivas en esta revisión
+        """
+        ahora = time()
+        cambios = []
+        with self._lock:
+            for ip in list(self._latidos):
+                self._estado_por_latido(ip, ahora, cambios)
+            suscriptores = list(self._suscriptores)
+        self._notificar(cambios, suscriptores)
+        return [ip for ip, _, nuevo in cambios if not nuevo.activo]
+
+    def ultimo_latido(self, ip: str) -> Optional[tuple]:
+        """(recibido, datos) del último latido de `ip`, o None si nunca envió."""
+        with self._lock:
+            return self._latidos.get(ip)
+
+    # ------------------ SUSCRIPCIÓN ------------------
+    def suscribir(self, callback: Callable):
+        """Registra `callback(ip, anterior, nuevo)` para cada cambio de estado.
+
+        `anterior` es None la primera vez que se ve la IP. El callback corre en
+        el hilo que hizo el ping: la UI debe reenviarlo con una señal Qt.
+        """
+        with self._lock:
+            if callback not in self._suscriptores:
+                self._suscriptores.append(callback)
+
+    def desuscribir(self, callback: Callable):
+        with self._lock:
+            if callback in self._suscriptores:
+                self._suscriptores.remove(callback)
+
+    # ------------------ SONDEO PERIÓDICO ------------------
+    def iniciar_sondeo(self, obtener_ips: Callable[[], Iterable[str]], intervalo=None):
+        """Refresca en segundo plano los estados cada `intervalo` s.
+
+        Con el intervalo por defecto (la mitad del TTL) los estados se renuevan
+        antes de expirar y los consumidores siempre leen del cache.
+
+        Args:
+            obtener_ips: Función que devuelve las IPs a vigilar en cada ronda
+            intervalo: Segundos entre rondas (default: TTL / 2)
+        """
+        if self._hilo and self._hilo.is_alive():
+            return
+        intervalo = intervalo or self.ttl / 2
+        self._detener.clear()
+
+        def bucle():
+            while not self._detener.is_set():
+                try:
+                    ips = [ip for ip in obtener_ips() if ip and ip != "-"]
+                    if ips:
+                        run_async(self.consultar, ips, ttl=intervalo)
+                except Exception as e:
+                    print(f"[EstadoConexion] Error en sondeo: {e}")
+                self._detener.wait(intervalo)
+
+        self._hilo = Thread(target=bucle, name="sondeo-estados", daemon=True)
+        self._hilo.start()
+
+    def detener_sondeo(self):
+        self._detener.set()
+
+    # ------------------ INTERNO ------------------
+    def _actualizar(self, ip, activo, rtt, ahora, cambios) -> EstadoConexion:
+        """Guarda el estado de `ip` (con el lock tomado) y anota si cambió."""
+        anterior = self._estados.get(ip)
+        cambio = anterior is None or anterior.activo != activo
+        nuevo = self._estados[ip] = EstadoConexion(
+            activo,
+            rtt,
+            ahora if cambio else anterior.ultimo_cambio,
+            ahora,
+        )
+        if cambio:
+            cambios.append((ip, anterior, nuevo))
+        return nuevo
+
+    def _estado_por_latido(self, ip, ahora, cambios) -> EstadoConexion:
+        """Estado de un equipo con latidos (con el lock tomado)."""
+        recibido, _ = self._latidos[ip]
+        if ahora - recibido <= self.vencimiento_latido:
+            return self._actualizar(ip, True, None, recibido, cambios)
+        estado = self._estados.get(ip)
+        if estado and not estado.activo:
+            return estado  # Ya estaba marcado inactivo
+        return self._actualizar(ip, False, None, ahora, cambios)
+
+    def _registrar(self, rtts: Dict[str, Optional[float]], futuros: Dict[str, Future]):
+        """Guarda los resultados, resuelve a quienes esperaban y avisa cambios."""
+        ahora = time()
+        nuevos = {}
+        cambios = []
+        with self._lock:
+            self.estadisticas["pings"] += len(futuros)
+            for ip in futuros:
+                rtt = rtts.get(ip)
+                nuevos[ip] = self._actualizar(ip, rtt is not None, rtt, ahora, cambios)
+                self._en_vuelo.pop(ip, None)
+            suscriptores = list(self._suscriptores)
+
+        for ip, futuro in futuros.items():
+            futuro.set_result(nuevos[ip])
+
+        self._notificar(cambios, suscriptores)
+        return nuevos
+
+    @staticmethod
+    def _notificar(cambios, suscriptores):
+        """Llama a los suscriptores (fuera del lock) por cada cambio de estado."""
+        for ip, anterior, nuevo in cambios:
+            for callback in suscriptores:
+                try:
+                    callback(ip, anterior, nuevo)
+                except Exception as e:
+                    print(f"[EstadoConexion] Error en suscriptor: {e}")
+
+
+_servicio: Optional[ServicioEstadoConexion] = None
+_servicio_lock = Lock()
+
+
+def obtener_servicio_conexion() -> ServicioEstadoConexion:
+    """Devuelve el servicio de estado de conexión compartido del proceso."""
+    global _servicio
+    with _servicio_lock:
+        if _servicio is None:
+            _servicio = ServicioEstadoConexion()
+    return _servicio
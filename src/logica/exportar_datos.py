@@ -262,18 +262,10 @@ def exportar_con_estado_actual(conexion, formato: str = "csv") -> str:
             d.processor,
             d.RAM,
             d.ip,
-            CASE WHEN a.powerOn = 1 THEN 'Encendido' ELSE 'Apagado' END as estado,
-            datetime(a.date, 'localtime') as ultima_verificacion
+            CASE WHEN s.powerOn = 1 THEN 'Encendido' ELSE 'Apagado' END as estado,
+            datetime(s.last_checked, 'localtime') as ultima_verificacion
         FROM Dispositivos d
-        LEFT JOIN (
-            SELECT Dispositivos_serial, powerOn, date
-            FROM activo
-            WHERE (Dispositivos_serial, date) IN (
-                SELECT Dispositivos_serial, MAX(date)
-                FROM activo
-                GROUP BY Dispositivos_serial
-            )
-        ) a ON d.serial = a.Dispositivos_serial
+        LEFT JOIN device_state s ON d.serial = s.Dispositivos_serial
         WHERE d.activo = 1
         ORDER BY d.DTI, d.serial
     """
@@ -0,0 +1,153 @@
+"""
+Huellas de contenido por sección de un inventario.
+
+La mayoría de los envíos nocturnos son idénticos al anterior en hardware y
+software. Se calcula un hash estable (SHA-256 sobre JSON canónico) de cada
+sección a partir de las MISMAS filas que se escribirían en la DB, sin serial
+ni marcas de tiempo, y se compara con el último hash guardado del dispositivo.
+Las secciones sin cambios no se reescriben.
+
+Secciones:
+- hardware:       fila de Dispositivos (y detección de cambios)
+- almacenamiento: filas de almacenamiento
+- memoria:        filas de memoria
+- aplicaciones:   filas de aplicaciones (sin depender del orden)
+- dxdiag:         texto de dxdiag
+"""
+
+from hashlib import sha256
+from json import dumps
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+SECCIONES = ("hardware", "almacenamiento", "memoria", "aplicaciones", "dxdiag")
+
+# ETag informado por el daemon (sondas baratas); se guarda junto a las huellas
+# y el servidor lo envía en GET_SPECS_IF_CHANGED
+SECCION_ETAG = "etag"
+
+# Tabla que se limpia/reescribe por cada sección (hardware se actualiza con UPSERT)
+TABLAS_SECCION = {
+    "almacenamiento": "almacenamiento",
+    "memoria": "memoria",
+    "aplicaciones": "aplicaciones",
+}
+
+
+def hash_contenido(valor) -> str:
+    """Hash SHA-256 de `valor` serializado como JSON canónico."""
+    canonico = dumps(
+        valor, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return sha256(canonico.encode("utf-8")).hexdigest()
+
+
+def calcular_huellas(
+    datos_dispositivo: tuple,
+    modulos_ram: list,
+    discos: list,
+    aplicaciones: list,
+    dxdiag_txt: str,
+) -> Dict[str, str]:
+    """Calcula el hash de cada sección a partir de las filas ya parseadas.
+
+    Args:
+        datos_dispositivo: Tupla de `parsear_datos_dispositivo`
+        modulos_ram: Filas de `parsear_modulos_ram`
+        discos: Filas de `parsear_almacenamiento`
+        aplicaciones: Filas de `parsear_aplicaciones`
+        dxdiag_txt: Texto de dxdiag recibido
+
+    Returns:
+        dict: {seccion: hash}
+    """
+    return {
+        # Sin serial (puede ser temporal o cambiar de TEMP_ a real)
+        "hardware": hash_contenido(datos_dispositivo[1:]),
+        # Sin serial ni fecha_instalacion (última columna, datetime.now())
+        "almacenamiento": hash_contenido([d[1:-1] for d in discos]),
+        "memoria": hash_contenido([m[1:-1] for m in modulos_ram]),
+        "aplicaciones": hash_contenido(sorted(list(a[1:]) for a in aplicaciones)),
+        "dxdiag": hash_contenido(dxdiag_txt or ""),
+    }
+
+
+def secciones_cambiadas(
+    nuevas: Dict[str, str], anteriores: Optional[Dict[str, str]]
+) -> set:
+    """Devuelve las secciones cuyo hash difiere (o no existía) del guardado."""
+    anteriores = anteriores or {}
+    return {s for s, h in nuevas.items() if anteriores.get(s) != h}
+
+
+class ContadorEscrituras:
+    """Cuenta las escrituras evitadas por secciones sin cambios en una corrida."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Pone los contadores a cero (al comenzar una corrida de consultas)."""
+        with self._lock:
+            self.envios = 0
+            self.envios_sin_cambios = 0
+            self.no_modificados = 0
+            self.secciones_omitidas = {s: 0 for s in SECCIONES}
+            self.filas_omitidas = 0
+
+    def registrar(self, omitidas: Dict[str, int]):
+        """Registra un envío procesado.
+
+        Args:
+            omitidas: {seccion: filas que no se escribieron} de las secciones
+                sin cambios de este envío
+        """
+        with self._lock:
+            self.envios += 1
+            if len(omitidas) == len(SECCIONES):
+                self.envios_sin_cambios += 1
+            for seccion, filas in omitidas.items():
+                self.secciones_omitidas[seccion] += 1
+                self.filas_omitidas += filas
+
+    def registrar_no_modificado(self):
+        """Registra un GET_SPECS_IF_CHANGED respondido con "not modified"."""
+        with self._lock:
+            self.no_modificados += 1
+
+    def resumen(self) -> str:
+        """Texto con las escrituras evitadas, para los logs de fin de corrida."""
+        with self._lock:
+            detalle = ", ".join(
+                f"{s}={n}" for s, n in self.secciones_omitidas.items() if n
+            )
+            return (
+                f"{self.envios_sin_cambios}/{self.envios} envíos sin cambios, "
+                f"{self.filas_omitidas} escrituras evitadas"
+                + (f" ({detalle})" if detalle else "")
+                + f", {self.no_modificados} respuestas not modified"
+            )
+
+
+# Contador compartido del proceso (lo actualiza el hilo escritor de DB)
+contador_escrituras = ContadorEscrituras()
+
+
+def filas_por_seccion(
+    modulos_ram: list, discos: list, aplicaciones: list
+) -> Dict[str, int]:
+    """Filas que escribe cada sección (Dispositivos e informe cuentan 1)."""
+    return {
+        "hardware": 1,
+        "almacenamiento": len(discos),
+        "memoria": len(modulos_ram),
+        "aplicaciones": len(aplicaciones),
+        "dxdiag": 1,
+    }
+
+
+def omitidas_de(cambiadas: Iterable[str], filas: Dict[str, int]) -> Dict[str, int]:
+    """{seccion: filas} de las secciones que NO cambiaron."""
+    cambiadas = set(cambiadas)
+    return {s: n for s, n in filas.items() if s not in cambiadas}
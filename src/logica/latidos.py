@@ -0,0 +1,246 @@
+"""Latidos (heartbeats) UDP de los daemons cliente al servidor.
+
+El daemon (`specs.py --tarea`) envía cada HEARTBEAT_INTERVAL segundos un
+datagrama firmado (`protocolo.firmar_datagrama`) con serial, hora de arranque,
+uptime, carga y las extensiones de GET_SPECS que entiende ("caps"). El servidor lo recibe con `ReceptorLatidos`, que actualiza el
+servicio de estado de conexión en memoria; un equipo que pierde
+HEARTBEAT_MISSED_LIMIT latidos seguidos pasa a inactivo.
+
+Para los equipos con daemon la vivacidad deja de ser un ping por equipo y por
+ciclo: es recepción pasiva, y funciona aunque el firewall del equipo bloquee
+ICMP.
+"""
+
+from asyncio import DatagramProtocol
+from json import load
+from pathlib import Path
+from socket import AF_INET, SOCK_DGRAM, socket
+from threading import Event
+from time import time
+from typing import Optional
+
+from logica.protocolo import (
+    CAPACIDADES,
+    ErrorProtocolo,
+    firmar_datagrama,
+    verificar_datagrama,
+)
+
+TIPO_LATIDO = "heartbeat"
+
+_servidor_conocido: Optional[str] = None  # Último servidor que consultó al daemon
+_serial: Optional[str] = None
+
+
+# ------------------ DAEMON (CLIENTE) ------------------
+def recordar_servidor(ip: str):
+    """Recuerda la IP del servidor que consultó al daemon (destino de latidos)."""
+    global _servidor_conocido
+    _servidor_conocido = ip
+
+
+def _servidor_destino() -> Optional[str]:
+    """IP del servidor: config/server_config.json, el último que consultó al
+    daemon u output/servidor.json (último envío manual), en ese orden."""
+    raiz = Path(__file__).parent.parent.parent
+
+    def leer_ip(ruta):
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                return load(f).get("server_ip")
+        except Exception:
+            return None
+
+    return (
+        leer_ip(raiz / "config" / "server_config.json")
+        or _servidor_conocido
+        or leer_ip(raiz / "output" / "servidor.json")
+    )
+
+
+def construir_latido() -> dict:
+    """Datos del latido: serial, hora de arranque, uptime, carga y capacidades."""
+    global _serial
+    import psutil
+
+    if _serial is None:
+        # Import con fallback para PyInstaller
+        try:
+            from datos.serialNumber import get_serial
+        except ImportError:
+            from ..datos.serialNumber import get_serial
+        _serial = get_serial()
+
+    arranque = psutil.boot_time()
+    return {
+        "type": TIPO_LATIDO,
+        "serial": _serial,
+        "boot_time": arranque,
+        "uptime": int(time() - arranque),
+        "cpu_percent": psutil.cpu_percent(interval=None),
+        "memory_percent": psutil.virtual_memory().percent,
+        "caps": list(CAPACIDADES),
+    }
+
+
+def enviar_latidos(intervalo: Optional[float] = None, detener: Optional[Event] = None):
+    """Bucle del daemon: envía un latido firmado cada `intervalo` segundos.
+
+    Pensado para un hilo daemon junto a `escuchar_solicitudes`. Si todavía no
+    se conoce el servidor, espera al siguiente intervalo sin enviar nada.
+
+    Args:
+        intervalo: Segundos entre latidos (default HEARTBEAT_INTERVAL)
+        detener: threading.Event opcional para terminar el bucle
+    """
+    try:
+        from config.security_config import (
+            HEARTBEAT_INTERVAL,
+            HEARTBEAT_PORT,
+            SHARED_SECRET,
+        )
+    except ImportError:
+        HEARTBEAT_INTERVAL = 30.0
+        HEARTBEAT_PORT = 5257
+        SHARED_SECRET = ""
+
+    intervalo = intervalo or HEARTBEAT_INTERVAL
+    detener = detener or Event()
+    sock = socket(AF_INET, SOCK_DGRAM)
+    secuencia = 0
+    ultimo_error = None
+
+    print(f"[LATIDOS] Latido cada {intervalo}s al puerto UDP {HEARTBEAT_PORT}")
+    try:
+        while True:
+            destino = _servidor_destino()
+            if destino:
+                try:
+                    datos = {**construir_latido(), "seq": secuencia}
+                    datagrama = firmar_datagrama(datos, SHARED_SECRET)
+                    sock.sendto(datagrama, (destino, HEARTBEAT_PORT))
+                    secuencia += 1
+                    ultimo_error = None
+                except Exception as e:
+                    # Informar cada error una sola vez (no saturar el log cada ciclo)
+                    if str(e) != ultimo_error:
+                        print(f"[LATIDOS] No se pudo enviar el latido a {destino}: {e}")
+                        ultimo_error = str(e)
+            if detener.wait(intervalo):
+                break
+    finally:
+        sock.close()
+
+
+# ------------------ SERVIDOR ------------------
+class _ProtocoloLatidos(DatagramProtocol):
+    """Entrega cada datagrama recibido al receptor."""
+
+    def __init__(self, receptor: "ReceptorLatidos"):
+        self.receptor = receptor
+
+    def datagram_received(self, datagrama, addr):
+        self.receptor.procesar(datagrama, addr[0])
+
+
+class ReceptorLatidos:
+    """Receptor UDP de latidos que alimenta el servicio de estado de conexión.
+
+    Características:
+        - Un solo socket UDP para toda la flota (sin conexión por equipo)
+        - Firma HMAC y marca de tiempo verificadas (`verificar_datagrama`)
+        - Misma whitelist de subnets que la ingesta TCP (is_ip_allowed)
+        - Revisión periódica que marca inactivos a los equipos sin latidos
+    """
+
+    def __init__(
+        self, host: str = "0.0.0.0", port: Optional[int] = None, servicio=None
+    ):
+        try:
+            from config.security_config import (
+                HEARTBEAT_INTERVAL,
+                HEARTBEAT_PORT,
+                SHARED_SECRET,
+                is_ip_allowed,
+            )
+        except ImportError:
+            HEARTBEAT_INTERVAL = 30.0
+            HEARTBEAT_PORT = 5257
+            SHARED_SECRET = ""
+
+            def is_ip_allowed(ip):
+                return True  # Sin security_config: aceptar cualquier IP
+
+        if servicio is None:
+            from logica.estado_conexion import obtener_servicio_conexion
+
+            servicio = obtener_servicio_conexion()
+
+        self.host = host
+        self.port = port or HEARTBEAT_PORT
+        self.intervalo = HEARTBEAT_INTERVAL
+        self.servicio = servicio
+        self._secreto = SHARED_SECRET
+        self._ip_permitida = is_ip_allowed
+
+        self._loop = None
+        self._evento_detener = None
+
+        self.estadisticas = {"recibidos": 0, "rechazados": 0, "vencidos": 0}
+
+    async def servir(self):
+        """Escucha latidos hasta que se llame a `detener()`."""
+        from asyncio import Event, get_running_loop, wait_for, TimeoutError
+
+        self._loop = get_running_loop()
+        self._evento_detener = Event()
+
+        transporte, _ = await self._loop.create_datagram_endpoint(
+            lambda: _ProtocoloLatidos(self), local_addr=(self.host, self.port)
+        )
+        print(f"[ReceptorLatidos] Escuchando latidos UDP en {self.host}:{self.port}")
+
+        try:
+            while not self._evento_detener.is_set():
+                try:
+                    await wait_for(self._evento_detener.wait(), timeout=self.intervalo)
+                except TimeoutError:
+                    pass
+                vencidos = self.servicio.revisar_latidos()
+                if vencidos:
+                    self.estadisticas["vencidos"] += len(vencidos)
+                    print(f"[ReceptorLatidos] Sin latidos: {', '.join(vencidos)}")
+        finally:
+            transporte.close()
+            print("[ReceptorLatidos] Receptor detenido")
+
+    def ejecutar(self):
+        """Ejecuta `servir()` en un event loop propio (bloqueante)."""
+        from logica.async_utils import run_async
+
+        run_async(self.servir)
+
+    def detener(self):
+        """Solicita el apagado del receptor. Seguro de llamar desde cualquier hilo."""
+        if self._loop and self._evento_detener and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._evento_detener.set)
+
+    def procesar(self, datagrama: bytes, ip: str) -> bool:
+        """Valida un datagrama recibido y registra el latido.
+
+        Returns:
+            bool: True si era un latido válido
+        """
+        try:
+            if not self._ip_permitida(ip):
+                raise ErrorProtocolo("IP fuera de la whitelist")
+            datos = verificar_datagrama(datagrama, self._secreto)
+            if datos.get("type") != TIPO_LATIDO:
+                raise ErrorProtocolo("No es un latido")
+        except ErrorProtocolo:
+            self.estadisticas["rechazados"] += 1
+            return False
+
+        self.estadisticas["recibidos"] += 1
+        self.servicio.registrar_latido(ip, datos)
+        return True
@@ -1,6 +1,6 @@
 from concurrent.futures import thread
 from glob import glob
-from json import JSONDecodeError, dump, load, loads, dumps
+from json import dump, load, dumps
 from socket import AF_INET, SOCK_STREAM, socket
 import ssl
 from sys import argv
@@ -9,13 +9,32 @@ from pathlib import Path
 from datetime import datetime
 from csv import DictReader
 from re import search
-from asyncio import wait_for, open_connection, get_event_loop, TimeoutError
+from asyncio import wait_for, wrap_future, open_connection, TimeoutError
 
 
 from PySide6.QtWidgets import QApplication
 from sql import ejecutar_sql as sql
-from logica.ping_utils import ping_host
 from logica.async_utils import run_async
+from logica.scan_rangos_ip import entero_a_ip
+from sql.escritor_db import obtener_escritor
+from logica.huella_contenido import (
+    SECCION_ETAG,
+    TABLAS_SECCION,
+    calcular_huellas,
+    contador_escrituras,
+    filas_por_seccion,
+    omitidas_de,
+    secciones_cambiadas,
+)
+from logica.protocolo import (
+    ErrorProtocolo,
+    capacidades_anunciadas,
+    decodificar_payload,
+    formatear_solicitud,
+    leer_mensaje,
+    parsear_compresiones,
+    recibir_mensaje,
+)
 
 # Importar configuración de seguridad
 from typing import Callable, Optional
@@ -75,6 +94,12 @@ try:
     PORT = SERVER_PORT
 except ImportError:
     PORT = 5255  # Fallback si no hay security_config
+# Compresiones de payload que el servidor anuncia a los daemons en GET_SPECS
+try:
+    from config.security_config import PAYLOAD_COMPRESSION
+except ImportError:
+    PAYLOAD_COMPRESSION = "zstd,zlib"
+COMPRESIONES_ACEPTADAS = parsear_compresiones(PAYLOAD_COMPRESSION)
 
 app = QApplication.instance()
 if app is None:
@@ -86,6 +111,231 @@ clientes = []
 connections_per_ip = {}
 
 
+def crear_contexto_tls_servidor():
+    """Carga la configuración TLS y construye el contexto SSL del servidor.
+
+    Returns:
+        tuple: (usar_tls, contexto). `contexto` es None si TLS está desactivado.
+
+    Raises:
+        FileNotFoundError: Si TLS está activo pero faltan el certificado o la clave
+    """
+    try:
+        from config.security_config import USE_TLS, TLS_CERT_PATH, TLS_KEY_PATH
+    except ImportError:
+        USE_TLS = True
+        TLS_CERT_PATH = "config/server.crt"
+        TLS_KEY_PATH = "config/server.key"
+
+    if not USE_TLS:
+        return False, None
+
+    cert_path = Path(TLS_CERT_PATH)
+    key_path = Path(TLS_KEY_PATH)
+
+    if not cert_path.exists():
+        cert_path = Path(__file__).parent.parent.parent / TLS_CERT_PATH
+        key_path = Path(__file__).parent.parent.parent / TLS_KEY_PATH
+
+    if not cert_path.exists() or not key_path.exists():
+        print(f"[ERROR] Certificados TLS no encontrados!")
+        print(f"  Certificado: {cert_path}")
+        print(f"  Clave: {key_path}")
+        print(f"  Ejecuta: python config/generar_certificado.py")
+        print(f"  O desactiva TLS con USE_TLS=false en .env")
+        raise FileNotFoundError(f"Certificados TLS no encontrados: {cert_path}")
+
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(str(cert_path), str(key_path))
+    return True, context
+
+
+async def cerrar_writer(writer):
+    """Cierra un StreamWriter ignorando errores de un peer que ya cerró."""
+    try:
+        writer.close()
+        await writer.wait_closed()
+    except Exception:
+        pass
+
+
+class ServidorIngestaAsync:
+    """Servidor de ingesta TCP(+TLS) basado en asyncio.
+
+    Reemplaza el esquema de un hilo por conexión: todas las conexiones se
+    atienden en un único event loop y el handshake TLS ocurre de forma
+    asíncrona (no bloquea la aceptación de nuevos clientes).
+
+    Características:
+        - Límite global de conexiones atendidas a la vez (`max_concurrencia`)
+        - Deadline por conexión (`timeout_conexion`) que incluye lectura y guardado
+        - Mismos controles de seguridad que `consultar_informacion`
+          (is_ip_allowed, MAX_CONNECTIONS_PER_IP, verify_auth_token, MAX_BUFFER_SIZE)
+        - Apagado limpio con `detener()` (thread-safe)
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        max_concurrencia: Optional[int] = None,
+        timeout_conexion: Optional[float] = None,
+    ):
+        try:
+            from config.security_config import (
+                INGEST_MAX_CONCURRENCY,
+                TLS_HANDSHAKE_TIMEOUT,
+            )
+        except ImportError:
+            INGEST_MAX_CONCURRENCY = 200
+            TLS_HANDSHAKE_TIMEOUT = 10.0
+
+        self.host = host or HOST
+        self.port = port or PORT
+        self.ssl_context = ssl_context
+        self.max_concurrencia = max_concurrencia or INGEST_MAX_CONCURRENCY
+        self.timeout_conexion = timeout_conexion or CONNECTION_TIMEOUT
+        self.timeout_handshake = TLS_HANDSHAKE_TIMEOUT
+
+        self._loop = None
+        self._server = None
+        self._evento_detener = None
+        self._semaforo = None
+        self._tareas = set()
+
+    async def servir(self):
+        """Inicia el servidor y atiende conexiones hasta que se llame a `detener()`."""
+        from asyncio import Event, Semaphore, get_running_loop, start_server
+
+        self._loop = get_running_loop()
+        self._evento_detener = Event()
+        self._semaforo = Semaphore(self.max_concurrencia)
+
+        kwargs = {}
+        if self.ssl_context:
+            kwargs["ssl"] = self.ssl_context
+            kwargs["ssl_handshake_timeout"] = self.timeout_handshake
+
+        self._server = await start_server(
+            self._on_conexion, self.host, self.port, **kwargs
+        )
+        modo = "TCP+TLS" if self.ssl_context else "TCP"
+        print(
+            f"[ServidorIngestaAsync] Servidor {modo} escuchando en {self.host}:{self.port} "
+            f"(max {self.max_concurrencia} conexiones, timeout {self.timeout_conexion}s)"
+        )
+
+        try:
+            await self._evento_detener.wait()
+        finally:
+            await self._cerrar()
+
+    def ejecutar(self):
+        """Ejecuta `servir()` en un event loop propio (bloqueante)."""
+        run_async(self.servir)
+
+    def detener(self):
+        """Solicita el apagado del servidor. Seguro de llamar desde cualquier hilo."""
+        if self._loop and self._evento_detener and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._evento_detener.set)
+
+    async def _cerrar(self):
+        """Deja de aceptar conexiones, cancela las pendientes y libera recursos."""
+        from asyncio import gather
+
+        print("[ServidorIngestaAsync] Deteniendo servidor...")
+        if self._server:
+            self._server.close()
+
+        for tarea in list(self._tareas):
+            tarea.cancel()
+        if self._tareas:
+            await gather(*self._tareas, return_exceptions=True)
+
+        if self._server:
+            await self._server.wait_closed()
+        print("[ServidorIngestaAsync] Servidor detenido")
+
+    async def _on_conexion(self, reader, writer):
+        """Callback de `start_server`: registra la tarea para el apagado limpio."""
+        from asyncio import current_task
+
+        tarea = current_task()
+        self._tareas.add(tarea)
+        try:
+            await self._atender(reader, writer)
+        finally:
+            self._tareas.discard(tarea)
+
+    async def _atender(self, reader, writer):
+        """Aplica controles de seguridad y el deadline de la conexión."""
+        addr = writer.get_extra_info("peername") or ("?", 0)
+        client_ip = addr[0]
+
+        # SECURITY: Validar IP permitida y limitar conexiones por IP
+        if SECURITY_ENABLED:
+            if not is_ip_allowed(client_ip):
+                print(f"[SECURITY] IP bloqueada (no esta en whitelist): {client_ip}")
+                await cerrar_writer(writer)
+                return
+
+            current_connections = connections_per_ip.get(client_ip, 0)
+            if current_connections >= MAX_CONNECTIONS_PER_IP:
+                print(
+                    f"[SECURITY] Demasiadas conexiones desde {client_ip} ({current_connections})"
+                )
+                await cerrar_writer(writer)
+                return
+            connections_per_ip[client_ip] = current_connections + 1
+
+        try:
+            # El deadline cubre la espera por cupo, la lectura y el guardado
+            await wait_for(
+                self._procesar_conexion(reader, client_ip),
+                timeout=self.timeout_conexion,
+            )
+        except TimeoutError:
+            print(f"[WARN] Deadline de {self.timeout_conexion}s excedido por {addr}")
+        except ConnectionResetError:
+            print(f"Conexión cerrada abruptamente por {addr}")
+        except Exception as e:
+            print(f"Error en conexión con {addr}: {e}")
+        finally:
+            await cerrar_writer(writer)
+
+            # SECURITY: Decrementar contador de conexiones
+            if SECURITY_ENABLED and client_ip in connections_per_ip:
+                connections_per_ip[client_ip] -= 1
+                if connections_per_ip[client_ip] <= 0:
+                    del connections_per_ip[client_ip]
+
+    async def _procesar_conexion(self, reader, client_ip):
+        """Lee el JSON completo del cliente, lo valida y lo guarda en la DB."""
+        from asyncio import get_running_loop
+
+        async with self._semaforo:
+            try:
+                # Mensaje enmarcado (o JSON crudo de clientes legacy hasta EOF)
+                cabecera, payload = await leer_mensaje(reader, MAX_BUFFER_SIZE)
+                if not payload:
+                    return
+                # Descomprimir y parsear fuera del loop (hasta MAX_BUFFER_SIZE)
+                json_data = await get_running_loop().run_in_executor(
+                    None, decodificar_payload, cabecera, payload, MAX_BUFFER_SIZE
+                )
+            except ErrorProtocolo as e:
+                print(f"[SECURITY] Mensaje rechazado desde {client_ip}: {e}")
+                return
+
+            # SECURITY: Validar autenticación
+            if not validar_token_cliente(json_data, client_ip):
+                return
+
+            # El escritor único de DB agrupa este guardado con los de otros clientes
+            await guardar_datos_cliente_async(json_data)
+
+
 class ServerManager:
     """Facade para manejar el servidor TCP (sin broadcasts/discovery).
 
@@ -96,6 +346,8 @@ class ServerManager:
     def __init__(self, host: Optional[str] = None, port: Optional[int] = None):
         self.host = host or HOST
         self.port = port or PORT
+        self.ingesta: Optional[ServidorIngestaAsync] = None
+        self.latidos = None  # ReceptorLatidos (UDP)
 
     def start_tcp_server(self):
         """Inicia el servidor TCP (bloqueante) que recibe datos de clientes.
@@ -103,77 +355,49 @@ class ServerManager:
         Los clientes NO se descubren via broadcast. En su lugar:
         - Servidor tiene lista de IPs (CSV/DB)
         - Servidor solicita datos activamente conectándose a cliente:5256
+
+        Usa `ServidorIngestaAsync`; se detiene con `stop_tcp_server()`. En un
+        hilo aparte corre el receptor de latidos UDP de los daemons.
         """
         try:
-            # Cargar configuración TLS
             try:
-                from config.security_config import USE_TLS, TLS_CERT_PATH, TLS_KEY_PATH
-            except ImportError:
-                USE_TLS = True
-                TLS_CERT_PATH = "config/server.crt"
-                TLS_KEY_PATH = "config/server.key"
-
-            server_socket = socket(AF_INET, SOCK_STREAM)
-            server_socket.bind((self.host, self.port))
-            server_socket.listen()
-
-            context = None
-            if USE_TLS:
-                from pathlib import Path
-
-                cert_path = Path(TLS_CERT_PATH)
-                key_path = Path(TLS_KEY_PATH)
-
-                if not cert_path.exists():
-                    cert_path = Path(__file__).parent.parent.parent / TLS_CERT_PATH
-                    key_path = Path(__file__).parent.parent.parent / TLS_KEY_PATH
-
-                if not cert_path.exists() or not key_path.exists():
-                    print(f"[ERROR] Certificados TLS no encontrados!")
-                    print(f"  Certificado: {cert_path}")
-                    print(f"  Clave: {key_path}")
-                    print(f"  Ejecuta: python config/generar_certificado.py")
-                    print(f"  O desactiva TLS con USE_TLS=false en .env")
-                    return
+                usar_tls, context = crear_contexto_tls_servidor()
+            except FileNotFoundError:
+                return
 
-                context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-                context.load_cert_chain(str(cert_path), str(key_path))
-                print(
-                    f"[ServerManager] Servidor TCP+TLS escuchando en {self.host}:{self.port}"
-                )
-            else:
-                print(
-                    f"[ServerManager] Servidor TCP escuchando en {self.host}:{self.port}"
-                )
+            self.start_heartbeat_receiver()
+
+            if not usar_tls:
                 print(f"[WARN] TLS DESACTIVADO - conexiones sin cifrar")
 
-            # Loop de aceptación (bloqueante)
-            while True:
-                conn, addr = server_socket.accept()
-
-                if USE_TLS and context:
-                    try:
-                        conn_ssl = context.wrap_socket(conn, server_side=True)
-                        clientes.append(conn_ssl)
-                        hilo = Thread(
-                            target=consultar_informacion,
-                            args=(conn_ssl, addr),
-                            daemon=True,
-                        )
-                        hilo.start()
-                    except ssl.SSLError as e:
-                        print(f"[ERROR] SSL desde {addr[0]}: {e}")
-                        conn.close()
-                else:
-                    clientes.append(conn)
-                    hilo = Thread(
-                        target=consultar_informacion, args=(conn, addr), daemon=True
-                    )
-                    hilo.start()
+            self.ingesta = ServidorIngestaAsync(
+                self.host, self.port, ssl_context=context
+            )
+            self.ingesta.ejecutar()
         except Exception as e:
             print(f"[ServerManager] Error al iniciar servidor TCP: {e}")
             raise
 
+    def start_heartbeat_receiver(self):
+        """Inicia en segundo plano el receptor de latidos UDP (no bloqueante)."""
+        from logica.latidos import ReceptorLatidos
+
+        def ejecutar():
+            try:
+                self.latidos.ejecutar()
+            except Exception as e:
+                print(f"[ServerManager] Error en receptor de latidos: {e}")
+
+        self.latidos = ReceptorLatidos(self.host)
+        Thread(target=ejecutar, name="receptor-latidos", daemon=True).start()
+
+    def stop_tcp_server(self):
+        """Detiene el servidor iniciado con `start_tcp_server()` (thread-safe)."""
+        if self.ingesta:
+            self.ingesta.detener()
+        if self.latidos:
+            self.latidos.detener()
+
 
 class Monitor:
     """Encapsula funciones de verificación/consulta de dispositivos.
@@ -194,9 +418,25 @@ class Monitor:
         """
         return consultar_dispositivos_desde_csv(archivo_csv, callback_progreso)
 
+    def probe_agents(self, ips: Optional[list] = None):
+        """Sondeo UDP de estado de los daemons (default: todos los de la DB).
+
+        Returns:
+            dict: {ip: versión/ETag/uptime del agente, o None si no respondió}
+        """
+        from logica.sondeo_estado import sondear_agentes
+
+        if ips is None:
+            ips = obtener_ips_dispositivos()
+        resultados = run_async(sondear_agentes, ips)
+        for ip, datos in resultados.items():
+            if datos:
+                registrar_capacidades(ip, datos)
+        return resultados
+
 
 class Scanner:
-    """Responsable de ejecutar el escaneo de red y poblar DB desde CSV."""
+    """Responsable de ejecutar el escaneo de red y poblar DB con sus hosts."""
 
     print(">> Creando instancia de Scanner...")
 
@@ -228,34 +468,39 @@ class Scanner:
         )
 
     def parse_csv_to_db(self, csv_path: Optional[str]):
-        """Pobla la base de datos con entradas mínimas desde el CSV (IP/MAC).
+        """Pobla la base de datos con entradas mínimas (IP/MAC) de los hosts.
 
-        Implementación mínima: si existe una función en `sql` para insertar, usarla.
+        Lee la tabla `hosts` que registra el escáner (o el CSV `csv_path`, si se
+        indica) y la compara con `Dispositivos` en una sola consulta; las altas
+        y las MACs nuevas se escriben en una única transacción.
         """
-        # Obtener lista de IPs desde CSV
-        ips = cargar_ips_desde_csv(csv_path)
+        if csv_path:
+            ips = cargar_ips_desde_csv(csv_path)
+        else:
+            ips = cargar_hosts_descubiertos()
         if not ips:
-            print("[parse_csv_to_db] No se cargaron IPs desde CSV")
+            print("[parse_csv_to_db] No hay hosts descubiertos para poblar la DB")
             return 0
 
-        print(f"[parse_csv_to_db] Procesando {len(ips)} IPs desde CSV...")
+        print(f"[parse_csv_to_db] Procesando {len(ips)} IPs...")
         inserted = 0
         updated = 0
-        skipped = 0
 
         # Usar conexión thread-safe para esta operación
         try:
             conn = sql.get_thread_safe_connection()
-            cur = conn.cursor()
-
-            for ip, mac in ips:
-                try:
-                    cur.execute(
-                        "SELECT serial, MAC FROM Dispositivos WHERE ip = ?", (ip,)
+            try:
+                conocidos = {
+                    ip: (serial, mac_existente)
+                    for serial, ip, mac_existente in conn.execute(
+                        "SELECT serial, ip, MAC FROM Dispositivos "
+                        "WHERE ip IS NOT NULL AND ip != ''"
                     )
-                    existe = cur.fetchone()
+                }
 
-                    if not existe:
+                macs_nuevas = []
+                for ip, mac in ips:
+                    if ip not in conocidos:
                         serial = (
                             f"TEMP_{mac.replace(':','').replace('-','')}"
                             if mac
@@ -275,34 +520,23 @@ class Scanner:
                             ip,
                             False,
                         )
-                        sql.setDevice(datos_basicos, conn)  # Pasar conexión thread-safe
+                        sql.setDevice(datos_basicos, conn)
+                        conocidos[ip] = (serial, mac)
                         inserted += 1
-                    else:
-                        serial_existente = existe[0]
-                        mac_existente = existe[1]
-                        if mac and not mac_existente:
-                            cur.execute(
-                                "UPDATE Dispositivos SET ip = ?, MAC = ? WHERE serial = ?",
-                                (ip, mac, serial_existente),
-                            )
-                            updated += 1
-                        else:
-                            cur.execute(
-                                "UPDATE Dispositivos SET ip = ? WHERE serial = ?",
-                                (ip, serial_existente),
-                            )
-                            updated += 1
-                except Exception as e:
-                    print(
-                        f"[parse_csv_to_db] Error poblando DB para IP={ip}, MAC={mac}: {e}"
-                    )
-                    skipped += 1
+                    elif mac and not conocidos[ip][1]:
+                        macs_nuevas.append((mac, conocidos[ip][0]))
 
-            conn.commit()
-            conn.close()
+                conn.executemany(
+                    "UPDATE Dispositivos SET MAC = ? WHERE serial = ?", macs_nuevas
+                )
+                updated = len(macs_nuevas)
+                conn.commit()
+            finally:
+                conn.close()
 
             print(
-                f"[parse_csv_to_db] Resultados: {inserted} insertados, {updated} actualizados, {skipped} errores"
+                f"[parse_csv_to_db] Resultados: {inserted} insertados, "
+                f"{updated} MACs actualizadas"
             )
 
         except Exception as e:
@@ -313,8 +547,14 @@ class Scanner:
 
         return inserted
 
-    def run_scan_con_rangos(self, start_ip, end_ip, callback_progreso=None):
-        """Ejecuta el escaneo con rangos específicos de IP."""
+    def run_scan_con_rangos(
+        self, start_ip, end_ip, callback_progreso=None, reanudar=False
+    ):
+        """Ejecuta el escaneo con rangos específicos de IP.
+
+        Con `reanudar=True` continúa un escaneo interrumpido del mismo rango
+        (ver `checkpoint_pendiente`) en lugar de empezar de cero.
+        """
         # Importar el módulo del escáner
         from . import optimized_block_scanner as scan
 
@@ -325,7 +565,13 @@ class Scanner:
         try:
             # Llamar a main pasando los rangos directamente
             print("[Scanner] Llamando a scan.main...")
-            alive = scan.main(callback_progreso=callback_progreso, ranges=[rango])
+            # Cada host activo se registra en la DB durante el escaneo
+            alive = scan.main(
+                callback_progreso=callback_progreso,
+                ranges=[rango],
+                reanudar=reanudar,
+                sumideros=[persistir_descubrimientos],
+            )
             print(f"[Scanner] Escaneo completado, alive: {len(alive) if alive else 0}")
             return alive  # Devolver la lista de IPs vivas
         except Exception as e:
@@ -335,6 +581,20 @@ class Scanner:
             print_exc()
             return []
 
+    def checkpoint_pendiente(self, start_ip, end_ip):
+        """Avance guardado de un escaneo interrumpido de este rango, o None.
+
+        Returns:
+            dict | None: {"barridos", "total", "activos", "fecha"}
+        """
+        from . import optimized_block_scanner as scan
+
+        try:
+            return scan.checkpoint_reanudable([f"{start_ip}-{end_ip}"])
+        except Exception as e:
+            print(f"[Scanner] No se pudo leer el checkpoint del escaneo: {e}")
+            return None
+
 
 def parsear_datos_dispositivo(json_data):
     """
@@ -634,13 +894,299 @@ def detectar_cambios_hardware(serial, json_data, thread_conn):
     return False
 
 
+def validar_token_cliente(json_data, client_ip):
+    """Verifica el token de autenticación incluido en el JSON del cliente.
+
+    Args:
+        json_data (dict): Datos recibidos del cliente
+        client_ip (str): IP de origen (solo para logs)
+
+    Returns:
+        bool: True si la seguridad está deshabilitada o el token es válido
+    """
+    if not SECURITY_ENABLED:
+        return True
+
+    token = json_data.get("auth_token")
+    if not token:
+        print(f"[SECURITY] Token de autenticacion faltante desde {client_ip}")
+        return False
+
+    if not verify_auth_token(token):
+        print(f"[SECURITY] Token de autenticacion invalido desde {client_ip}")
+        return False
+
+    print(f"[OK] Token valido desde {client_ip}")
+    return True
+
+
+def _tiene_campos_minimos(json_data):
+    """Verifica que el JSON del cliente traiga los campos requeridos."""
+    if "SerialNumber" not in json_data or "MAC Address" not in json_data:
+        print("JSON incompleto - faltan campos requeridos")
+        return False
+    return True
+
+
+def comparar_huellas(serial, datos_dispositivo, json_data, conn):
+    """Parsea las secciones de un envío y determina cuáles cambiaron.
+
+    Args:
+        serial (str): Serial con el que se guarda el dispositivo
+        datos_dispositivo (tuple): Fila de Dispositivos ya parseada
+        json_data (dict): Datos del cliente
+        conn (sqlite3.Connection): Conexión del escritor de DB
+
+    Returns:
+        tuple: (modulos_ram, discos, aplicaciones, huellas, cambiadas)
+            `huellas` incluye el ETag del daemon solo si es nuevo o cambió.
+    """
+    modulos_ram = parsear_modulos_ram(json_data)
+    discos = parsear_almacenamiento(json_data)
+    aplicaciones = parsear_aplicaciones(json_data)
+    huellas = calcular_huellas(
+        datos_dispositivo,
+        modulos_ram,
+        discos,
+        aplicaciones,
+        json_data.get("dxdiag_output_txt", ""),
+    )
+    anteriores = sql.getHuellasContenido(serial, conn)
+    cambiadas = secciones_cambiadas(huellas, anteriores)
+
+    # ETag de las sondas del daemon (para GET_SPECS_IF_CHANGED)
+    etag = sanitize_field(json_data.get("etag", ""), 128)
+    if etag and anteriores.get(SECCION_ETAG) != etag:
+        huellas[SECCION_ETAG] = etag
+    return modulos_ram, discos, aplicaciones, huellas, cambiadas
+
+
+def registrar_huellas(serial, huellas, cambiadas, filas, conn):
+    """Guarda los hashes de las secciones reescritas y cuenta las omitidas."""
+    a_guardar = {
+        s: h for s, h in huellas.items() if s in cambiadas or s == SECCION_ETAG
+    }
+    if a_guardar:
+        sql.setHuellasContenido(serial, a_guardar, datetime.now().isoformat(), conn)
+    omitidas = omitidas_de(cambiadas, filas)
+    contador_escrituras.registrar(omitidas)
+    if omitidas:
+        print(
+            f"[SIN CAMBIOS] {serial}: se omiten {', '.join(omitidas)} "
+            f"({sum(omitidas.values())} escrituras)"
+        )
+
+
+def persistir_datos_cliente(json_data, conn):
+    """Operación de escritura: guarda las especificaciones de un cliente.
+
+    Args:
+        json_data (dict): Datos ya validados (token y campos mínimos)
+        conn (sqlite3.Connection): Conexión del escritor de DB
+
+    Returns:
+        tuple: (serial usado, tupla de datos del dispositivo)
+
+    Note:
+        Se ejecuta dentro del lote de `EscritorDB`; NO hace commit.
+    """
+    # Parsear datos para tabla Dispositivos
+    datos_dispositivo = parsear_datos_dispositivo(json_data)
+    serial_cliente = datos_dispositivo[0]
+    mac = datos_dispositivo[3]
+    ip = datos_dispositivo[10]
+
+    # SIEMPRE buscar primero si existe un dispositivo con esta IP
+    serial_a_usar = serial_cliente
+    cur = conn.cursor()
+    cur.execute("SELECT serial, MAC FROM Dispositivos WHERE ip = ?", (ip,))
+    dispositivo_existente = cur.fetchone()
+
+    if dispositivo_existente:
+        serial_db = dispositivo_existente[0]
+        mac_db = dispositivo_existente[1]
+
+        print(
+            f"[INFO] Dispositivo encontrado en DB: serial={serial_db}, MAC={mac_db}"
+        )
+
+        # Usar el serial de la DB para actualizar (mantener identidad del registro)
+        serial_a_usar = serial_db
+
+        # Si el serial del cliente es real (no temporal) y difiere del de la DB, actualizar
+        if (
+            serial_cliente
+            and not serial_cliente.startswith("TEMP")
+            and serial_cliente != serial_db
+        ):
+            print(f"[UPDATE] Actualizando serial de {serial_db} a {serial_cliente}")
+
+            # Actualizar serial en todas las tablas relacionadas
+            for tabla, columna in (
+                ("Dispositivos", "serial"),
+                ("activo", "Dispositivos_serial"),
+                ("device_state", "Dispositivos_serial"),
+                ("device_state_transitions", "Dispositivos_serial"),
+                ("registro_cambios", "Dispositivos_serial"),
+                ("almacenamiento", "Dispositivos_serial"),
+                ("memoria", "Dispositivos_serial"),
+                ("aplicaciones", "Dispositivos_serial"),
+                ("informacion_diagnostico", "Dispositivos_serial"),
+                ("huellas_contenido", "Dispositivos_serial"),
+            ):
+                cur.execute(
+                    f"UPDATE {tabla} SET {columna} = ? WHERE {columna} = ?",
+                    (serial_cliente, serial_db),
+                )
+
+            # Ahora usar el serial actualizado
+            serial_a_usar = serial_cliente
+    else:
+        # No existe dispositivo con esta IP
+        if not serial_cliente or serial_cliente.strip() == "":
+            # Generar serial temporal
+            if mac:
+                serial_a_usar = f"TEMP_{mac.replace(':', '').replace('-', '')}"
+                print(f"[WARN] Cliente sin serial, usando temporal: {serial_a_usar}")
+            else:
+                serial_a_usar = f"TEMP_{ip.replace('.', '')}"
+                print(
+                    f"[WARN] Cliente sin serial ni MAC, usando temporal basado en IP: {serial_a_usar}"
+                )
+
+    # Reconstruir tupla con el serial correcto
+    datos_dispositivo = (serial_a_usar,) + datos_dispositivo[1:]
+
+    # Comparar el hash de cada sección con el último envío guardado
+    modulos_ram, discos, aplicaciones, huellas, cambiadas = comparar_huellas(
+        serial_a_usar, datos_dispositivo, json_data, conn
+    )
+
+    if "hardware" in cambiadas:
+        # Insertar/actualizar dispositivo (UPSERT por serial)
+        sql.setDevice(datos_dispositivo, conn)
+        print(f"Dispositivo {serial_a_usar} guardado en DB")
+
+        # Detectar cambios de hardware vs estado anterior
+        detectar_cambios_hardware(serial_a_usar, json_data, conn)
+
+    # Actualizar estado activo (siempre: es el "visto por última vez")
+    sql.setActive((serial_a_usar, True, datetime.now().isoformat()), conn)
+
+    # Guardar módulos RAM
+    if "memoria" in cambiadas:
+        for i, modulo in enumerate(modulos_ram, 1):
+            sql.setMemoria(modulo, i, conn)
+        print(f"Guardados {len(modulos_ram)} módulos de RAM")
+
+    # Guardar almacenamiento
+    if "almacenamiento" in cambiadas:
+        for i, disco in enumerate(discos, 1):
+            sql.setAlmacenamiento(disco, i, conn)
+        print(f"Guardados {len(discos)} dispositivos de almacenamiento")
+
+    # Guardar aplicaciones
+    if "aplicaciones" in cambiadas:
+        for app in aplicaciones:
+            try:
+                sql.setaplication(app, conn)
+            except:
+                pass  # Algunas apps pueden dar error, continuar
+        print(f"Guardadas {len(aplicaciones)} aplicaciones")
+
+    # Guardar informe diagnóstico completo (es una foto de todas las secciones)
+    if cambiadas:
+        dxdiag_txt = json_data.get("dxdiag_output_txt", "")
+        json_str = dumps(json_data, indent=2)
+        sql.setInformeDiagnostico(
+            (serial_a_usar, json_str, dxdiag_txt, datetime.now().isoformat()),
+            conn,
+        )
+
+    registrar_huellas(
+        serial_a_usar,
+        huellas,
+        cambiadas,
+        filas_por_seccion(modulos_ram, discos, aplicaciones),
+        conn,
+    )
+
+    return serial_a_usar, datos_dispositivo
+
+
+def _guardar_backup_json(json_data, datos_dispositivo):
+    """Opcional: guarda backup en JSON para debug."""
+    try:
+        with open(
+            f"{datos_dispositivo[2]}_{datos_dispositivo[3]}.json",
+            "w",
+            encoding="utf-8",
+        ) as f:
+            dump(json_data, f, indent=4)
+    except:
+        pass
+
+
+def guardar_datos_cliente(json_data):
+    """Persiste en la DB las especificaciones enviadas por un cliente.
+
+    Args:
+        json_data (dict): Datos ya validados (token verificado)
+
+    Returns:
+        str | None: Serial con el que se guardó el dispositivo, o None si el
+        JSON no tiene los campos mínimos.
+
+    Note:
+        Versión bloqueante para hilos: encola la escritura en el escritor
+        único de DB y espera el commit del lote que la contiene.
+    """
+    if not _tiene_campos_minimos(json_data):
+        return None
+
+    print(f"Procesando datos del dispositivo: {json_data.get('SerialNumber')}")
+    serial, datos_dispositivo = obtener_escritor().ejecutar(
+        persistir_datos_cliente, json_data
+    )
+    print(f"[OK] Datos del dispositivo {serial} guardados exitosamente")
+
+    _guardar_backup_json(json_data, datos_dispositivo)
+    return serial
+
+
+async def guardar_datos_cliente_async(json_data):
+    """Equivalente de `guardar_datos_cliente` para coroutines.
+
+    Espera el commit del escritor de DB sin bloquear el event loop.
+    """
+    from asyncio import get_running_loop, wrap_future
+
+    if not _tiene_campos_minimos(json_data):
+        return None
+
+    print(f"Procesando datos del dispositivo: {json_data.get('SerialNumber')}")
+    serial, datos_dispositivo = await wrap_future(
+        obtener_escritor().enviar(persistir_datos_cliente, json_data)
+    )
+    print(f"[OK] Datos del dispositivo {serial} guardados exitosamente")
+
+    await get_running_loop().run_in_executor(
+        None, _guardar_backup_json, json_data, datos_dispositivo
+    )
+    return serial
+
+
 def consultar_informacion(conn, addr):
     """Recibe información del cliente y la almacena en la base de datos.
 
+    Versión síncrona (un hilo por conexión). El servidor principal usa
+    `ServidorIngestaAsync`; esta función se conserva para integraciones que
+    ya manejan su propio socket.
+
     Security:
         - Valida IP contra whitelist de subnets permitidas
         - Verifica token de autenticación
-        - Limita tamaño de buffer a MAX_BUFFER_SIZE
+        - Limita tamaño de buffer a MAX_BUFFER_SIZE (comprimido y descomprimido)
         - Aplica timeout de CONNECTION_TIMEOUT segundos
     """
     client_ip = addr[0]
@@ -667,213 +1213,21 @@ def consultar_informacion(conn, addr):
 
         connections_per_ip[client_ip] = current_connections + 1
 
-    buffer = b""
-
     try:
         # SECURITY: Establecer timeout de conexión
         conn.settimeout(CONNECTION_TIMEOUT)
 
-        while True:
-            data = conn.recv(4096)
-            if not data:
-                break
-
-            buffer += data
+        # SECURITY: La cabecera declara el tamaño; se rechaza antes de leer el payload
+        cabecera, payload = recibir_mensaje(conn, MAX_BUFFER_SIZE)
+        # SECURITY: El payload descomprimido tampoco puede superar MAX_BUFFER_SIZE
+        json_data = decodificar_payload(cabecera, payload, MAX_BUFFER_SIZE)
 
-            # SECURITY: Verificar tamaño de buffer
-            if len(buffer) > MAX_BUFFER_SIZE:
-                print(
-                    f"[SECURITY] Buffer excedido desde {client_ip} ({len(buffer)} bytes)"
-                )
-                break
-
-            # Intentar decodificar y parsear cuando tengamos datos completos
-            try:
-                json_data = loads(buffer.decode("utf-8"))
-
-                thread_conn = sql.get_thread_safe_connection()
-                # SECURITY: Validar autenticación
-                if SECURITY_ENABLED:
-                    token = json_data.get("auth_token")
-                    if not token:
-                        print(
-                            f"[SECURITY] Token de autenticacion faltante desde {client_ip}"
-                        )
-                        break
-
-                    if not verify_auth_token(token):
-                        print(
-                            f"[SECURITY] Token de autenticacion invalido desde {client_ip}"
-                        )
-                        break
-
-                    print(f"[OK] Token valido desde {client_ip}")
-
-                # Validar que tenga campos mínimos
-                if "SerialNumber" not in json_data or "MAC Address" not in json_data:
-                    print("JSON incompleto - faltan campos requeridos")
-                    break
-
-                print(
-                    f"Procesando datos del dispositivo: {json_data.get('SerialNumber')}"
-                )
-
-                # Parsear datos para tabla Dispositivos
-                datos_dispositivo = parsear_datos_dispositivo(json_data)
-                serial_cliente = datos_dispositivo[0]
-                mac = datos_dispositivo[3]
-                ip = datos_dispositivo[10]
-
-                # SIEMPRE buscar primero si existe un dispositivo con esta IP
-                serial_a_usar = serial_cliente
-                sql.cursor.execute(
-                    "SELECT serial, MAC FROM Dispositivos WHERE ip = ?", (ip,)
-                )
-                dispositivo_existente = sql.cursor.fetchone()
-
-                if dispositivo_existente:
-                    serial_db = dispositivo_existente[0]
-                    mac_db = dispositivo_existente[1]
-
-                    print(
-                        f"[INFO] Dispositivo encontrado en DB: serial={serial_db}, MAC={mac_db}"
-                    )
-
-                    # Usar el serial de la DB para actualizar (mantener identidad del registro)
-                    serial_a_usar = serial_db
-
-                    # Si el serial del cliente es real (no temporal) y difiere del de la DB, actualizar
-                    if (
-                        serial_cliente
-                        and not serial_cliente.startswith("TEMP")
-                        and serial_cliente != serial_db
-                    ):
-                        print(
-                            f"[UPDATE] Actualizando serial de {serial_db} a {serial_cliente}"
-                        )
-
-                        # Actualizar serial en todas las tablas relacionadas
-                        sql.cursor.execute(
-                            "UPDATE Dispositivos SET serial = ? WHERE serial = ?",
-                            (serial_cliente, serial_db),
-                        )
-                        sql.cursor.execute(
-                            "UPDATE activo SET Dispositivos_serial = ? WHERE Dispositivos_serial = ?",
-                            (serial_cliente, serial_db),
-                        )
-                        sql.cursor.execute(
-                            "UPDATE registro_cambios SET Dispositivos_serial = ? WHERE Dispositivos_serial = ?",
-                            (serial_cliente, serial_db),
-                        )
-                        sql.cursor.execute(
-                            "UPDATE almacenamiento SET Dispositivos_serial = ? WHERE Dispositivos_serial = ?",
-                            (serial_cliente, serial_db),
-                        )
-                        sql.cursor.execute(
-                            "UPDATE memoria SET Dispositivos_serial = ? WHERE Dispositivos_serial = ?",
-                            (serial_cliente, serial_db),
-                        )
-                        sql.cursor.execute(
-                            "UPDATE aplicaciones SET Dispositivos_serial = ? WHERE Dispositivos_serial = ?",
-                            (serial_cliente, serial_db),
-                        )
-                        sql.cursor.execute(
-                            "UPDATE informacion_diagnostico SET Dispositivos_serial = ? WHERE Dispositivos_serial = ?",
-                            (serial_cliente, serial_db),
-                        )
-                        sql.connection.commit()
-
-                        # Ahora usar el serial actualizado
-                        serial_a_usar = serial_cliente
-                else:
-                    # No existe dispositivo con esta IP
-                    if not serial_cliente or serial_cliente.strip() == "":
-                        # Generar serial temporal
-                        if mac:
-                            serial_a_usar = (
-                                f"TEMP_{mac.replace(':', '').replace('-', '')}"
-                            )
-                            print(
-                                f"[WARN] Cliente sin serial, usando temporal: {serial_a_usar}"
-                            )
-                        else:
-                            serial_a_usar = f"TEMP_{ip.replace('.', '')}"
-                            print(
-                                f"[WARN] Cliente sin serial ni MAC, usando temporal basado en IP: {serial_a_usar}"
-                            )
-
-                # Reconstruir tupla con el serial correcto
-                datos_dispositivo = (serial_a_usar,) + datos_dispositivo[1:]
-
-                # Insertar/actualizar dispositivo (UPSERT por serial)
-                sql.setDevice(datos_dispositivo, thread_conn)
-                print(f"Dispositivo {serial_a_usar} guardado en DB")
-
-                # Detectar cambios de hardware vs estado anterior
-                detectar_cambios_hardware(serial_a_usar, json_data, thread_conn)
-
-                # Actualizar estado activo
-                sql.setActive(
-                    (serial_a_usar, True, datetime.now().isoformat()), thread_conn
-                )
-                # Guardar módulos RAM
-                modulos_ram = parsear_modulos_ram(json_data)
-                for i, modulo in enumerate(modulos_ram, 1):
-                    sql.setMemoria(modulo, i, thread_conn)
-                print(f"Guardados {len(modulos_ram)} módulos de RAM")
-
-                # Guardar almacenamiento
-                discos = parsear_almacenamiento(json_data)
-                for i, disco in enumerate(discos, 1):
-                    sql.setAlmacenamiento(disco, i, thread_conn)
-                print(f"Guardados {len(discos)} dispositivos de almacenamiento")
-
-                # Guardar aplicaciones
-                aplicaciones = parsear_aplicaciones(json_data)
-                for app in aplicaciones:
-                    try:
-                        sql.setaplication(app, thread_conn)
-                    except:
-                        pass  # Algunas apps pueden dar error, continuar
-                print(f"Guardadas {len(aplicaciones)} aplicaciones")
-
-                # Guardar informe diagnóstico completo
-                dxdiag_txt = json_data.get("dxdiag_output_txt", "")
-                json_str = dumps(json_data, indent=2)
-                sql.setInformeDiagnostico(
-                    (serial_a_usar, json_str, dxdiag_txt, datetime.now().isoformat()),
-                    thread_conn,
-                )
-
-                # Commit cambios
-                thread_conn.commit()
-                print(
-                    f"[OK] Datos del dispositivo {serial_a_usar} guardados exitosamente"
-                )
-
-                # Opcional: guardar backup en JSON para debug
-                try:
-                    with open(
-                        f"{datos_dispositivo[2]}_{datos_dispositivo[3]}.json",
-                        "w",
-                        encoding="utf-8",
-                    ) as f:
-                        dump(json_data, f, indent=4)
-                except:
-                    pass
-
-                break
-
-            except JSONDecodeError:
-                # JSON incompleto, seguir recibiendo
-                continue
-            except Exception as e:
-                print(f"Error procesando datos: {e}")
-                from traceback import print_exc
-
-                print_exc()
-                break
+        # SECURITY: Validar autenticación
+        if validar_token_cliente(json_data, client_ip):
+            guardar_datos_cliente(json_data)
 
+    except ErrorProtocolo as e:
+        print(f"[SECURITY] Mensaje rechazado desde {client_ip}: {e}")
     except ConnectionResetError:
         print(f"Conexión cerrada abruptamente por {addr}")
     except Exception as e:
@@ -899,36 +1253,66 @@ def main():
     Ejecuta un servidor TCP en puerto 5255 que recibe datos de clientes.
     Ya NO usa broadcasts UDP - el servidor solicita datos activamente.
     """
-    # Servidor TCP principal
-    server_socket = socket(AF_INET, SOCK_STREAM)
-    server_socket.bind((HOST, PORT))
-    server_socket.listen()
-    print(f"[OK] Servidor TCP escuchando en {HOST}:{PORT}")
+    try:
+        _, context = crear_contexto_tls_servidor()
+    except FileNotFoundError:
+        return
+
+    servidor = ServidorIngestaAsync(HOST, PORT, ssl_context=context)
     print(f"[OK] Sistema listo - Esperando clientes...\n")
 
     try:
-        while True:
-            conn, addr = server_socket.accept()
-            clientes.append(conn)
-            hilo = Thread(target=consultar_informacion, args=(conn, addr), daemon=True)
-            hilo.start()
+        servidor.ejecutar()
     except KeyboardInterrupt:
         print("\n[OK] Servidor detenido por usuario")
-        server_socket.close()
     except Exception as e:
         print(f"[ERROR] Error en servidor: {e}")
-        server_socket.close()
 
 
-def cargar_ips_desde_csv(archivo_csv=None):
+def cargar_hosts_descubiertos(incluir_agente=False, desde=None):
+    """
+    Carga las IPs descubiertas desde la tabla `hosts` con una sola consulta.
+
+    El escáner registra ahí cada host activo durante el escaneo; las IPs ya
+    se guardaron como enteros válidos, así que no hay que revalidarlas.
+
+    Args:
+        incluir_agente: Si True, agrega si el puerto del agente respondió
+            (True/False, o None si el equipo no se sondeó)
+        desde: Fecha ISO opcional: solo los hosts vistos desde entonces
+
+    Returns:
+        Lista de tuplas (ip, mac), o (ip, mac, agente) con incluir_agente
+    """
+    conn = sql.get_thread_safe_connection()
+    try:
+        hosts = sql.getHosts(desde, conn)
+    except Exception as e:
+        print(f"Error leyendo hosts descubiertos: {e}")
+        return []
+    finally:
+        conn.close()
+
+    print(f"[OK] Cargados {len(hosts)} hosts desde la tabla hosts")
+    if incluir_agente:
+        return [
+            (entero_a_ip(ip), mac or "", None if agente is None else bool(agente))
+            for ip, mac, agente, _ in hosts
+        ]
+    return [(entero_a_ip(ip), mac or "") for ip, mac, _, _ in hosts]
+
+
+def cargar_ips_desde_csv(archivo_csv=None, incluir_agente=False):
     """
     Carga lista de IPs desde archivo CSV generado por optimized_block_scanner.py
 
     Args:
         archivo_csv: Ruta al archivo CSV. Si es None, busca el más reciente.
+        incluir_agente: Si True, agrega la columna "agente" del escaneo TCP
+            (True/False, o None si el equipo no se sondeó)
 
     Returns:
-        Lista de tuplas (ip, mac)
+        Lista de tuplas (ip, mac), o (ip, mac, agente) con incluir_agente
     """
     if archivo_csv is None:
         # Buscar el CSV en output/ o en raíz
@@ -978,7 +1362,12 @@ def cargar_ips_desde_csv(archivo_csv=None):
                     # Verificar que sean números y rango válido
                     if all(p.isdigit() and 0 <= int(p) <= 255 for p in partes):
                         # if ':' in mac:  # Validar MAC también
-                        ips_macs.append((ip, mac))
+                        if incluir_agente:
+                            agente = (row.get("agente") or "").strip()
+                            agente = {"1": True, "0": False}.get(agente)
+                            ips_macs.append((ip, mac, agente))
+                        else:
+                            ips_macs.append((ip, mac))
 
                     else:
                         print(f"  [WARN] IP descartada (formato invalido): {ip}")
@@ -993,155 +1382,356 @@ def cargar_ips_desde_csv(archivo_csv=None):
         return []
 
 
-async def solicitar_datos_cliente(client_ip, client_port=5256, timeout=30):
-    """Solicita especificaciones a un cliente específico mediante GET_SPECS (ASÍNCRONO).
+def persistir_respuesta_get_specs(json_data, conn):
+    """Operación de escritura: reemplaza los datos de un dispositivo con su GET_SPECS.
+
+    Args:
+        json_data (dict): Respuesta del daemon del cliente
+        conn (sqlite3.Connection): Conexión del escritor de DB
+
+    Returns:
+        tuple: (serial, nombre del equipo)
+
+    Note:
+        Se ejecuta dentro del lote de `EscritorDB`; NO hace commit.
+    """
+    # Parsear datos para tabla Dispositivos
+    datos_dispositivo = parsear_datos_dispositivo(json_data)
+    serial = datos_dispositivo[0]
+    mac = datos_dispositivo[3]
+    name = datos_dispositivo[2]
+
+    print(f"        -> Parseado: Serial={serial}, MAC={mac}, Name={name}")
+
+    # Si el serial viene vacío, generar uno temporal basado en MAC
+    if not serial or serial.strip() == "":
+        if mac:
+            serial = f"TEMP_{mac.replace(':', '').replace('-', '')}"
+        else:
+            serial = "TEMP_UNKNOWN"
+        datos_dispositivo = (serial,) + datos_dispositivo[1:]
+        print(f"        -> Serial temporal generado: {serial}")
+
+    # Comparar el hash de cada sección con el último envío guardado
+    modulos_ram, discos, aplicaciones, huellas, cambiadas = comparar_huellas(
+        serial, datos_dispositivo, json_data, conn
+    )
+
+    # Limpiar solo los datos anteriores de las secciones que cambiaron
+    # (el estado de conexión se actualiza en su lugar con setActive)
+    tablas = {TABLAS_SECCION[sec] for sec in cambiadas if sec in TABLAS_SECCION}
+    if cambiadas:
+        tablas.add("informacion_diagnostico")
+    if tablas:
+        sql.limpiar_datos_dispositivo_threadsafe(serial, conn, tablas)
+        print(f"        -> Datos anteriores limpiados ({', '.join(sorted(tablas))})")
+
+    # Insertar/actualizar dispositivo
+    if "hardware" in cambiadas:
+        sql.setDevice(datos_dispositivo, conn)
+        print(f"        -> Dispositivo guardado: {datos_dispositivo}")
+
+    # Actualizar estado activo (siempre: es el "visto por última vez")
+    sql.setActive((serial, True, datetime.now().isoformat()), conn)
+    print(f"        -> Estado activo guardado")
+
+    # Guardar módulos RAM
+    if "memoria" in cambiadas:
+        print(f"        -> RAM: {len(modulos_ram)} modulos")
+        for i, modulo in enumerate(modulos_ram, 1):
+            sql.setMemoria(modulo, i, conn)
+
+    # Guardar almacenamiento
+    if "almacenamiento" in cambiadas:
+        print(f"        -> Almacenamiento: {len(discos)} discos")
+        for i, disco in enumerate(discos, 1):
+            sql.setAlmacenamiento(disco, i, conn)
+
+    # Guardar aplicaciones
+    if "aplicaciones" in cambiadas:
+        print(f"        -> Aplicaciones: {len(aplicaciones)} apps")
+        for app in aplicaciones:
+            try:
+                sql.setaplication(app, conn)
+            except:
+                pass  # Continuar si alguna falla
+
+    registrar_huellas(
+        serial,
+        huellas,
+        cambiadas,
+        filas_por_seccion(modulos_ram, discos, aplicaciones),
+        conn,
+    )
+    if not cambiadas:
+        return serial, name
+
+    # Guardar informe diagnóstico completo (es una foto de todas las secciones)
+    dxdiag_txt = json_data.get("dxdiag_output_txt", "")
+    json_str = dumps(json_data, indent=2)
+    sql.setInformeDiagnostico(
+        (serial, json_str, dxdiag_txt, datetime.now().isoformat()),
+        conn,
+    )
+    print(f"        -> Informe diagnostico guardado")
+
+    return serial, name
+
+
+_tls_consultas = None  # (usar_tls, contexto) cacheado para las consultas a daemons
+
+
+async def abrir_conexion_consulta(
+    client_ip, client_port, solicitud_de, misma_conexion=True
+):
+    """Conecta al daemon, envía la solicitud y prepara la lectura de la respuesta.
+
+    El daemon responde por la MISMA conexión. Con TLS activo la solicitud va en
+    claro (solo comando y ETag) y a continuación el servidor hace el handshake
+    TLS como servidor sobre esa conexión: el daemon actúa de cliente TLS y
+    verifica el certificado del servidor, igual que al enviar al puerto 5255.
 
     Args:
         client_ip: IP del cliente
-        client_port: Puerto del daemon del cliente (default 5256)
-        timeout: Timeout TOTAL en segundos (default 30 para dar tiempo a recopilación de datos)
+        client_port: Puerto del daemon
+        solicitud_de: Callable(respuesta) -> bytes que construye la solicitud
+            según el modo de respuesta ("tls" o "plain")
+        misma_conexion: False para daemons sin la capacidad "reply": la
+            conexión queda en claro (sin handshake) y los datos llegan por el
+            puerto 5255
 
     Returns:
-        True si se recibieron datos correctamente, False en caso contrario
+        tuple: (StreamReader, StreamWriter) listos para leer la respuesta
+
+    Raises:
+        FileNotFoundError: Si TLS está activo pero faltan los certificados
     """
-    from json import loads
+    from asyncio import (
+        StreamReader,
+        StreamReaderProtocol,
+        StreamWriter,
+        get_running_loop,
+    )
+
+    global _tls_consultas
+    if _tls_consultas is None:
+        _tls_consultas = crear_contexto_tls_servidor()
+    usar_tls, contexto = _tls_consultas
+
+    if not usar_tls or not misma_conexion:
+        reader, writer = await open_connection(client_ip, client_port)
+        writer.write(solicitud_de("plain"))
+        await writer.drain()
+        return reader, writer
+
+    try:
+        from config.security_config import TLS_HANDSHAKE_TIMEOUT
+    except ImportError:
+        TLS_HANDSHAKE_TIMEOUT = 10.0
+
+    loop = get_running_loop()
+    sock = socket(AF_INET, SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await loop.sock_connect(sock, (client_ip, client_port))
+        await loop.sock_sendall(sock, solicitud_de("tls"))
+
+        # Handshake TLS del lado servidor sobre la conexión ya establecida
+        reader = StreamReader(loop=loop)
+        protocolo = StreamReaderProtocol(reader, loop=loop)
+        transporte, _ = await loop.connect_accepted_socket(
+            lambda: protocolo,
+            sock,
+            ssl=contexto,
+            ssl_handshake_timeout=TLS_HANDSHAKE_TIMEOUT,
+        )
+    except BaseException:
+        sock.close()
+        raise
+    return reader, StreamWriter(transporte, protocolo, reader, loop)
+
+
+def obtener_etag_dispositivo(ip):
+    """Devuelve el último ETag guardado para la IP (None si no hay o falla la DB).
+
+    Usa una conexión de lectura propia y es bloqueante: desde el event loop
+    de consulta se ejecuta en el executor (no comparte el cursor de la UI).
+    """
+    conn = sql.get_thread_safe_connection()
+    try:
+        return sql.getEtagPorIp(ip, conn)
+    except Exception as e:
+        print(f"        -> No se pudo leer el ETag de {ip}: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+# Capacidades anunciadas en el sondeo de estado UDP: {ip: (momento, frozenset)}.
+# Las de los latidos se leen del servicio de estado (ver capacidades_daemon)
+_capacidades_daemon = {}
+
+
+def registrar_capacidades(ip, datos):
+    """Guarda las capacidades anunciadas por el daemon de `ip`.
+
+    Con `datos=None` las olvida: se vuelve a enviar solo "GET_SPECS" hasta el
+    próximo anuncio.
+    """
+    from time import time
+
+    _capacidades_daemon[ip] = (time(), capacidades_anunciadas(datos))
+
+
+def capacidades_daemon(ip):
+    """Extensiones de GET_SPECS que soporta el daemon de `ip`.
+
+    Usa el anuncio más reciente entre el sondeo de estado y el último latido.
+    Sin anuncio devuelve un conjunto vacío: los daemons antiguos solo entienden
+    el comando exacto "GET_SPECS".
+    """
+    from logica.estado_conexion import obtener_servicio_conexion
+
+    momento, capacidades = _capacidades_daemon.get(ip, (0.0, frozenset()))
+    latido = obtener_servicio_conexion().ultimo_latido(ip)
+    if latido and latido[0] > momento:
+        capacidades = capacidades_anunciadas(latido[1])
+    return capacidades
+
+
+async def pedir_specs(client_ip, client_port, capacidades, etag, timeout):
+    """Envía GET_SPECS con las extensiones que soporta el daemon y lee la respuesta.
+
+    Returns:
+        tuple: (cabecera, payload); payload vacío si el daemon cerró la
+        conexión (o rechazó el handshake TLS) sin responder
+    """
+    comando, argumentos = (
+        ("GET_SPECS_IF_CHANGED", [etag]) if etag else ("GET_SPECS", [])
+    )
+    aceptadas = COMPRESIONES_ACEPTADAS if "accept" in capacidades else ()
+    misma_conexion = "reply" in capacidades
+
+    # Anunciar las compresiones aceptadas y pedir la respuesta por esta conexión
+    def solicitud_de(respuesta):
+        return formatear_solicitud(
+            comando, aceptadas, argumentos, respuesta if misma_conexion else None
+        )
 
     try:
-        # Conectar de forma asíncrona (timeout 10s para la conexión)
+        # Conectar de forma asíncrona (timeout 10s para conexión + handshake TLS)
         reader, writer = await wait_for(
-            open_connection(client_ip, client_port), timeout=10.0
+            abrir_conexion_consulta(
+                client_ip, client_port, solicitud_de, misma_conexion
+            ),
+            timeout=10.0,
         )
-        writer.write(b"GET_SPECS")
-        await writer.drain()
+    except TimeoutError:
+        raise  # También es OSError: el equipo no contesta, no reintentar
+    except OSError:
+        if not misma_conexion:
+            raise
+        # Un daemon que no entendió la solicitud cierra sin hacer el handshake
+        return None, b""
 
-        # Recibir respuesta con timeout más largo
+    try:
+        # Recibir respuesta enmarcada (o JSON crudo hasta EOF de daemons antiguos)
         # El cliente puede tardar 10-30 segundos en recopilar datos
-        buffer = b""
-        start_time = get_event_loop().time()
+        return await wait_for(leer_mensaje(reader, MAX_BUFFER_SIZE), timeout=timeout)
+    finally:
+        # El daemon puede cerrar sin close_notify de TLS: no invalida lo leído
+        await cerrar_writer(writer)
 
-        while True:
-            try:
-                # Calcular tiempo restante
-                elapsed = get_event_loop().time() - start_time
-                remaining = timeout - elapsed
 
-                if remaining <= 0:
-                    break
+async def solicitar_datos_cliente(client_ip, client_port=5256, timeout=30):
+    """Solicita especificaciones a un cliente específico mediante GET_SPECS (ASÍNCRONO).
 
-                # Leer con timeout dinámico
-                chunk = await wait_for(
-                    reader.read(4096),
-                    timeout=min(remaining, 15.0),  # Máximo 15s por chunk
-                )
+    El daemon responde por la misma conexión (con TLS si está activo), de modo
+    que la latencia es el tiempo real de recolección y no el timeout.
 
-                if not chunk:
-                    break
+    Si el dispositivo ya informó un ETag se envía `GET_SPECS_IF_CHANGED <etag>`:
+    el daemon responde "not modified" sin recopilar nada cuando sus sondas no
+    cambiaron, y solo se actualiza su estado activo.
 
-                buffer += chunk
+    Las extensiones (IF_CHANGED, ACCEPT=, REPLY=) solo se envían si el daemon
+    las anunció en un latido o sondeo de estado; si aun así cierra sin
+    responder se reintenta con "GET_SPECS" a secas. Con ese formato el daemon
+    envía los datos al puerto 5255, que los ingesta por su cuenta.
 
-                # Si recibimos JSON completo
-                if buffer.endswith(b"}"):
-                    break
+    Args:
+        client_ip: IP del cliente
+        client_port: Puerto del daemon del cliente (default 5256)
+        timeout: Timeout TOTAL en segundos (default 30 para dar tiempo a recopilación de datos)
 
-            except TimeoutError:
-                # Si ya tenemos datos, salir del loop
-                if buffer:
-                    break
-                # Si no tenemos datos, continuar esperando
-                continue
+    Returns:
+        True si se recibieron datos (o "not modified") correctamente, o si un
+        daemon sin capacidades aceptó el GET_SPECS; False en caso contrario
+    """
+    from asyncio import get_running_loop
 
-        writer.close()
-        await writer.wait_closed()
+    loop = get_running_loop()
+    try:
+        capacidades = capacidades_daemon(client_ip)
+        etag = None
+        if "if_changed" in capacidades:
+            # Si el daemon ya informó un ETag, pedir datos solo si algo cambió
+            # (lectura sqlite en el executor: el loop solo hace I/O de red)
+            etag = await loop.run_in_executor(
+                None, obtener_etag_dispositivo, client_ip
+            )
+
+        cabecera, payload = await pedir_specs(
+            client_ip, client_port, capacidades, etag, timeout
+        )
+        if not payload and capacidades:
+            # Anunció capacidades pero no respondió: volver al formato antiguo
+            print("        -> Sin respuesta a la solicitud extendida, reintentando")
+            registrar_capacidades(client_ip, None)
+            capacidades = frozenset()
+            cabecera, payload = await pedir_specs(
+                client_ip, client_port, capacidades, None, timeout
+            )
+
+        print(f"        -> Recibidos {len(payload)} bytes, procesando...")
+
+        if not payload:
+            # Solo sin capacidades (tras el reintento): el daemon envía al 5255
+            print("        -> GET_SPECS aceptado, los datos llegan por el puerto 5255")
+            return True
 
-        print(f"        -> Recibidos {len(buffer)} bytes, procesando...")
+        # Descomprimir (con el mismo límite de tamaño) y decodificar JSON una sola
+        # vez, fuera del loop para no frenar los pings y lecturas en vuelo
+        json_data = await loop.run_in_executor(
+            None, decodificar_payload, cabecera, payload, MAX_BUFFER_SIZE
+        )
 
-        if not buffer:
+        # SECURITY: Misma validación de token que la ingesta en el puerto 5255,
+        # también para "not_modified" (si no, cualquiera marcaría el equipo activo)
+        if not validar_token_cliente(json_data, client_ip):
             return False
 
-        # Decodificar JSON
-        json_data = loads(buffer.decode("utf-8"))
+        # Sin cambios desde el último envío: solo actualizar "visto por última vez"
+        if json_data.get("status") == "not_modified":
+            await wrap_future(
+                obtener_escritor().enviar(actualizar_estado_ping, client_ip, None, True)
+            )
+            contador_escrituras.registrar_no_modificado()
+            print(f"        -> Sin cambios desde el último envío, solo estado activo")
+            return True
 
         # Validar que tenga campos mínimos
         if "SerialNumber" not in json_data or "MAC Address" not in json_data:
             return False
 
-        # Procesar y guardar TODOS los datos usando funciones de ejecutar_sql.py
+        # Procesar y guardar TODOS los datos en el escritor único de DB
         try:
-            # Crear conexión thread-safe para esta coroutine
-            thread_conn = sql.get_thread_safe_connection()
-
-            try:
-                # Parsear datos para tabla Dispositivos
-                datos_dispositivo = parsear_datos_dispositivo(json_data)
-                serial = datos_dispositivo[0]
-                mac = datos_dispositivo[3]
-                name = datos_dispositivo[2]
-
-                print(f"        -> Parseado: Serial={serial}, MAC={mac}, Name={name}")
-
-                # Si el serial viene vacío, generar uno temporal basado en MAC
-                if not serial or serial.strip() == "":
-                    if mac:
-                        serial = f"TEMP_{mac.replace(':', '').replace('-', '')}"
-                    else:
-                        serial = "TEMP_UNKNOWN"
-                    datos_dispositivo = (serial,) + datos_dispositivo[1:]
-                    print(f"        -> Serial temporal generado: {serial}")
-
-                # Limpiar datos anteriores del dispositivo
-                sql.limpiar_datos_dispositivo_threadsafe(serial, thread_conn)
-                print(f"        -> Datos anteriores limpiados")
-
-                # Insertar/actualizar dispositivo
-                sql.setDevice(datos_dispositivo, thread_conn)
-                print(f"        -> Dispositivo guardado: {datos_dispositivo}")
-
-                # Actualizar estado activo
-                sql.setActive((serial, True, datetime.now().isoformat()), thread_conn)
-                print(f"        -> Estado activo guardado")
-
-                # Guardar módulos RAM
-                modulos_ram = parsear_modulos_ram(json_data)
-                print(f"        -> RAM: {len(modulos_ram)} modulos")
-                for i, modulo in enumerate(modulos_ram, 1):
-                    sql.setMemoria(modulo, i, thread_conn)
-
-                # Guardar almacenamiento
-                discos = parsear_almacenamiento(json_data)
-                print(f"        -> Almacenamiento: {len(discos)} discos")
-                for i, disco in enumerate(discos, 1):
-                    sql.setAlmacenamiento(disco, i, thread_conn)
-
-                # Guardar aplicaciones
-                aplicaciones = parsear_aplicaciones(json_data)
-                print(f"        -> Aplicaciones: {len(aplicaciones)} apps")
-                for app in aplicaciones:
-                    try:
-                        sql.setaplication(app, thread_conn)
-                    except:
-                        pass  # Continuar si alguna falla
-
-                # Guardar informe diagnóstico completo
-                dxdiag_txt = json_data.get("dxdiag_output_txt", "")
-                json_str = dumps(json_data, indent=2)
-                sql.setInformeDiagnostico(
-                    (serial, json_str, dxdiag_txt, datetime.now().isoformat()),
-                    thread_conn,
-                )
-                print(f"        -> Informe diagnostico guardado")
-
-                # Commit cambios
-                thread_conn.commit()
-                print(f"        -> COMMIT exitoso")
-
-                print(
-                    f"        -> Guardado: {name} | Serial: {serial} | IP: {client_ip}"
-                )
-                return True
+            serial, name = await wrap_future(
+                obtener_escritor().enviar(persistir_respuesta_get_specs, json_data)
+            )
+            print(f"        -> COMMIT exitoso")
 
-            finally:
-                # Siempre cerrar la conexión
-                thread_conn.close()
+            print(f"        -> Guardado: {name} | Serial: {serial} | IP: {client_ip}")
+            return True
 
         except Exception as e:
             print(f"        -> Error guardando datos: {e}")
@@ -1150,157 +1740,288 @@ async def solicitar_datos_cliente(client_ip, client_port=5256, timeout=30):
     except TimeoutError:
         print(f"        -> Timeout conectando a {client_ip}")
         return False
+    except ErrorProtocolo as e:
+        print(f"        -> Respuesta inválida de {client_ip}: {e}")
+        return False
     except Exception as e:
         print(f"        -> Error: {e}")
         return False
 
 
-def consultar_dispositivos_desde_csv(archivo_csv=None, callback_progreso=None):
+def actualizar_estado_ping(ip, mac, activo, conn):
+    """Operación de escritura: registra el resultado de ping de un dispositivo.
+
+    Args:
+        ip (str): IP consultada
+        mac (str): MAC conocida (se usa para buscar el dispositivo si existe)
+        activo (bool): Resultado del ping
+        conn (sqlite3.Connection): Conexión del escritor de DB
+
+    Returns:
+        str | None: Serial del dispositivo actualizado, o None si no está en la DB
     """
-    Consulta todos los dispositivos del CSV y solicita sus datos EN PARALELO.
-    Emite progreso en tiempo real a través de callback_progreso.
+    cur = conn.cursor()
+
+    # Buscar dispositivo por MAC o IP
+    if mac:
+        sql_query, params = sql.abrir_consulta("Dispositivos-select.sql", {"MAC": mac})
+    else:
+        sql_query = "SELECT * FROM Dispositivos WHERE ip = ?"
+        params = (ip,)
+
+    cur.execute(sql_query, params)
+    dispositivo = cur.fetchone()
+    if not dispositivo:
+        return None
+
+    serial = dispositivo[0]
+    # Estado actual en su lugar; el log de transiciones solo crece si cambió
+    sql.setActive((serial, activo, datetime.now().isoformat()), conn)
+    return serial
+
+
+def registrar_host_descubierto(ip, conn):
+    """Operación de escritura: alta de un host encontrado por el escaneo.
+
+    Si la IP no está en la DB se crea un registro temporal (TEMP_IP_...) que
+    el cliente completa al enviar sus datos; en ambos casos queda encendido.
 
     Args:
-        archivo_csv: Ruta al CSV. Si es None, usa el más reciente.
-        callback_progreso: Función callback(datos) donde datos={'ip', 'mac', 'activo', 'serial', 'index', 'total'}
+        ip (str): IP del host activo
+        conn (sqlite3.Connection): Conexión del escritor de DB
 
     Returns:
-        Tupla (activos, total)
+        bool: True si el dispositivo es nuevo
     """
-    from asyncio import gather
+    cur = conn.cursor()
+    cur.execute("SELECT serial FROM Dispositivos WHERE ip = ?", (ip,))
+    existente = cur.fetchone()
+    if existente:
+        serial = existente[0]
+    else:
+        serial = f"TEMP_IP_{ip.replace('.', '_')}"
+        sql.setDevice((serial, 0, "", "", "", "", "", "", 0, "", ip, 1), conn)
+    sql.setActive((serial, True, datetime.now().isoformat()), conn)
+    return existente is None
 
-    ips_macs = cargar_ips_desde_csv(archivo_csv)
-    total = len(ips_macs)
 
-    print(f"\n=== Consultando {total} dispositivos en paralelo ===")
+async def persistir_descubrimientos(eventos):
+    """Sumidero del escaneo: registra cada host activo a medida que aparece.
 
-    # Crear un diccionario para mapear IP -> índice en la tabla
-    ip_to_row = {}
+    Cada evento se encola en el escritor de DB, que agrupa los commits
+    (DB_WRITER_BATCH_MS), así que los hosts quedan en la base durante el
+    escaneo y no en un lote al final.
 
-    async def ping_y_actualizar_dispositivo(ip, mac, index):
-        """Hace ping, y si está activo solicita datos completos"""
-        try:
-            # Usar utilitario centralizado de ping (timeout 1s)
-            activo = await ping_host(ip, 1.0)
+    Args:
+        eventos: Iterador asíncrono de EventoDescubrimiento
+            (ver `optimized_block_scanner.main(sumideros=...)`)
 
-            serial = None
+    Returns:
+        int: Dispositivos nuevos agregados a la DB
+    """
+    from asyncio import gather
 
-            # Si está activo, solicitar datos completos
-            if activo:
-                print(
-                    f"\n  [{index}/{total}] {ip} ACTIVO - Solicitando datos completos..."
-                )
-                try:
-                    resultado = await solicitar_datos_cliente(ip)
-                    if resultado:
-                        print(
-                            f"  [{index}/{total}] {ip} - [OK] Datos obtenidos y guardados"
-                        )
-                    else:
-                        print(f"  [{index}/{total}] {ip} - [WARN] Cliente no respondió")
-                except Exception as e:
-                    print(f"  [{index}/{total}] {ip} - [ERROR] {e}")
+    escritor = obtener_escritor()
+    pendientes = []
+    async for evento in eventos:
+        pendientes.append(
+            wrap_future(escritor.enviar(registrar_host_descubierto, evento.ip))
+        )
 
-            # Actualizar estado en DB
-            try:
-                thread_conn = sql.get_thread_safe_connection()
-                thread_cursor = thread_conn.cursor()
+    resultados = await gather(*pendientes, return_exceptions=True)
+    errores = [r for r in resultados if isinstance(r, Exception)]
+    nuevos = sum(1 for r in resultados if r is True)
+    print(
+        f"[Scanner] DB: {len(resultados)} hosts registrados "
+        f"({nuevos} nuevos, {len(errores)} errores)"
+    )
+    if errores:
+        print(f"[Scanner] Primer error registrando hosts: {errores[0]}")
+    return nuevos
 
-                # Buscar dispositivo por MAC o IP
-                if mac:
-                    sql_query, params = sql.abrir_consulta(
-                        "Dispositivos-select.sql", {"MAC": mac}
-                    )
-                else:
-                    sql_query = "SELECT * FROM Dispositivos WHERE ip = ?"
-                    params = (ip,)
 
-                thread_cursor.execute(sql_query, params)
-                dispositivo = thread_cursor.fetchone()
+def consultar_dispositivos_desde_csv(archivo_csv=None, callback_progreso=None):
+    """
+    Consulta todos los dispositivos del CSV y solicita sus datos EN PARALELO.
+    Emite progreso en tiempo real a través de callback_progreso.
 
-                if dispositivo:
-                    serial = dispositivo[0]
-                    # Eliminar estado anterior si existe, luego insertar el nuevo
-                    thread_cursor.execute(
-                        "DELETE FROM activo WHERE Dispositivos_serial = ?", (serial,)
-                    )
-                    thread_cursor.execute(
-                        "INSERT INTO activo (Dispositivos_serial, powerOn, date) VALUES (?, ?, ?)",
-                        (serial, activo, datetime.now().isoformat()),
-                    )
-                    thread_conn.commit()
+    Motor de ventana deslizante en dos etapas: pings en vuelo según un control
+    AIMD (arranca en PING_BATCH_SIZE, sube mientras los timeouts se mantienen
+    en su nivel habitual y se recorta ante un salto de pérdidas o lag del loop)
+    y, para los equipos que responden, hasta SPECS_FETCH_CONCURRENCY
+    solicitudes GET_SPECS en vuelo. Un cliente lento no frena a los demás y
+    cada resultado se emite apenas termina.
 
-                thread_conn.close()
-            except Exception as e:
-                pass  # Silenciar errores de DB para no saturar el log
+    Args:
+        archivo_csv: Ruta a un CSV. Si es None, usa la tabla `hosts` que
+            registra el escáner (o el último CSV si la tabla está vacía).
+        callback_progreso: Función callback(datos) donde datos={'ip', 'mac', 'activo', 'serial', 'index', 'total'}
 
-            # Emitir progreso en tiempo real
-            if callback_progreso:
-                callback_progreso(
-                    {
-                        "ip": ip,
-                        "mac": mac,
-                        "activo": activo,
-                        "serial": serial,
-                        "index": index,
-                        "total": total,
-                    }
-                )
+    Returns:
+        Tupla (activos, total)
+    """
+    from asyncio import Queue, gather
+    from logica.async_utils import (
+        ControlAIMD,
+        MedidorLatenciaLoop,
+        iterar_cola,
+        ventana_deslizante,
+    )
+    from logica.estado_conexion import obtener_servicio_conexion
 
-            status = "ACTIVO" if activo else "Desconectado"
-            print(f"  [{index}/{total}] {ip}: {status}")
+    if archivo_csv is None:
+        ips_macs = cargar_hosts_descubiertos(incluir_agente=True)
+        if not ips_macs:
+            # Sin hosts registrados (DB anterior a la tabla): último CSV exportado
+            ips_macs = cargar_ips_desde_csv(incluir_agente=True)
+    else:
+        ips_macs = cargar_ips_desde_csv(archivo_csv, incluir_agente=True)
+    total = len(ips_macs)
 
-            return activo
+    # Límites de concurrencia desde .env (pings y GET_SPECS por separado)
+    try:
+        from config.security_config import PING_BATCH_SIZE, SPECS_FETCH_CONCURRENCY
+    except ImportError:
+        PING_BATCH_SIZE = 50  # Fallback
+        SPECS_FETCH_CONCURRENCY = 10
+
+    control_pings = ControlAIMD(inicial=PING_BATCH_SIZE)
+    print(
+        f"\n=== Consultando {total} dispositivos en paralelo "
+        f"({control_pings.limite} pings iniciales / {SPECS_FETCH_CONCURRENCY} "
+        f"GET_SPECS en vuelo) ==="
+    )
 
-        except Exception as e:
-            # Emitir error también
-            if callback_progreso:
-                callback_progreso(
-                    {
-                        "ip": ip,
-                        "mac": mac,
-                        "activo": False,
-                        "serial": None,
-                        "index": index,
-                        "total": total,
-                        "error": str(e),
-                    }
-                )
-            return False
+    activos = 0
 
-    async def consultar_todos():
-        # Crear tareas para todos los dispositivos
-        tareas = []
-        for idx, (ip, mac) in enumerate(ips_macs, 1):
-            tareas.append(ping_y_actualizar_dispositivo(ip, mac, idx))
+    def emitir(datos):
+        if callback_progreso:
+            callback_progreso(datos)
 
-        # Cargar batch_size desde .env
+    async def registrar_estado(index, ip, mac, activo):
+        """Guarda el resultado del ping y emite el progreso del dispositivo"""
+        nonlocal activos
+        serial = None
+
+        # Actualizar estado en DB (escritor único, commit agrupado)
         try:
-            from config.security_config import PING_BATCH_SIZE
+            serial = await wrap_future(
+                obtener_escritor().enviar(actualizar_estado_ping, ip, mac, activo)
+            )
+        except Exception as e:
+            pass  # Silenciar errores de DB para no saturar el log
+
+        if activo:
+            activos += 1
+
+        # Emitir progreso en tiempo real
+        emitir(
+            {
+                "ip": ip,
+                "mac": mac,
+                "activo": activo,
+                "serial": serial,
+                "index": index,
+                "total": total,
+            }
+        )
 
-            batch_size = PING_BATCH_SIZE
-        except ImportError:
-            batch_size = 50  # Fallback
-
-        # Ejecutar en lotes para no saturar la red
-        resultados = []
-        for i in range(0, len(tareas), batch_size):
-            batch = tareas[i : i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (len(tareas) - 1) // batch_size + 1
-            print(
-                f"\n>> Procesando lote {batch_num}/{total_batches} ({len(batch)} dispositivos)..."
+        status = "ACTIVO" if activo else "Desconectado"
+        print(f"  [{index}/{total}] {ip}: {status}")
+        return activo
+
+    def al_completar(item, resultado):
+        """Emite el error de un dispositivo cuya etapa lanzó una excepción"""
+        if isinstance(resultado, Exception):
+            index, ip, mac, _ = item
+            emitir(
+                {
+                    "ip": ip,
+                    "mac": mac,
+                    "activo": False,
+                    "serial": None,
+                    "index": index,
+                    "total": total,
+                    "error": str(resultado),
+                }
             )
-            batch_results = await gather(*batch, return_exceptions=True)
-            resultados.extend(batch_results)
 
-        return resultados
+    medidor = MedidorLatenciaLoop()
+    servicio = obtener_servicio_conexion()
 
-    # Ejecutar consulta asíncrona
-    resultados = run_async(consultar_todos)
-    activos = sum(1 for r in resultados if r is True)
+    async def consultar_todos():
+        cola_specs = Queue()
+        fin = object()
+        # Toda la DB va al escritor/executor: el lag del loop debe quedar en ms
+        medidor.iniciar()
+
+        async def etapa_ping(item):
+            """Hace ping; los activos pasan a la etapa de GET_SPECS"""
+            index, ip, mac, agente = item
+            # Estado compartido con la UI y el monitor (cache vigente o ping de 1s)
+            activo = await servicio.verificar(ip, 1.0)
+            control_pings.registrar(activo)
+            if not activo:
+                return await registrar_estado(index, ip, mac, False)
+            if agente is False:
+                # El escaneo TCP no encontró el daemon: GET_SPECS no respondería
+                print(f"  [{index}/{total}] {ip} ACTIVO sin agente - sin GET_SPECS")
+                return await registrar_estado(index, ip, mac, True)
+            await cola_specs.put(item)
+            return True
+
+        async def etapa_specs(item):
+            """Solicita datos completos a un dispositivo que respondió el ping"""
+            index, ip, mac, _ = item
+            print(f"\n  [{index}/{total}] {ip} ACTIVO - Solicitando datos completos...")
+            try:
+                resultado = await solicitar_datos_cliente(ip)
+                if resultado:
+                    print(
+                        f"  [{index}/{total}] {ip} - [OK] Datos obtenidos y guardados"
+                    )
+                else:
+                    print(f"  [{index}/{total}] {ip} - [WARN] Cliente no respondió")
+            except Exception as e:
+                print(f"  [{index}/{total}] {ip} - [ERROR] {e}")
+            return await registrar_estado(index, ip, mac, True)
 
-    print(f"\n=== Consulta finalizada: {activos}/{total} dispositivos activos ===\n")
+        async def pings():
+            try:
+                await ventana_deslizante(
+                    ((i, *fila) for i, fila in enumerate(ips_macs, 1)),
+                    etapa_ping,
+                    control_pings,
+                    al_completar,
+                )
+            finally:
+                await cola_specs.put(fin)  # No habrá más equipos activos
+
+        try:
+            await gather(
+                pings(),
+                ventana_deslizante(
+                    iterar_cola(cola_specs, fin),
+                    etapa_specs,
+                    SPECS_FETCH_CONCURRENCY,
+                    al_completar,
+                ),
+            )
+        finally:
+            await medidor.detener()
+
+    # Ejecutar consulta asíncrona (contadores de escrituras evitadas por corrida)
+    contador_escrituras.reiniciar()
+    run_async(consultar_todos)
+
+    print(f"\n=== Consulta finalizada: {activos}/{total} dispositivos activos ===")
+    print(f"=== Escrituras evitadas: {contador_escrituras.resumen()} ===")
+    lag = medidor.resumen()
+    print(
+        f"=== Lag del event loop: p50 {lag['p50_ms']} ms, p95 {lag['p95_ms']} ms, "
+        f"max {lag['max_ms']} ms ==="
+    )
+    print(f"=== Pings: {control_pings.resumen()} ===\n")
     return activos, total
 
 
@@ -1320,102 +2041,199 @@ def obtener_dispositivos_db():
         return []
 
 
-def monitorear_dispositivos_periodicamente(
-    intervalo_minutos=0.15, callback_progreso=None
-):
+def obtener_ips_dispositivos():
     """
-    Monitorea dispositivos periódicamente para actualizar su estado activo.
+    IPs de los dispositivos registrados (para el sondeo de estados).
+
+    Usa una conexión propia: se llama desde el hilo de sondeo.
+
+    Returns:
+        Lista de IPs (sin vacíos)
+    """
+    conn = sql.get_thread_safe_connection()
+    try:
+        filas = conn.execute(
+            "SELECT DISTINCT ip FROM Dispositivos WHERE ip IS NOT NULL AND ip != ''"
+        ).fetchall()
+        return [fila[0] for fila in filas]
+    except Exception as e:
+        print(f"Error obteniendo IPs de dispositivos: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def obtener_dispositivos_monitoreo():
+    """
+    (serial, ip) de los dispositivos con IP, para el monitor periódico.
+
+    Usa una conexión propia: el monitor corre en su propio hilo.
+    """
+    conn = sql.get_thread_safe_connection()
+    try:
+        return conn.execute(
+            "SELECT serial, ip FROM Dispositivos WHERE ip IS NOT NULL AND ip != ''"
+        ).fetchall()
+    except Exception as e:
+        print(f"Error obteniendo dispositivos: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def registrar_estados(estados, conn):
+    """Operación de escritura: guarda el estado de una pasada completa del monitor.
+
+    Se envía como UNA operación al escritor de DB, así toda la pasada queda en
+    una sola transacción sin importar cuántos dispositivos haya.
 
     Args:
-        intervalo_minutos: Intervalo entre consultas en minutos
-        callback_progreso: Función callback para reportar progreso
+        estados: Lista de tuplas (serial, activo)
+        conn: Conexión del escritor de DB
 
     Returns:
-        Esta función corre indefinidamente hasta ser interrumpida
+        int: Cantidad de dispositivos que cambiaron de estado
     """
-    from time import sleep
+    fecha = datetime.now().isoformat()
+    return sum(
+        sql.setActive((serial, activo, fecha), conn) for serial, activo in estados
+    )
 
-    print(f"\n=== Iniciando monitoreo periódico (cada {intervalo_minutos} min) ===\n")
 
-    while True:
-        try:
-            # Obtener dispositivos de la DB
-            dispositivos = obtener_dispositivos_db()
+def _percentil(valores, p):
+    """Percentil `p` (0-1) de una lista de valores (0.0 si está vacía)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
 
-            if not dispositivos:
-                print("No hay dispositivos para monitorear")
-                sleep(intervalo_minutos * 60)
-                continue
 
-            print(
-                f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Monitoreando {len(dispositivos)} dispositivos..."
-            )
+def monitorear_dispositivos_periodicamente(
+    intervalo_minutos=0.15, callback_progreso=None, detener=None
+):
+    """
+    Monitorea dispositivos periódicamente para actualizar su estado activo.
+
+    Cada pasada obtiene el estado de todos los dispositivos a la vez desde el
+    servicio compartido (pings concurrentes por un solo socket) y los guarda en
+    una única transacción. Las pasadas arrancan a cadencia fija (sin deriva):
+    si una pasada dura más que el intervalo, los turnos perdidos se omiten en
+    lugar de encadenar pasadas atrasadas.
+
+    Args:
+        intervalo_minutos: Intervalo entre consultas en minutos
+        callback_progreso: Función callback(ip, total, index) para reportar progreso
+        detener: threading.Event opcional para terminar el monitoreo
 
-            activos = 0
-            for i, dispositivo in enumerate(dispositivos, 1):
-                serial = dispositivo[0]
-                ip = dispositivo[10]
+    Returns:
+        dict: Métricas acumuladas (pasadas, desfasadas, turnos_omitidos) al
+        detenerse; corre indefinidamente hasta ser interrumpida
 
-                if not ip:
-                    continue
+    Raises:
+        ValueError: Si intervalo_minutos no es positivo
+    """
+    from threading import Event
+    from time import monotonic, time
+    from traceback import print_exc
+    from logica.estado_conexion import obtener_servicio_conexion
+
+    if intervalo_minutos <= 0:
+        raise ValueError(
+            f"intervalo_minutos debe ser positivo (recibido {intervalo_minutos})"
+        )
 
-                if callback_progreso:
-                    callback_progreso(ip, len(dispositivos), i)
+    servicio = obtener_servicio_conexion()
+    detener = detener or Event()
+    intervalo = intervalo_minutos * 60
+    metricas = {"pasadas": 0, "desfasadas": 0, "turnos_omitidos": 0}
 
-                # Hacer ping al dispositivo
-                try:
-                    from subprocess import run, CREATE_NO_WINDOW
+    print(f"\n=== Iniciando monitoreo periódico (cada {intervalo_minutos} min) ===\n")
 
-                    thread_conn = sql.get_thread_safe_connection()
-                    ping_result = run(
-                        ["ping", "-n", "1", "-w", "1000", ip],
-                        capture_output=True,
-                        creationflags=CREATE_NO_WINDOW,
-                    )
-                    print(
-                        f"  [PING] {ip}: {ping_result.stdout.decode('utf-8').strip()}"
-                    )
+    def pasada():
+        """Una ronda completa: estados concurrentes + una transacción."""
+        dispositivos = obtener_dispositivos_monitoreo()
+        if not dispositivos:
+            print("No hay dispositivos para monitorear")
+            return
 
-                    esta_activo = ping_result.returncode == 0
+        total = len(dispositivos)
+        print(
+            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
+            f"Monitoreando {total} dispositivos..."
+        )
 
-                    # Actualizar estado en DB
-                    sql.setActive(
-                        (serial, esta_activo, datetime.now().isoformat()), thread_conn
-                    )
-                    thread_conn.commit()
-                    thread_conn.close()
+        # Estados desde el servicio compartido (cache vigente o ping concurrente)
+        inicio_consulta = time()
+        estados = run_async(servicio.consultar, [ip for _, ip in dispositivos])
 
-                    if esta_activo:
-                        activos += 1
-                        print(f"  [OK] {ip} ({serial}): Activo")
-                    else:
-                        print(f"  [X] {ip} ({serial}): Inactivo")
+        activos = 0
+        for i, (serial, ip) in enumerate(dispositivos, 1):
+            if callback_progreso:
+                callback_progreso(ip, total, i)
+            if estados[ip].activo:
+                activos += 1
+                # Los activos por latido no tienen RTT (no se les hizo ping)
+                rtt = estados[ip].rtt_ms
+                detalle = f", {rtt:.1f} ms" if rtt is not None else ""
+                print(f"  [OK] {ip} ({serial}): Activo{detalle}")
+            else:
+                print(f"  [X] {ip} ({serial}): Inactivo")
 
-                except Exception as e:
-                    print(f"  {ip} ({serial}): Error - {e}")
-                    thread_conn = sql.get_thread_safe_connection()
-                    sql.setActive(
-                        (serial, False, datetime.now().isoformat()), thread_conn
-                    )
-                    thread_conn.commit()
-                    thread_conn.close()
+        # Toda la pasada en una sola transacción del escritor de DB
+        transiciones = obtener_escritor().ejecutar(
+            registrar_estados,
+            [(serial, estados[ip].activo) for serial, ip in dispositivos],
+        )
 
-            # Commit cambios
-            sql.connection.commit()
+        # Latencia solo de los pings de esta pasada (sin aciertos de cache)
+        rtts = [
+            e.rtt_ms
+            for e in estados.values()
+            if e.rtt_ms is not None and e.ultima_verificacion >= inicio_consulta
+        ]
+        latencia = (
+            f"latencia p50 {_percentil(rtts, 0.50):.1f} ms, "
+            f"p95 {_percentil(rtts, 0.95):.1f} ms ({len(rtts)} pings)"
+            if rtts
+            else "sin pings en esta pasada"
+        )
+        print(
+            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Monitoreo completado: "
+            f"{activos}/{total} activos, {transiciones} cambios de estado | {latencia}"
+        )
 
+    proxima = monotonic()
+    try:
+        while not detener.is_set():
+            inicio = monotonic()
+            try:
+                pasada()
+            except Exception as e:
+                print(f"Error en monitoreo: {e}")
+                print_exc()
+            duracion = monotonic() - inicio
+            metricas["pasadas"] += 1
+
+            # Cadencia fija: la próxima pasada se programa desde la anterior,
+            # no desde que terminó ésta; si se pasó, omitir los turnos perdidos
+            proxima += intervalo
+            ahora = monotonic()
+            if ahora > proxima:
+                omitidos = int((ahora - proxima) // intervalo) + 1
+                proxima += omitidos * intervalo
+                metricas["desfasadas"] += 1
+                metricas["turnos_omitidos"] += omitidos
+                print(
+                    f"[WARN] Pasada de {duracion:.1f}s excedió el intervalo de "
+                    f"{intervalo:.1f}s ({omitidos} turno(s) omitido(s))"
+                )
             print(
-                f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Monitoreo completado: {activos}/{len(dispositivos)} activos\n"
+                f"    Duración {duracion:.1f}s | pasadas {metricas['pasadas']}, "
+                f"desfasadas {metricas['desfasadas']}\n"
             )
 
-            # Esperar antes de la próxima ronda
-            sleep(intervalo_minutos * 60)
-
-        except KeyboardInterrupt:
-            print("\n=== Monitoreo detenido por usuario ===")
-            break
-        except Exception as e:
-            print(f"Error en monitoreo: {e}")
-            from traceback import print_exc
+            detener.wait(max(0.0, proxima - monotonic()))
+    except KeyboardInterrupt:
+        print("\n=== Monitoreo detenido por usuario ===")
 
-            print_exc()
-            sleep(10)
+    return metricas
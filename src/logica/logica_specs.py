@@ -223,6 +223,152 @@ def preparar_datos_completos():
     return new
 
 
+# Claves del registro con el software instalado (para detectar altas/bajas)
+_CLAVES_SOFTWARE = (
+    ("HKEY_LOCAL_MACHINE", r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
+    (
+        "HKEY_LOCAL_MACHINE",
+        r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall",
+    ),
+    ("HKEY_CURRENT_USER", r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
+)
+_serial_cache = None  # El serial del BIOS no cambia mientras corre el proceso
+
+
+def _sonda_software():
+    """Resumen barato del software instalado: (subclaves, última modificación).
+
+    Lee solo la metadata de las claves Uninstall del registro (QueryInfoKey),
+    sin enumerar cada aplicación como hace get_installed_software().
+    """
+    try:
+        import winreg
+    except ImportError:
+        return []
+
+    resumen = []
+    for raiz, ruta in _CLAVES_SOFTWARE:
+        try:
+            with winreg.OpenKey(getattr(winreg, raiz), ruta) as clave:
+                subclaves, _, modificada = winreg.QueryInfoKey(clave)
+                resumen.append((raiz, ruta, subclaves, modificada))
+        except OSError:
+            continue
+    return resumen
+
+
+def calcular_etag():
+    """Calcula la huella (ETag) del equipo con sondas de identidad baratas.
+
+    Incluye serial, nombre, MAC, RAM total, núcleos, particiones, metadata del
+    software instalado y del informe DirectX. NO ejecuta informe(): no hay
+    cpu_percent de 1 s, ni dxdiag, ni enumeración de aplicaciones.
+
+    Returns:
+        str: Hash SHA-256 hexadecimal
+    """
+    global _serial_cache
+    from hashlib import sha256
+    from socket import gethostname
+
+    import psutil
+    from getmac import get_mac_address as gma
+
+    if _serial_cache is None:
+        # Import con fallback para PyInstaller
+        try:
+            from datos.serialNumber import get_serial
+        except ImportError:
+            from ..datos.serialNumber import get_serial
+        _serial_cache = get_serial()
+
+    particiones = []
+    for particion in psutil.disk_partitions():
+        try:
+            total = psutil.disk_usage(particion.mountpoint).total
+        except (PermissionError, OSError):
+            total = None
+        particiones.append((particion.device, particion.fstype, total))
+
+    try:
+        from config.security_config import OUTPUT_DIR
+    except ImportError:
+        OUTPUT_DIR = "output"
+    output_dir = Path(__file__).parent.parent.parent / OUTPUT_DIR
+    dxdiag_file = output_dir / "dxdiag_output.txt"
+    dxdiag = None
+    if dxdiag_file.exists():
+        estado = dxdiag_file.stat()
+        dxdiag = (estado.st_size, int(estado.st_mtime))
+
+    sondas = {
+        "serial": _serial_cache,
+        "nombre": gethostname(),
+        "mac": gma(),
+        "ram": psutil.virtual_memory().total,
+        "nucleos": psutil.cpu_count(logical=True),
+        "particiones": sorted(particiones, key=str),
+        "software": _sonda_software(),
+        "dxdiag": dxdiag,
+    }
+    canonico = dumps(sondas, sort_keys=True, default=str)
+    return sha256(canonico.encode("utf-8")).hexdigest()
+
+
+def _ruta_cache_etag():
+    return Path(__file__).parent.parent.parent / "output" / "etag_cache.json"
+
+
+def guardar_cache_etag(etag):
+    """Recuerda el ETag y la fecha de la última recolección completa enviada."""
+    ruta = _ruta_cache_etag()
+    ruta.parent.mkdir(exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        dump({"etag": etag, "fecha": datetime.now().timestamp()}, f)
+
+
+def leer_cache_etag():
+    """Devuelve {"etag", "fecha"} de la última recolección completa, o None."""
+    try:
+        with open(_ruta_cache_etag(), "r", encoding="utf-8") as f:
+            return load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def especificaciones_sin_cambios(etag_servidor):
+    """Decide si un GET_SPECS_IF_CHANGED puede responderse con "not modified".
+
+    Args:
+        etag_servidor (str): Último ETag que el servidor guardó de este equipo
+
+    Returns:
+        tuple: (sin_cambios, etag_actual)
+            sin_cambios es True solo si el ETag del servidor coincide con el de
+            la última recolección completa, las sondas actuales dan el mismo
+            ETag y no pasó SPECS_MAX_AGE_HOURS desde esa recolección.
+    """
+    try:
+        from config.security_config import SPECS_MAX_AGE_HOURS
+    except ImportError:
+        SPECS_MAX_AGE_HOURS = 168
+
+    etag_actual = calcular_etag()
+
+    cache = leer_cache_etag()
+    if cache is None:
+        return False, etag_actual  # Sin recolección previa registrada
+
+    edad_horas = (datetime.now().timestamp() - cache.get("fecha", 0)) / 3600
+    sin_cambios = (
+        bool(etag_servidor)
+        and etag_servidor == cache.get("etag")
+        and etag_servidor == etag_actual
+        and edad_horas < SPECS_MAX_AGE_HOURS
+    )
+    return sin_cambios, etag_actual
+
+
 def get_license_status(a=0):
     """Obtiene estado o fecha de expiración de licencia Windows via slmgr.vbs.
 
@@ -266,18 +412,243 @@ def get_license_status(a=0):
         return None
 
 
-def enviar_a_servidor(server_ip=None):
+def serializar_mensaje(datos, compresiones_aceptadas=None):
+    """Serializa `datos` para enviarlos al servidor.
+
+    Usa el protocolo enmarcado (cabecera con longitud) de `logica.protocolo`.
+    Durante la migración puede desactivarse con FRAMED_PROTOCOL=false para
+    hablar con servidores antiguos que esperan JSON crudo.
+
+    Args:
+        datos (dict): Especificaciones a enviar
+        compresiones_aceptadas (list, optional): Compresiones anunciadas por el
+            servidor en GET_SPECS. None (envío manual) = sin comprimir.
+
+    Returns:
+        bytes: Mensaje listo para `sendall()`
+    """
+    try:
+        from config.security_config import (
+            FRAMED_PROTOCOL,
+            PAYLOAD_COMPRESSION,
+            COMPRESSION_LEVEL,
+        )
+    except ImportError:
+        FRAMED_PROTOCOL = True
+        PAYLOAD_COMPRESSION = "zstd,zlib"
+        COMPRESSION_LEVEL = 6
+
+    if not FRAMED_PROTOCOL:
+        return dumps(datos).encode("utf-8")
+
+    # Import con fallback para PyInstaller
+    try:
+        from logica.protocolo import (
+            codificar_json,
+            elegir_compresion,
+            parsear_compresiones,
+        )
+    except ImportError:
+        from .protocolo import codificar_json, elegir_compresion, parsear_compresiones
+
+    # Solo se comprime con un algoritmo que el servidor haya anunciado
+    compresion = elegir_compresion(
+        compresiones_aceptadas or [], parsear_compresiones(PAYLOAD_COMPRESSION)
+    )
+    return codificar_json(datos, compresion, COMPRESSION_LEVEL)
+
+
+def crear_contexto_tls_cliente():
+    """Crea el contexto TLS del cliente que verifica el certificado del servidor.
+
+    Returns:
+        ssl.SSLContext | None: Contexto listo para `wrap_socket`, o None si el
+        certificado del servidor no se encuentra.
+    """
+    import ssl
+
+    try:
+        from config.security_config import TLS_CERT_PATH
+    except ImportError:
+        TLS_CERT_PATH = "config/server.crt"
+
+    cert_path = Path(TLS_CERT_PATH)
+    if not cert_path.exists():
+        # Buscar en ruta alternativa
+        cert_path = Path(__file__).parent.parent.parent / TLS_CERT_PATH
+
+    if not cert_path.exists():
+        _print_status(f"[ERROR] Certificado TLS no encontrado: {TLS_CERT_PATH}")
+        _print_status(f"[INFO] Desactiva TLS con USE_TLS=false en .env")
+        return None
+
+    context = ssl.create_default_context()
+    context.check_hostname = False  # Permitir IPs locales
+    context.verify_mode = ssl.CERT_REQUIRED
+    context.load_verify_locations(str(cert_path))
+    return context
+
+
+def preparar_mensaje(client_ip, compresiones_aceptadas=None):
+    """Recopila las especificaciones y las serializa para el servidor.
+
+    Args:
+        client_ip (str): IP local con la que el servidor ve a este cliente
+        compresiones_aceptadas (list, optional): Compresiones anunciadas por el
+            servidor en la solicitud GET_SPECS (modo daemon).
+
+    Returns:
+        bytes | None: Mensaje listo para `sendall()`, o None si la autenticación
+        está habilitada pero no se pudo generar el token.
+
+    Note:
+        Modifica el diccionario global `new` agregando dxdiag_output_txt,
+        etag, client_ip y auth_token.
+
+    Security:
+        Genera token de autenticación basado en timestamp y secreto compartido.
+    """
+    # Preparar datos completos (informe + DirectX)
+    preparar_datos_completos()
+
+    # ETag de las sondas baratas: el servidor lo devuelve en GET_SPECS_IF_CHANGED
+    try:
+        new["etag"] = calcular_etag()
+    except Exception as e:
+        new.pop("etag", None)
+        _print_status(f"[WARN] No se pudo calcular el ETag: {e}")
+
+    new["client_ip"] = client_ip
+
+    # SECURITY: Agregar token de autenticación
+    if not _agregar_token_autenticacion(new):
+        return None  # No enviar sin autenticación si está habilitada
+
+    # Serializar una sola vez (con framing por longitud salvo que se desactive)
+    return serializar_mensaje(new, compresiones_aceptadas)
+
+
+def _agregar_token_autenticacion(datos):
+    """Agrega `auth_token` a `datos` si security_config está disponible.
+
+    Args:
+        datos (dict): Respuesta a enviar al servidor (se modifica en su lugar)
+
+    Returns:
+        bool: False si la autenticación está habilitada pero no se pudo generar
+        el token (la respuesta no debe enviarse)
+    """
+    from sys import path
+
+    try:
+        # Agregar directorio config al path
+        config_dir = Path(__file__).parent.parent.parent / "config"
+        path.insert(0, str(config_dir))
+
+        from security_config import generate_auth_token  # type: ignore[import]
+    except ImportError:
+        _print_status(
+            "[WARN] security_config no disponible, enviando sin autenticacion"
+        )
+        return True
+
+    try:
+        datos["auth_token"] = generate_auth_token()
+        _print_status("[OK] Token de autenticacion agregado")
+        return True
+    except ValueError as e:
+        _print_status(f"[WARN] ERROR generando token: {e}")
+        _print_status("   Configurar SHARED_SECRET en security_config.py")
+        return False
+
+
+def _cerrar_tls(canal, conn):
+    """Envía el close_notify de TLS y cierra el socket envuelto.
+
+    `wrap_socket` desacopla `conn`, así que el `conn.close()` de specs.py no
+    cerraría el descriptor: se cierra aquí.
+    """
+    if canal is conn:
+        return
+    try:
+        canal.unwrap()
+    except (OSError, ValueError):
+        pass  # El servidor ya cerró: la respuesta completa ya fue enviada
+    finally:
+        canal.close()
+
+
+def responder_solicitud(conn, solicitud):
+    """Responde un GET_SPECS / GET_SPECS_IF_CHANGED del servidor (modo daemon).
+
+    Si la solicitud trae `REPLY=tls` o `REPLY=plain`, la respuesta se envía por
+    la MISMA conexión que abrió el servidor (con TLS, este cliente hace de
+    cliente TLS y verifica el certificado del servidor). Sin `REPLY` (servidores
+    antiguos) se usa el envío clásico con `enviar_a_servidor()` al puerto 5255.
+
+    Args:
+        conn (socket.socket): Conexión aceptada en el puerto del daemon
+        solicitud (Solicitud): Resultado de `protocolo.parsear_solicitud`
+
+    Returns:
+        str: "not_modified", "enviado" o "error"
+    """
+    canal = conn
+    ip_local = conn.getsockname()[0]  # Antes de envolver el socket con TLS
+    if solicitud.respuesta == "tls":
+        context = crear_contexto_tls_cliente()
+        if context is None:
+            return "error"
+        # Handshake TLS sobre la conexión del servidor (sin segunda conexión)
+        canal = context.wrap_socket(conn, server_hostname=conn.getpeername()[0])
+
+    try:
+        # GET_SPECS_IF_CHANGED: responder "not modified" sin recopilar nada
+        if solicitud.comando == "GET_SPECS_IF_CHANGED":
+            etag_servidor = solicitud.argumentos[0] if solicitud.argumentos else ""
+            sin_cambios, etag = especificaciones_sin_cambios(etag_servidor)
+            if sin_cambios:
+                respuesta = {"status": "not_modified", "etag": etag}
+                # El servidor valida el token también en esta respuesta
+                if not _agregar_token_autenticacion(respuesta):
+                    return "error"
+                canal.sendall(serializar_mensaje(respuesta))
+                _print_status("[OK] Sin cambios (not modified)")
+                return "not_modified"
+            _print_status("[PROCESO] Cambios detectados, recopilando...")
+
+        if solicitud.respuesta is None:
+            enviar_a_servidor(compresiones_aceptadas=solicitud.aceptadas)
+            return "enviado"
+
+        mensaje = preparar_mensaje(ip_local, solicitud.aceptadas)
+        if mensaje is None:
+            return "error"
+
+        canal.sendall(mensaje)
+        if new.get("etag"):
+            guardar_cache_etag(new["etag"])
+        _print_status(f"[OK] Datos enviados por la conexión ({len(mensaje)} bytes)")
+        return "enviado"
+    finally:
+        _cerrar_tls(canal, conn)
+
+
+def enviar_a_servidor(server_ip=None, compresiones_aceptadas=None):
     """Envía especificaciones al servidor vía TCP (solo modo manual, sin discovery).
 
     Args:
         server_ip (str, optional): IP del servidor. Si es None, lee desde config.
+        compresiones_aceptadas (list, optional): Compresiones anunciadas por el
+            servidor en la solicitud GET_SPECS (modo daemon).
 
     Proceso:
     1. Carga IP del servidor desde config/server_config.json o parámetro
     2. Lee dxdiag_output.txt y lo incluye en el JSON
     3. Detecta IP local del cliente
     4. Genera token de autenticación (si security_config disponible)
-    5. Envía JSON completo vía TCP al servidor puerto 5255
+    5. Envía JSON completo (enmarcado con su longitud y comprimido si se negoció)
+       vía TCP al servidor puerto 5255
 
     Returns:
         None
@@ -294,28 +665,6 @@ def enviar_a_servidor(server_ip=None):
     Security:
         Genera token de autenticación basado en timestamp y secreto compartido.
     """
-    # Importar seguridad si está disponible
-    from sys import path
-    from pathlib import Path
-
-    generate_auth_token = None
-    security_available = False
-
-    try:
-
-        # Agregar directorio config al path
-        config_dir = Path(__file__).parent.parent.parent / "config"
-        path.insert(0, str(config_dir))
-
-        from security_config import generate_auth_token  # type: ignore[import]
-
-        security_available = True
-    except ImportError:
-        security_available = False
-        _print_status(
-            "[WARN] security_config no disponible, enviando sin autenticacion"
-        )
-
     # Cargar puerto desde config
     try:
         from config.security_config import SERVER_PORT
@@ -358,71 +707,50 @@ def enviar_a_servidor(server_ip=None):
     with open(output_dir / "servidor.json", "w", encoding="utf-8") as f:
         dump({"server_ip": HOST, "server_port": tcp_port}, f, indent=4)
 
-    # Preparar datos completos (informe + DirectX)
-    preparar_datos_completos()
-
-    # Agregar IP del cliente
+    # Detectar IP local del cliente (la que usa para llegar al servidor)
     try:
-        # Obtener IP local conectando al servidor
         temp_sock = socket(AF_INET, SOCK_DGRAM)
         temp_sock.connect((HOST, tcp_port))
-        new["client_ip"] = temp_sock.getsockname()[0]
+        client_ip = temp_sock.getsockname()[0]
         temp_sock.close()
     except:
-        new["client_ip"] = "unknown"
+        client_ip = "unknown"
 
-    # SECURITY: Agregar token de autenticación
-    if security_available and generate_auth_token:
-        try:
-            new["auth_token"] = generate_auth_token()
-            _print_status("[OK] Token de autenticacion agregado")
-        except ValueError as e:
-            _print_status(f"[WARN] ERROR generando token: {e}")
-            _print_status("   Configurar SHARED_SECRET en security_config.py")
-            return  # No enviar sin autenticación si está habilitada
+    mensaje = preparar_mensaje(client_ip, compresiones_aceptadas)
+    if mensaje is None:
+        return  # No enviar sin autenticación si está habilitada
 
     # Conectar vía TCP y enviar todo
     _print_status(f"[CONNECT] Conectando al servidor {HOST}:{tcp_port}...")
     try:
         # Cargar configuración TLS
         try:
-            from config.security_config import USE_TLS, TLS_CERT_PATH
+            from config.security_config import USE_TLS
         except ImportError:
             USE_TLS = True  # Por defecto usar TLS
-            TLS_CERT_PATH = "config/server.crt"
 
         cliente = socket(AF_INET, SOCK_STREAM)
 
         if USE_TLS:
-            import ssl
-            from pathlib import Path
-
-            cert_path = Path(TLS_CERT_PATH)
-            if not cert_path.exists():
-                # Buscar en ruta alternativa
-                cert_path = Path(__file__).parent.parent.parent / TLS_CERT_PATH
-
-            if not cert_path.exists():
-                _print_status(f"[ERROR] Certificado TLS no encontrado: {TLS_CERT_PATH}")
-                _print_status(f"[INFO] Desactiva TLS con USE_TLS=false en .env")
+            context = crear_contexto_tls_cliente()
+            if context is None:
                 return
 
-            context = ssl.create_default_context()
-            context.check_hostname = False  # Permitir IPs locales
-            context.verify_mode = ssl.CERT_REQUIRED
-            context.load_verify_locations(str(cert_path))
-
             client_ssl = context.wrap_socket(cliente, server_hostname=HOST)
             client_ssl.connect((HOST, tcp_port))
-            client_ssl.sendall(dumps(new).encode("utf-8"))
+            client_ssl.sendall(mensaje)
             client_ssl.close()
             _print_status("[OK] Datos enviados con TLS")
         else:
             _print_status("[WARN] TLS desactivado - conexion sin cifrar")
             cliente.connect((HOST, tcp_port))
-            cliente.sendall(dumps(new).encode("utf-8"))
+            cliente.sendall(mensaje)
             cliente.close()
             _print_status("[OK] Datos enviados (sin TLS)")
+
+        # Recordar qué ETag corresponde a la última recolección enviada
+        if new.get("etag"):
+            guardar_cache_etag(new["etag"])
     except Exception as e:
         _print_status(f"[ERROR] Error al enviar datos: {e}")
 
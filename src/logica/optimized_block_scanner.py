@@ -3,8 +3,8 @@
 optimized_block_scanner.py
 
 Escaneo optimizado por bloques dentro de rangos personalizados de IPs.
-Usa probes broadcast/multicast (SSDP/mDNS) por bloque y fallback a ping-sweep chunked
-si no hay respuestas. Luego asocia MACs leyendo la tabla ARP.
+Usa probes broadcast/multicast (SSDP/mDNS) asíncronos para todos los bloques a la
+vez, mezclados con un ping-sweep en streaming de los hosts que no respondieron.
 
 Ejemplo:
   python3 optimized_block_scanner.py --ranges 10.100.10.50-10.100.10.58 10.101.0.1 --use-broadcast-probe
@@ -18,22 +18,43 @@ import csv
 import os
 import platform
 import subprocess
-from socket import (
-    socket as sckt,
-    AF_INET,
-    SOCK_DGRAM,
-    SOL_SOCKET,
-    SO_BROADCAST,
-    SO_REUSEADDR,
-    IPPROTO_UDP,
-    IPPROTO_IP,
-    IP_MULTICAST_TTL,
-)
-from select import select as select_func
+from socket import socket as sckt, AF_INET, SOCK_DGRAM
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from functools import partial
+from multiprocessing import get_context
 from pathlib import Path
-from itertools import islice
-from logica.ping_utils import ping_host
-from concurrent.futures import ThreadPoolExecutor, as_completed as futures_as_completed
+from threading import Thread
+from typing import AsyncIterator, NamedTuple, Optional
+from logica.async_utils import ControlAIMD, iterar_cola, ventana_deslizante
+from logica.checkpoint_escaneo import (
+    CheckpointEscaneo,
+    borrar_checkpoint,
+    calcular_huella,
+)
+from logica.descubrimiento import descubrir
+from logica.ping_utils import ping_rtt
+from logica.sondeo_tcp import (
+    ABIERTO,
+    host_activo,
+    parsear_sonda,
+    sondear_puertos,
+    tiene_agente,
+)
+from logica.scan_rangos_ip import (
+    ConjuntoIPs,
+    bloques_cidr,
+    entero_a_ip,
+    ip_a_entero,
+    parsear_rangos,
+    red_contenedora,
+)
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed as futures_as_completed,
+)
 import ipaddress
 import time
 
@@ -82,30 +103,27 @@ except ImportError:
 
 DEFAULT_PER_HOST_TIMEOUT = 0.8
 DEFAULT_PER_SUBNET_TIMEOUT = 8.0
-DEFAULT_CONCURRENCY = (
-    50  # Reducido de 300 para evitar sobrecarga del sistema con rangos grandes
-)
+DEFAULT_CONCURRENCY = 50  # Valor inicial: ControlAIMD lo ajusta durante el sweep
 DEFAULT_PROBE_TIMEOUT = 0.9
+try:
+    from config.security_config import SCAN_PROBE as DEFAULT_SCAN_PROBE
+except ImportError:
+    DEFAULT_SCAN_PROBE = "icmp"
+try:
+    from config.security_config import SCAN_SHARD_MIN_HOSTS, SCAN_WORKERS
+except ImportError:
+    SCAN_WORKERS = 1  # 1 = un solo proceso; 0 = un proceso por núcleo
+    SCAN_SHARD_MIN_HOSTS = 4096
+try:
+    from config.security_config import SCAN_HOSTS_BATCH
+except ImportError:
+    SCAN_HOSTS_BATCH = 256
 CSV_PREFIX = "optimized_scan"
 project_root = Path(__file__).parent.parent.parent
 OUTPUT_DIR = project_root / output_dir_str
 OUTPUT_DIR.mkdir(exist_ok=True)
 CSV_FILENAME = OUTPUT_DIR / "discovered_devices.csv"
-
-SSDP_MSEARCH = "\r\n".join(
-    [
-        "M-SEARCH * HTTP/1.1",
-        "HOST:239.255.255.250:1900",
-        'MAN:"ssdp:discover"',
-        "MX:2",
-        "ST:ssdp:all",
-        "",
-        "",
-    ]
-).encode("utf-8")
-
-MDNS_SIMPLE = b"\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00"
-
+CHECKPOINT_FILENAME = OUTPUT_DIR / "scan_checkpoint.json"
 
 # ------------------ NETWORK HELPERS ------------------
 def get_private_supernets():
@@ -134,169 +152,598 @@ def get_local_supernet():
 
 
 # ------------------ BROADCAST / MULTICAST PROBES ------------------
-def probe_ssdp(segment_network, iface_ip=None, timeout=1.0, use_broadcast=True):
-    """Síncrono: envía M-SEARCH a multicast y directed broadcast (si está permitido). Devuelve set IPs."""
-    results = set()
-    sock_list = []
-    try:
-        msock = sckt(AF_INET, SOCK_DGRAM, IPPROTO_UDP)
-        msock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-        try:
-            msock.setsockopt(IPPROTO_IP, IP_MULTICAST_TTL, 1)
-        except Exception:
-            pass
-        if iface_ip:
-            try:
-                msock.bind((iface_ip, 0))
-            except Exception:
-                pass
-        msock.setblocking(False)
-        sock_list.append(msock)
-        try:
-            msock.sendto(SSDP_MSEARCH, ("239.255.255.250", 1900))
-        except Exception:
-            pass
+# SSDP/mDNS asíncronos para todos los segmentos a la vez: ver
+# `logica.descubrimiento.descubrir`.
 
-        bsock = None
-        if use_broadcast:
-            try:
-                baddr = str(segment_network.broadcast_address)
-                bsock = sckt(AF_INET, SOCK_DGRAM)
-                bsock.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
-                try:
-                    bsock.bind((iface_ip, 0))
-                except Exception:
-                    pass
-                try:
-                    bsock.sendto(SSDP_MSEARCH, (baddr, 1900))
-                except Exception:
-                    pass
-                bsock.setblocking(False)
-                sock_list.append(bsock)
-            except Exception:
-                bsock = None
-
-        start = time.time()
-        while True:
-            remaining = start + timeout - time.time()
-            if remaining <= 0:
-                break
-            rlist, _, _ = select_func(sock_list, [], [], remaining)
-            if not rlist:
-                continue
-            for s in rlist:
-                try:
-                    data, addr = s.recvfrom(65535)
-                except Exception:
-                    continue
-                results.add(addr[0])
-    finally:
-        for s in sock_list:
-            try:
-                s.close()
-            except Exception:
-                pass
-    return results
 
+# ------------------ PING SWEEP (async, streaming) ------------------
+# Reutilizamos las implementaciones centralizadas en `logica.ping_utils`
+# (`ping_rtt`) y la ventana deslizante de `logica.async_utils`.
+class EventoDescubrimiento(NamedTuple):
+    """Un host activo, en el momento en que el escaneo lo encuentra."""
 
-def probe_mdns(segment_network, iface_ip=None, timeout=1.0):
-    """Síncrono: pequeño probe mDNS. Devuelve set IPs."""
-    results = set()
-    try:
-        msock = sckt(AF_INET, SOCK_DGRAM, IPPROTO_UDP)
-        msock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-        try:
-            msock.setsockopt(IPPROTO_IP, IP_MULTICAST_TTL, 1)
-        except Exception:
-            pass
-        if iface_ip:
-            try:
-                msock.bind((iface_ip, 0))
-            except Exception:
-                pass
-        msock.setblocking(False)
+    ip: str
+    metodo: str  # "icmp", "tcp", "ssdp", "mdns" o "checkpoint" (reanudado)
+    rtt_ms: Optional[float]  # Solo la sonda ICMP lo mide
+    timestamp: float
+
+
+class FlujoDescubrimientos:
+    """Reparte los hosts activos a medida que aparecen, sin esperar al final.
+
+    Cada `suscribir()` devuelve un iterador asíncrono propio (UI, DB, ...)
+    que recibe todos los eventos publicados desde ese momento; cada IP se
+    publica una sola vez (el primer método que la encontró).
+    """
+
+    def __init__(self):
+        self._colas = []
+        self._fin = object()
+        self.vistos = set()
+
+    def suscribir(self) -> AsyncIterator[EventoDescubrimiento]:
+        cola = asyncio.Queue()
+        self._colas.append(cola)
+        return iterar_cola(cola, self._fin)
+
+    def __aiter__(self):
+        return self.suscribir()
+
+    def publicar(self, ip, metodo, rtt_ms=None):
+        if ip in self.vistos:
+            return
+        self.vistos.add(ip)
+        evento = EventoDescubrimiento(ip, metodo, rtt_ms, time.time())
+        for cola in self._colas:
+            cola.put_nowait(evento)
+
+    def cerrar(self):
+        """Fin del escaneo: los suscriptores terminan de iterar."""
+        for cola in self._colas:
+            cola.put_nowait(self._fin)
+
+
+class ProgresoEscaneo:
+    """Hosts barridos / total y ETA del escaneo, emitidos por `callback_progreso`.
+
+    Emite un evento {"tipo": "bloque", ...} cada `cada` hosts (y al terminar),
+    no uno por host.
+    """
+
+    def __init__(self, total, callback_progreso=None, cada=DEFAULT_CHUNK):
+        self.total = total
+        self.callback_progreso = callback_progreso
+        self.cada = max(1, cada)
+        self.hechos = 0
+        self.activos = 0
+        self.inicio = time.time()
+        self._ultimo_emitido = 0
+
+    def avanzar(self, ip, activo):
+        """Registra un host barrido (firma de `al_completar`)."""
+        self.avanzar_lote(1, 1 if activo else 0)
+
+    def avanzar_lote(self, hechos, activos):
+        """Registra varios hosts a la vez (avances de los procesos del sweep)."""
+        self.hechos += hechos
+        self.activos += activos
+        if (
+            self.hechos - self._ultimo_emitido >= self.cada
+            or self.hechos >= self.total
+        ):
+            self.emitir()
+
+    def saltar_hasta(self, hechos):
+        """Da por barridos los hosts que el presupuesto de tiempo dejó afuera."""
+        if hechos > self.hechos:
+            self.hechos = hechos
+            self.emitir()
+
+    def eta(self):
+        """Segundos estimados hasta terminar, o None sin datos suficientes."""
+        if not self.hechos:
+            return None
+        transcurrido = time.time() - self.inicio
+        return transcurrido / self.hechos * max(0, self.total - self.hechos)
+
+    def emitir(self):
+        self._ultimo_emitido = self.hechos
+        if not self.callback_progreso:
+            return
+        eta = self.eta()
+        porcentaje = 100.0 * self.hechos / self.total if self.total else 100.0
+        texto_eta = f", ETA {eta:.0f}s" if eta is not None else ""
         try:
-            msock.sendto(MDNS_SIMPLE, ("224.0.0.251", 5353))
-        except Exception:
-            pass
-        start = time.time()
-        while True:
-            remaining = start + timeout - time.time()
-            if remaining <= 0:
-                break
-            rlist, _, _ = select_func([msock], [], [], remaining)
-            if not rlist:
+            self.callback_progreso(
+                {
+                    "tipo": "bloque",
+                    "hechos": self.hechos,
+                    "total": self.total,
+                    "activos": self.activos,
+                    "porcentaje": round(porcentaje, 1),
+                    "eta_s": round(eta, 1) if eta is not None else None,
+                    "mensaje": (
+                        f"Ping sweep {self.hechos}/{self.total} hosts "
+                        f"({porcentaje:.1f}%), {self.activos} activos{texto_eta}"
+                    ),
+                }
+            )
+        except Exception as e:
+            print(f"[WARN] Error emitiendo progreso: {e}")
+
+
+async def ping_sweep_chunked(
+    hosts,
+    chunk_size,
+    per_host_timeout,
+    per_subnet_timeout,
+    concurrency,
+    total=None,
+    al_completar=None,
+    sonda=None,
+    al_activo=None,
+):
+    """Ping sweep de `hosts` con a lo sumo `concurrency` pings en vuelo.
+
+    `concurrency` puede ser un entero fijo o un `ControlAIMD`: en ese caso cada
+    resultado se le informa (respuesta = éxito, timeout = pérdida) y el límite
+    de pings en vuelo se adapta mientras dura el barrido.
+
+    `hosts` se consume de forma perezosa (p. ej. un generador de IPs), así que
+    un /12 se barre en memoria constante: solo se guardan las IPs activas.
+    El presupuesto de tiempo es `per_subnet_timeout` por cada `chunk_size`
+    hosts (None: sin presupuesto global, p. ej. con `PlanificadorSubredes`);
+    al agotarse no se toman hosts nuevos y se esperan los que están en vuelo.
+
+    Args:
+        hosts: Iterable de IPs
+        total: Cantidad de hosts (para el presupuesto; default len(hosts))
+        al_completar: Callback opcional `(ip, activo)` por cada host barrido
+        sonda: Corrutina `sonda(ip) -> bool` que reemplaza al ping (p. ej. la
+            sonda TCP connect); también puede devolver el RTT en ms (float)
+        al_activo: Callback opcional `(ip, rtt_ms)` apenas responde un host
+            (rtt_ms None si la sonda no lo mide)
+
+    Returns:
+        list: IPs activas, ordenadas
+    """
+    if sonda is None:
+
+        async def sonda(ip):
+            return await ping_rtt(ip, per_host_timeout=per_host_timeout)
+
+    if total is None:
+        total = len(hosts)
+    presupuesto = None
+    if per_subnet_timeout is not None:
+        presupuesto = per_subnet_timeout * max(1, -(-total // max(1, chunk_size)))
+    limite = time.time() + presupuesto if presupuesto else None
+    alive = []
+    control = concurrency if isinstance(concurrency, ControlAIMD) else None
+
+    def dentro_del_presupuesto():
+        for ip in hosts:
+            if limite is not None and time.time() >= limite:
+                print(f"     sweep cortado: presupuesto de {presupuesto:.0f}s agotado")
+                return
+            yield str(ip)
+
+    def registrar(ip, resultado):
+        # True o RTT (float) => activo; None, False o excepción => no activo
+        activo = resultado is True or isinstance(resultado, float)
+        if activo:
+            alive.append(ip)
+            if al_activo:
+                al_activo(ip, resultado if isinstance(resultado, float) else None)
+        if control:
+            control.registrar(activo)
+        if al_completar:
+            al_completar(ip, activo)
+
+    await ventana_deslizante(dentro_del_presupuesto(), sonda, concurrency, registrar)
+    return sorted(set(alive), key=lambda s: tuple(int(x) for x in s.split(".")))
+
+
+class SubredPlanificada:
+    """Una subred (intervalo exacto) dentro del planificador."""
+
+    def __init__(self, inicio, fin, texto, plazo):
+        self.inicio = inicio
+        self.fin = fin
+        self.texto = texto
+        self.total = fin - inicio + 1
+        self.plazo = plazo
+        self.enviados = 0
+        self.cortada = False
+        self._siguiente = inicio
+
+    def tomar(self, omitir=None):
+        """Siguiente IP de la subred, o None si ya se entregaron todas.
+
+        `omitir` (ConjuntoIPs) son hosts ya barridos en una corrida anterior:
+        se saltean de a tramos enteros, sin recorrerlos, y cuentan como enviados.
+        """
+        if omitir is not None and self._siguiente <= self.fin:
+            tramo = omitir.tramo_de(self._siguiente)
+            if tramo is not None:
+                siguiente = min(tramo[1], self.fin) + 1
+                self.enviados += siguiente - self._siguiente
+                self._siguiente = siguiente
+        if self._siguiente > self.fin:
+            return None
+        ip = entero_a_ip(self._siguiente)
+        self._siguiente += 1
+        self.enviados += 1
+        return ip
+
+
+class PlanificadorSubredes:
+    """Intercala los hosts de todas las subredes en una sola ventana de pings.
+
+    En lugar de barrer una subred y después la siguiente (tiempo total =
+    subredes × per_subnet_timeout), entrega las IPs en round-robin, una de
+    cada subred activa por turno: todas avanzan a la vez bajo el mismo límite
+    de concurrencia y ninguna acapara la ventana.
+
+    Cada subred tiene su plazo: `per_subnet_timeout` por cada `chunk_size`
+    hosts, multiplicado por la cantidad de subredes (cada una recibe 1/N de
+    la ventana). Al vencer deja de recibir turnos y las demás se reparten su
+    parte. Iterar el planificador genera IPs (se usa como `hosts` de
+    `ping_sweep_chunked`); `omitir` (ConjuntoIPs) son hosts ya barridos que
+    no se vuelven a entregar (escaneo reanudado).
+    """
+
+    def __init__(
+        self,
+        intervalos,
+        textos,
+        chunk_size,
+        per_subnet_timeout,
+        al_omitir=None,
+        omitir=None,
+    ):
+        inicio = time.time()
+        self.conocidas = set()  # Ya activas por otra vía: no se les hace ping
+        self.al_omitir = al_omitir
+        self.omitir = omitir
+        cantidad = max(1, len(intervalos))
+        self.subredes = []
+        for (desde, hasta), texto in zip(intervalos, textos):
+            chunks = -(-(hasta - desde + 1) // max(1, chunk_size))
+            plazo = inicio + per_subnet_timeout * chunks * cantidad
+            self.subredes.append(SubredPlanificada(desde, hasta, texto, plazo))
+        self._inicios = [subred.inicio for subred in self.subredes]
+
+    def __len__(self):
+        return sum(subred.total for subred in self.subredes)
+
+    def __iter__(self):
+        activas = deque(self.subredes)
+        while activas:
+            subred = activas.popleft()
+            if time.time() >= subred.plazo:
+                subred.cortada = True
+                print(
+                    f"     plazo vencido en {subred.texto}: "
+                    f"{subred.enviados}/{subred.total} hosts barridos"
+                )
                 continue
-            for s in rlist:
-                try:
-                    data, addr = s.recvfrom(65535)
-                except Exception:
-                    continue
-                results.add(addr[0])
-    finally:
-        try:
-            msock.close()  # type: ignore
-        except Exception:
-            pass
-    return results
+            ip = subred.tomar(self.omitir)
+            if ip is None:
+                continue  # Subred terminada
+            if ip in self.conocidas:
+                if self.al_omitir:
+                    self.al_omitir(ip)
+            else:
+                yield ip
+            activas.append(subred)
+
+    def descartar(self, ip):
+        """Marca `ip` como ya activa (p. ej. respondió a SSDP): no se le hace ping."""
+        self.conocidas.add(ip)
+
+    def subred_de(self, ip):
+        """Subred planificada que contiene `ip` (o None)."""
+        valor = ip_a_entero(ip)
+        i = bisect_right(self._inicios, valor) - 1
+        if i >= 0 and valor <= self.subredes[i].fin:
+            return self.subredes[i]
+        return None
+
+    def resumen(self, alive):
+        """[(subred, activos, enviados, total, cortada)] para los logs."""
+        activos = {}
+        for ip in alive:
+            subred = self.subred_de(ip)
+            if subred is not None:
+                activos[subred.texto] = activos.get(subred.texto, 0) + 1
+        return [
+            (s.texto, activos.get(s.texto, 0), s.enviados, s.total, s.cortada)
+            for s in self.subredes
+        ]
+
+
+def crear_sonda_tcp(puertos, per_host_timeout, resultados_puertos):
+    """Sonda TCP connect para `ping_sweep_chunked`: activo si algún puerto respondió.
+
+    Guarda {puerto: estado} de cada host activo en `resultados_puertos`.
+    """
+
+    async def sonda(ip):
+        estados = await sondear_puertos(ip, puertos, per_host_timeout)
+        if host_activo(estados):
+            resultados_puertos[ip] = estados
+            return True
+        return False
 
+    return sonda
 
-# ------------------ PING CHUNKED (async) ------------------
-# Reutilizamos las implementaciones centralizadas en `logica.ping_utils`
-# `ping_one_cmd` y `ping_host` ya están importadas desde ese módulo.
-def chunked_iterable(iterable, size):
-    it = iter(iterable)
-    while True:
-        chunk = list(islice(it, size))
-        if not chunk:
-            break
-        yield chunk
 
+# ------------------ SWEEP EN VARIOS PROCESOS ------------------
+# Con decenas de miles de hosts un solo proceso se satura procesando respuestas
+# y callbacks. Los rangos se reparten en fragmentos contiguos (uno por proceso,
+# cada uno con su event loop, su socket ICMP y su ControlAIMD) y los activos
+# vuelven al proceso principal por una cola a medida que aparecen.
+_cola_resultados = None  # Cola de cada proceso worker (ver _iniciar_trabajador)
+_detener = None  # Evento: el proceso principal canceló el sweep
 
-async def ping_sweep_chunked(
-    network, chunk_size, per_host_timeout, per_subnet_timeout, concurrency
+
+def _iniciar_trabajador(cola, detener):
+    """Initializer del pool: la cola y el evento se heredan al crear el proceso."""
+    global _cola_resultados, _detener
+    _cola_resultados = cola
+    _detener = detener
+
+
+def _barrer_fragmento(indice, intervalos, textos, opciones):
+    """Tarea de un proceso del pool: barre su fragmento en un event loop propio."""
+    return asyncio.run(_barrido_fragmento(indice, intervalos, textos, **opciones))
+
+
+async def _barrido_fragmento(
+    indice,
+    intervalos,
+    textos,
+    chunk_size,
+    per_host_timeout,
+    per_subnet_timeout,
+    concurrency,
+    minimo,
+    maximo,
+    tipo_sonda,
+    puertos,
+    omitir,
+):
+    """Sweep de un fragmento; informa el avance por `_cola_resultados`.
+
+    Mensajes:
+        ("avance", [hosts barridos como enteros], [ips activas],
+         {ip: {puerto: estado}}, {ip: rtt_ms})  cada `chunk_size` hosts
+        ("fin", indice, resumen por subred, resumen del control AIMD)
+    """
+    cola = _cola_resultados
+    planificador = PlanificadorSubredes(
+        intervalos,
+        textos,
+        chunk_size,
+        per_subnet_timeout,
+        omitir=ConjuntoIPs(omitir) if omitir else None,
+    )
+    control = ControlAIMD(inicial=concurrency, minimo=minimo, maximo=maximo)
+    resultados_puertos = {}
+    hechos = []
+    activos = []
+    rtts = {}
+
+    def enviar_avance():
+        nonlocal hechos, activos, rtts
+        if hechos:
+            puertos_lote = {
+                ip: resultados_puertos[ip]
+                for ip in activos
+                if ip in resultados_puertos
+            }
+            cola.put(("avance", hechos, activos, puertos_lote, rtts))
+            hechos, activos, rtts = [], [], {}
+
+    def al_activo(ip, rtt_ms):
+        rtts[ip] = rtt_ms
+
+    def al_completar(ip, activo):
+        hechos.append(ip_a_entero(ip))
+        if activo:
+            activos.append(ip)
+        if len(hechos) >= chunk_size:
+            enviar_avance()
+
+    sonda = None
+    if tipo_sonda == "tcp":
+        sonda = crear_sonda_tcp(puertos, per_host_timeout, resultados_puertos)
+
+    def hasta_detener():
+        # Cancelado: no se toman hosts nuevos y se esperan los que están en vuelo
+        for ip in planificador:
+            if _detener.is_set():
+                return
+            yield ip
+
+    alive = await ping_sweep_chunked(
+        hasta_detener(),
+        chunk_size=chunk_size,
+        per_host_timeout=per_host_timeout,
+        per_subnet_timeout=None,  # Cada subred aplica su propio plazo
+        concurrency=control,
+        total=len(planificador),
+        al_completar=al_completar,
+        sonda=sonda,
+        al_activo=al_activo,
+    )
+    enviar_avance()
+    cola.put(("fin", indice, planificador.resumen(alive), control.resumen()))
+    return len(alive)
+
+
+async def ping_sweep_procesos(
+    rangos,
+    workers,
+    chunk_size,
+    per_host_timeout,
+    per_subnet_timeout,
+    concurrency,
+    al_avanzar=None,
+    tipo_sonda="icmp",
+    puertos=(),
+    resultados_puertos=None,
+    omitir=None,
+    al_activo=None,
 ):
-    sem = asyncio.Semaphore(concurrency)
+    """Reparte el sweep de `rangos` (ConjuntoIPs) entre `workers` procesos.
+
+    La concurrencia se reparte de forma estática: `concurrency` y los límites
+    ADAPTIVE_CONCURRENCY_MIN/MAX se dividen en partes iguales al arrancar y
+    cada proceso ajusta su parte con su propio ControlAIMD. No hay un
+    presupuesto compartido: un proceso que termina antes no cede su cupo, y
+    el tope conjunto (la suma de los máximos) solo se cumple por construcción.
+
+    Args:
+        al_avanzar: Callback `(hosts barridos como enteros, ips activas,
+            {ip: {puerto: estado}})` por cada avance de un proceso
+        omitir: ConjuntoIPs de hosts ya barridos (escaneo reanudado); se
+            reparten solo los pendientes
+        al_activo: Callback `(ip, rtt_ms)` por cada host activo, a medida que
+            llegan los avances
+
+    Returns:
+        tuple: (IPs activas ordenadas, [(subred, activos, enviados, total,
+            cortada)])
+    """
+    pendientes = rangos.restar(omitir) if omitir else rangos
+    trabajos = []
+    for fragmento in pendientes.repartir(workers):
+        # Cada proceso recibe el tramo de los rangos que abarca su fragmento
+        # (así las subredes conservan su nombre) y saltea lo ya barrido
+        desde, hasta = fragmento.intervalos[0][0], fragmento.intervalos[-1][1]
+        tramo = rangos.recortar(desde, hasta)
+        barridos = omitir.recortar(desde, hasta).intervalos if omitir else []
+        trabajos.append((tramo.intervalos, tramo.textos(), barridos))
+    cantidad = len(trabajos)
+    if not cantidad:
+        return [], []
+    limites = ControlAIMD()  # Solo para leer ADAPTIVE_CONCURRENCY_MIN/MAX
+    opciones = {
+        "chunk_size": chunk_size,
+        "per_host_timeout": per_host_timeout,
+        "per_subnet_timeout": per_subnet_timeout,
+        "concurrency": max(1, concurrency // cantidad),
+        "minimo": max(1, limites.minimo // cantidad),
+        "maximo": max(1, limites.maximo // cantidad),
+        "tipo_sonda": tipo_sonda,
+        "puertos": list(puertos),
+    }
+    print(
+        f"     sharded sweep: {cantidad} procesos, {opciones['concurrency']} "
+        f"sondas iniciales y hasta {opciones['maximo']} en vuelo cada uno "
+        f"(reparto fijo)"
+    )
+    if resultados_puertos is None:
+        resultados_puertos = {}
+
+    loop = asyncio.get_running_loop()
+    # "spawn" en todas las plataformas: un fork copiaría el event loop y los
+    # hilos del proceso principal (en Windows es la única opción)
+    contexto = get_context("spawn")
+    cola = contexto.Queue()
+    detener = contexto.Event()
     alive = []
-    hosts = list(network.hosts())
-    total = len(hosts)
-    start_time = time.time()
+    subredes = {}  # Por fragmento, para listarlas en el orden de los rangos
 
-    async def worker(ip):
-        async with sem:
-            ok = await ping_host(str(ip), per_host_timeout=per_host_timeout)
-            return str(ip) if ok else None
-
-    processed = 0
-    for chunk in chunked_iterable(hosts, chunk_size):
-        elapsed = time.time() - start_time
-        if elapsed >= per_subnet_timeout:
-            break
-        tasks = [asyncio.create_task(worker(ip)) for ip in chunk]
-        try:
-            timeout_remaining = max(
-                0.1, per_subnet_timeout - (time.time() - start_time)
+    # Hilo lector: único consumidor de `cola`. Reenvía cada mensaje al loop,
+    # así ninguno se pierde si se cancela una espera y el loop nunca bloquea
+    entrada = asyncio.Queue()
+    pendientes = set(range(cantidad))  # Procesos que no enviaron "fin"
+
+    def leer():
+        while True:
+            mensaje = cola.get()
+            loop.call_soon_threadsafe(entrada.put_nowait, mensaje)
+            if mensaje is None:
+                return
+
+    def al_terminar(indice, futuro):
+        # Un proceso que falló no envía "fin": avisar por la misma entrada
+        if not futuro.cancelled() and futuro.exception() is not None:
+            entrada.put_nowait(("error", indice, futuro.exception()))
+
+    async def consumir(tolerar_errores):
+        """Aplica mensajes hasta recibir el "fin" (o el error) de cada proceso."""
+        while pendientes:
+            mensaje = await entrada.get()
+            if mensaje[0] == "error":
+                pendientes.discard(mensaje[1])
+                if not tolerar_errores:
+                    raise mensaje[2]
+            elif procesar(mensaje):
+                pendientes.discard(mensaje[1])
+
+    def procesar(mensaje):
+        """Aplica un mensaje de un proceso; True si es su "fin"."""
+        if mensaje[0] == "avance":
+            _, hechos, activos, puertos_lote, rtts = mensaje
+            alive.extend(activos)
+            resultados_puertos.update(puertos_lote)
+            if al_avanzar:
+                al_avanzar(hechos, activos, puertos_lote)
+            if al_activo:
+                for ip in activos:
+                    al_activo(ip, rtts.get(ip))
+            return False
+        _, indice, resumen_subredes, resumen = mensaje
+        subredes[indice] = resumen_subredes
+        print(f"     proceso {indice + 1}/{cantidad}: {resumen}")
+        return True
+
+    with ProcessPoolExecutor(
+        max_workers=cantidad,
+        mp_context=contexto,
+        initializer=_iniciar_trabajador,
+        initargs=(cola, detener),
+    ) as pool:
+        tareas = [
+            pool.submit(
+                _barrer_fragmento,
+                indice,
+                intervalos,
+                textos,
+                dict(opciones, omitir=barridos),
             )
-            for fut in asyncio.as_completed(tasks, timeout=timeout_remaining):
-                try:
-                    res = await fut
-                    if res:
-                        alive.append(res)
-                except asyncio.TimeoutError:
-                    pass
-                except Exception:
-                    pass
-        except asyncio.TimeoutError:
-            for t in tasks:
-                if not t.done():
-                    t.cancel()
-            break
+            for indice, (intervalos, textos, barridos) in enumerate(trabajos)
+        ]
+        for indice, tarea in enumerate(tareas):
+            asyncio.wrap_future(tarea).add_done_callback(partial(al_terminar, indice))
+        lector = Thread(target=leer, name="sweep-lector", daemon=True)
+        lector.start()
+        try:
+            try:
+                await consumir(tolerar_errores=False)
+                await asyncio.gather(*(asyncio.wrap_future(t) for t in tareas))
+            except BaseException:
+                # Cancelado o con error: los procesos dejan de tomar hosts y se
+                # recogen sus últimos avances (así quedan en el checkpoint)
+                detener.set()
+                await consumir(tolerar_errores=True)
+                raise
         finally:
-            for t in tasks:
-                if not t.done():
-                    t.cancel()
-        processed += len(chunk)
-    return sorted(set(alive), key=lambda s: tuple(int(x) for x in s.split(".")))
+            # Centinela: el lector termina después de todo lo que ya estaba en
+            # la cola; lo que reenvió hasta entonces también se aplica
+            cola.put(None)
+            await loop.run_in_executor(None, lector.join)
+            while not entrada.empty():
+                mensaje = entrada.get_nowait()
+                if mensaje is not None and mensaje[0] == "avance":
+                    procesar(mensaje)
+
+    alive.sort(key=lambda s: tuple(int(x) for x in s.split(".")))
+    return alive, [subred for i in sorted(subredes) for subred in subredes[i]]
 
 
 # ------------------ BLOCK PATTERNS ------------------
@@ -304,18 +751,45 @@ async def ping_sweep_chunked(
 # We'll create ipaddress.ip_network objects for each block
 
 
-# ------------------ SMALL HELPERS ------------------
-def probe_block(segment_net, iface_ip, timeout, use_broadcast):
-    ssdp = probe_ssdp(
-        segment_net, iface_ip=iface_ip, timeout=timeout, use_broadcast=use_broadcast
+# ------------------ MAIN FLOW ------------------
+def parsear_rangos_escaneo(ranges):
+    """ConjuntoIPs de las entradas de `--ranges`, descartando las inválidas.
+
+    Intervalos exactos: los solapamientos entre rangos se fusionan y cada IP
+    se escanea una sola vez.
+    """
+    intervalos = []
+    for range_str in ranges:
+        try:
+            intervalos.extend(parsear_rangos(range_str))
+        except ValueError as e:
+            print(f"  [ERROR] Rango inválido {range_str}: {e}")
+    return ConjuntoIPs(intervalos)
+
+
+def checkpoint_reanudable(ranges, probe=None):
+    """Avance guardado de un escaneo interrumpido con estos rangos y sonda.
+
+    Para que la UI ofrezca continuarlo (`main(..., reanudar=True)`).
+
+    Returns:
+        dict | None: {"barridos", "total", "activos", "fecha"}, o None si no
+            hay un checkpoint de este escaneo
+    """
+    rangos = parsear_rangos_escaneo(ranges)
+    checkpoint = CheckpointEscaneo(
+        CHECKPOINT_FILENAME, calcular_huella(rangos, probe or DEFAULT_SCAN_PROBE)
     )
-    if ssdp:
-        return set(ssdp)
-    mdns = probe_mdns(segment_net, iface_ip=iface_ip, timeout=timeout)
-    return set(mdns)
+    if not rangos or not checkpoint.cargar():
+        return None
+    return {
+        "barridos": len(checkpoint.completados),
+        "total": len(rangos),
+        "activos": len(checkpoint.activos),
+        "fecha": checkpoint.fecha,
+    }
 
 
-# ------------------ MAIN FLOW ------------------
 async def scan_blocks(
     ranges,
     chunk_size,
@@ -325,127 +799,370 @@ async def scan_blocks(
     probe_timeout,
     use_broadcast_probe,
     callback_progreso=None,
+    probe="icmp",
+    resultados_puertos=None,
+    workers=1,
+    ruta_checkpoint=None,
+    reanudar=False,
+    flujo=None,
 ):
+    """Escanea los rangos y devuelve las IPs activas, ordenadas.
+
+    Args:
+        probe: "icmp" (ping) o "tcp:5256,445,135" (connect a cada puerto)
+        resultados_puertos: Dict opcional que se completa con
+            {ip: {puerto: estado}} de los hosts activos en modo TCP
+        workers: Procesos del sweep (0 = uno por núcleo); se usan varios solo
+            desde SCAN_SHARD_MIN_HOSTS hosts (ver ping_sweep_procesos)
+        ruta_checkpoint: Archivo donde guardar el avance periódicamente
+            (None = sin checkpoints)
+        reanudar: Si hay un checkpoint de este mismo escaneo, barrer solo los
+            hosts que faltan y sumar sus activos
+        flujo: FlujoDescubrimientos opcional donde se publica cada host activo
+            apenas se lo encuentra (ver `eventos_escaneo`)
+    """
     get_local_supernet()
     all_alive = set()
-    loop = asyncio.get_event_loop()
-
-    total_ranges = len(ranges)
-
-    # Calcular tamaño total del escaneo para ajustar concurrencia dinámicamente
-    total_ips = 0
-    for range_str in ranges:
+    tipo_sonda, puertos = parsear_sonda(probe)
+    if resultados_puertos is None:
+        resultados_puertos = {}
+
+    rangos = parsear_rangos_escaneo(ranges)
+    total_ranges = len(rangos.intervalos)
+
+    total_ips = len(rangos)
+
+    # Avance en disco: hosts barridos, activos y puertos (ver checkpoint_escaneo)
+    checkpoint = None
+    barridos = None
+    if ruta_checkpoint:
+        checkpoint = CheckpointEscaneo(ruta_checkpoint, calcular_huella(rangos, probe))
+        if reanudar and checkpoint.cargar():
+            # Copia: el checkpoint sigue sumando hosts durante este sweep
+            barridos = ConjuntoIPs(checkpoint.completados.intervalos)
+            all_alive.update(checkpoint.activos)
+            resultados_puertos.update(checkpoint.puertos)
+            print(
+                f"[RESUME] Checkpoint cargado: {len(barridos)}/{total_ips} hosts "
+                f"ya barridos, {len(checkpoint.activos)} activos"
+            )
+        elif reanudar:
+            print("[RESUME] No hay checkpoint de este escaneo: se empieza de cero")
+
+    # Progreso global (hosts barridos / total, ETA) sobre todos los intervalos
+    progreso = ProgresoEscaneo(total_ips, callback_progreso, cada=chunk_size)
+
+    def al_activo(ip, rtt_ms):
+        if flujo:
+            flujo.publicar(ip, tipo_sonda, rtt_ms)
+
+    if flujo and barridos:
+        for ip in sorted(checkpoint.activos, key=ip_a_entero):
+            flujo.publicar(ip, "checkpoint")
+
+    def al_completar(ip, activo):
+        progreso.avanzar(ip, activo)
+        if checkpoint:
+            checkpoint.registrar(ip, activo, resultados_puertos.get(ip))
+
+    def al_avanzar(hechos, activos, puertos_lote):
+        progreso.avanzar_lote(len(hechos), len(activos))
+        if checkpoint:
+            checkpoint.registrar_lote(hechos, activos, puertos_lote)
+
+    for idx, ((inicio, fin), range_str) in enumerate(
+        zip(rangos.intervalos, rangos.textos()), start=1
+    ):
+        bloques = bloques_cidr(inicio, fin)
+        print(f"--- Rango {idx}/{total_ranges}: {range_str} ---")
+        print(f"  -> Bloques CIDR: {', '.join(map(str, bloques[:4]))}")
+
+    # Emitir progreso al callback si existe
+    if callback_progreso:
         try:
-            if "-" in range_str:
-                start_ip, end_ip = range_str.split("-", 1)
-            else:
-                start_ip = end_ip = range_str
-            from logica.scan_rangos_ip import calculate_ip_range
-
-            subnet1, subnet2 = calculate_ip_range(start_ip, end_ip)  # type: ignore
-            total_ips += subnet1.num_addresses
-            if subnet2:
-                total_ips += subnet2.num_addresses
-        except:
-            pass  # Ignorar errores de cálculo para este propósito
-
-    # Ajustar concurrencia basada en tamaño del rango para evitar sobrecarga
-    if total_ips > 500:  # Rangos muy grandes
-        adjusted_concurrency = min(concurrency, 25)  # Máximo 25 para rangos grandes
+            callback_progreso(
+                {
+                    "tipo": "bloque",
+                    "rangos_totales": total_ranges,
+                    "mensaje": f"Escaneando {total_ranges} rango(s) en paralelo "
+                    f"({total_ips} hosts)",
+                }
+            )
+        except Exception as e:
+            print(f"[WARN] Error emitiendo progreso: {e}")
+
+    if barridos:
+        progreso.avanzar_lote(len(barridos), len(checkpoint.activos))
+
+    workers = workers or os.cpu_count() or 1
+    repartido = workers > 1 and total_ips >= SCAN_SHARD_MIN_HOSTS
+    control = planificador = None
+    if not repartido:
+        # `concurrency` es el punto de partida: el control AIMD lo sube mientras
+        # los timeouts se mantienen en su nivel habitual y lo recorta ante un
+        # salto de pérdidas o lag del event loop (ADAPTIVE_CONCURRENCY_MIN/MAX).
+        # Con varios procesos cada uno tiene su propio control (ver
+        # ping_sweep_procesos)
+        control = ControlAIMD(inicial=concurrency)
         print(
-            f"[OPTIMIZACION] Rango grande detectado ({total_ips} IPs). Concurrencia ajustada: {concurrency} -> {adjusted_concurrency}"
+            f"[CONFIG] Concurrencia inicial: {control.limite} "
+            f"(adaptativa entre {control.minimo} y {control.maximo})"
         )
-        concurrency = adjusted_concurrency
-    elif total_ips > 100:  # Rangos medianos
-        adjusted_concurrency = min(concurrency, 50)  # Máximo 50 para rangos medianos
-        if adjusted_concurrency != concurrency:
-            print(
-                f"[OPTIMIZACION] Rango mediano detectado ({total_ips} IPs). Concurrencia ajustada: {concurrency} -> {adjusted_concurrency}"
-            )
-            concurrency = adjusted_concurrency
-
-    print(f"[CONFIG] Concurrencia final: {concurrency} operaciones simultáneas")
 
-    for idx, range_str in enumerate(ranges, start=1):
-        print(f"\n--- Rango {idx}/{total_ranges}: {range_str} ---")
+        # Ping sweep de todos los intervalos exactos en una sola ventana de
+        # `concurrency` pings, intercalando las subredes (ver PlanificadorSubredes)
+        planificador = PlanificadorSubredes(
+            rangos.intervalos,
+            rangos.textos(),
+            chunk_size,
+            per_subnet_timeout,
+            al_omitir=lambda ip: al_completar(ip, True),
+            omitir=barridos,
+        )
 
-        # Parsear rango: start-end o solo start
-        if "-" in range_str:
-            start_ip, end_ip = range_str.split("-", 1)
-        else:
-            start_ip = end_ip = range_str
+    # SSDP/mDNS a todos los segmentos a la vez, mientras corre el sweep: cada
+    # equipo que responde se suma apenas llega y ya no se le hace ping
+    hallados_probe = []
 
-        # Generar red
+    async def consumir_descubrimiento():
+        # Red que contiene cada intervalo (destino del broadcast dirigido)
+        redes = [red_contenedora(i, f) for i, f in rangos.intervalos]
         try:
-            from logica.scan_rangos_ip import calculate_ip_range
+            async for ip, metodo in descubrir(redes, probe_timeout):
+                # Solo las IPs pedidas (la red contenedora puede ser más grande)
+                if ip in rangos and ip not in all_alive:
+                    all_alive.add(ip)
+                    if flujo:
+                        flujo.publicar(ip, metodo)
+                    if checkpoint:
+                        # Activo aunque el escaneo se corte antes de su sonda
+                        checkpoint.registrar_activo(ip)
+                    if planificador is not None and tipo_sonda == "icmp":
+                        # En modo TCP se sondea igual: interesan sus puertos
+                        planificador.descartar(ip)
+                    hallados_probe.append(ip)
+        except Exception as e:
+            print(f"[WARN] Error en descubrimiento SSDP/mDNS: {e}")
 
-            subnet1, subnet2 = calculate_ip_range(start_ip, end_ip)  # type: ignore
-            subnets = [subnet1]
-            if subnet2:
-                subnets.append(subnet2)
-        except ValueError as e:
-            print(f"  [ERROR] Rango inválido {range_str}: {e}")
-            continue
-
-        for sub_idx, network in enumerate(subnets):
-            print(f"  -> Subred {sub_idx+1}: {network}")
-            # Emitir progreso al callback si existe
-            if callback_progreso:
-                try:
-                    callback_progreso(
-                        {
-                            "tipo": "rango",
-                            "rango_actual": range_str,
-                            "rango_index": idx,
-                            "rangos_totales": total_ranges,
-                            "mensaje": f"Escaneando rango {idx}/{total_ranges}: {range_str} -> {network}",
-                        }
-                    )
-                except Exception as e:
-                    print(f"[WARN] Error emitiendo progreso: {e}")
-
-            # Probe by broadcast/multicast first (cheap)
-            found_ips = set()
-            if use_broadcast_probe:
-                try:
-                    found_ips = await loop.run_in_executor(
-                        None, probe_block, network, None, probe_timeout, True
-                    )
-                except Exception:
-                    found_ips = set()
-                if found_ips:
-                    print(
-                        f"     probe found {len(found_ips)} hosts (examples: {list(found_ips)[:6]})"
-                    )
-                    all_alive.update(found_ips)
-
-            # Hacer ping sweep en la red (complementa los probes)
-            num_hosts = network.num_addresses - 2
-            if num_hosts <= 0:
-                continue
-            # Saltar si el bloque es muy grande
-            if num_hosts > 4096:
-                print(
-                    f"     skipping sweep of {network} (too large: {num_hosts} hosts)"
-                )
-                continue
-            print(f"     doing chunked sweep of {network} ({num_hosts} hosts)")
-            alive = await ping_sweep_chunked(
-                network,
+    probes = None
+    if use_broadcast_probe:
+        probes = asyncio.ensure_future(consumir_descubrimiento())
+
+    print(
+        f"\n     doing interleaved {tipo_sonda} sweep of {total_ranges} range(s) "
+        f"({total_ips} hosts)"
+    )
+    try:
+        if repartido:
+            # Los procesos no ven los hallazgos de SSDP/mDNS: esos equipos
+            # también reciben su sonda (no cambia el resultado)
+            alive, subredes = await ping_sweep_procesos(
+                rangos,
+                workers,
                 chunk_size=chunk_size,
                 per_host_timeout=per_host_timeout,
                 per_subnet_timeout=per_subnet_timeout,
                 concurrency=concurrency,
+                al_avanzar=al_avanzar,
+                tipo_sonda=tipo_sonda,
+                puertos=puertos,
+                resultados_puertos=resultados_puertos,
+                omitir=barridos,
+                al_activo=al_activo,
+            )
+        else:
+            sonda = None
+            if tipo_sonda == "tcp":
+                sonda = crear_sonda_tcp(puertos, per_host_timeout, resultados_puertos)
+            alive = await ping_sweep_chunked(
+                planificador,
+                chunk_size=chunk_size,
+                per_host_timeout=per_host_timeout,
+                per_subnet_timeout=None,  # Cada subred aplica su propio plazo
+                concurrency=control,
+                total=total_ips,
+                al_completar=al_completar,
+                sonda=sonda,
+                al_activo=al_activo,
+            )
+            print(f"     {control.resumen()}")
+            subredes = planificador.resumen(alive)
+    finally:
+        # Terminado o interrumpido: lo barrido hasta acá queda en disco
+        if checkpoint:
+            checkpoint.guardar()
+    progreso.saltar_hasta(total_ips)
+    all_alive.update(alive)
+
+    for texto, activos, enviados, total, cortada in subredes:
+        estado = " (plazo vencido)" if cortada else ""
+        print(f"     => {texto}: {activos} alive, {enviados}/{total} hosts{estado}")
+
+    if tipo_sonda == "tcp":
+        for puerto in puertos:
+            abiertos = sum(
+                1
+                for estados in resultados_puertos.values()
+                if estados[puerto] == ABIERTO
+            )
+            print(f"     => tcp/{puerto}: {abiertos} host(s) con el puerto abierto")
+
+    if probes is not None:
+        await probes
+        if hallados_probe:
+            print(
+                f"     probe found {len(hallados_probe)} hosts "
+                f"(examples: {hallados_probe[:6]})"
             )
-            if alive:
-                print(f"     => {len(alive)} alive in network (examples: {alive[:6]})")
-                all_alive.update(alive)
-            else:
-                print("     => 0 alive in network")
 
     return sorted(all_alive, key=lambda s: tuple(int(x) for x in s.split(".")))
 
 
+async def eventos_escaneo(
+    ranges, **opciones
+) -> AsyncIterator[EventoDescubrimiento]:
+    """Corre `scan_blocks` y entrega cada host activo apenas se lo encuentra.
+
+    Uso:
+        async for evento in eventos_escaneo(rangos, chunk_size=256, ...):
+            print(evento.ip, evento.metodo, evento.rtt_ms)
+
+    `opciones` son los argumentos de `scan_blocks` (salvo `flujo`). Si el
+    consumidor deja de iterar, el escaneo se cancela.
+    """
+    flujo = FlujoDescubrimientos()
+    eventos = flujo.suscribir()
+    escaneo = asyncio.ensure_future(scan_blocks(ranges, flujo=flujo, **opciones))
+    escaneo.add_done_callback(lambda _: flujo.cerrar())
+    try:
+        async for evento in eventos:
+            yield evento
+        await escaneo  # Propaga los errores del escaneo
+    finally:
+        if not escaneo.done():
+            escaneo.cancel()
+
+
+async def _escanear_con_sumideros(sumideros, callback_progreso, **opciones):
+    """`scan_blocks` con cada sumidero consumiendo su propio flujo de eventos.
+
+    Un sumidero es una corrutina `async def sumidero(eventos)` que itera los
+    EventoDescubrimiento (p. ej. el alta en la base de datos); si falla, se
+    registra y el escaneo sigue.
+    """
+    flujo = FlujoDescubrimientos()
+
+    async def notificar(eventos):
+        async for evento in eventos:
+            callback_progreso({"tipo": "host", **evento._asdict()})
+
+    async def consumir(sumidero, eventos):
+        try:
+            await sumidero(eventos)
+        except Exception as e:
+            print(f"[WARN] Error en sumidero de descubrimientos: {e}")
+            async for _ in eventos:  # Vaciar la cola hasta el final
+                pass
+
+    tareas = [
+        asyncio.ensure_future(consumir(sumidero, flujo.suscribir()))
+        for sumidero in sumideros
+    ]
+    if callback_progreso:
+        tareas.append(asyncio.ensure_future(consumir(notificar, flujo.suscribir())))
+    try:
+        return await scan_blocks(
+            flujo=flujo, callback_progreso=callback_progreso, **opciones
+        )
+    finally:
+        flujo.cerrar()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
+
+async def persistir_hosts(
+    eventos, resultados_puertos=None, tipo_sonda="icmp", lote=SCAN_HOSTS_BATCH
+):
+    """Sumidero del escaneo: registra los hosts activos en la tabla `hosts`.
+
+    Los eventos se agrupan de a `lote` y cada grupo es un solo UPSERT en el
+    escritor de DB (`sql.setHosts`). En modo TCP un host queda en espera hasta
+    tener el resultado de sus puertos, para guardar `agent_port_open`.
+
+    Returns:
+        int: Hosts registrados
+    """
+    # Import diferido: los procesos del sweep importan este módulo y no usan DB
+    from sql import ejecutar_sql as sql
+    from sql.escritor_db import obtener_escritor
+
+    escritor = obtener_escritor()
+    if resultados_puertos is None:
+        resultados_puertos = {}
+    pendientes = []
+    envios = []
+    registrados = 0
+
+    def enviar(final=False):
+        nonlocal pendientes, registrados
+        listos, pendientes = pendientes, []
+        if tipo_sonda == "tcp" and not final:
+            pendientes = [e for e in listos if e.ip not in resultados_puertos]
+            listos = [e for e in listos if e.ip in resultados_puertos]
+        if not listos:
+            return
+        filas = [
+            (
+                ip_a_entero(evento.ip),
+                None,  # MAC: la envía el cliente al conectarse
+                datetime.fromtimestamp(evento.timestamp).isoformat(),
+                evento.metodo,
+                tiene_agente(resultados_puertos.get(evento.ip, {})),
+            )
+            for evento in listos
+        ]
+        envios.append(asyncio.wrap_future(escritor.enviar(sql.setHosts, filas)))
+        registrados += len(filas)
+
+    async for evento in eventos:
+        pendientes.append(evento)
+        if len(pendientes) >= lote:
+            enviar()
+    enviar(final=True)
+    await asyncio.gather(*envios)
+    print(f"     hosts table: {registrados} host(s) registrados")
+    return registrados
+
+
+def exportar_hosts_csv(ruta=CSV_FILENAME):
+    """Exporta la tabla `hosts` a CSV (ip, mac, agente), ordenada por IP.
+
+    Columna "agente": 1 = daemon en PUERTO_AGENTE, 0 = sondeado sin daemon,
+    vacío = sin sondear (escaneo ICMP). Se escribe en un temporal junto al
+    destino y se reemplaza al final.
+
+    Returns:
+        int: Hosts exportados
+    """
+    from sql import ejecutar_sql as sql
+
+    conn = sql.get_thread_safe_connection()
+    try:
+        hosts = sql.getHosts(conn=conn)
+    finally:
+        conn.close()
+
+    ruta = Path(ruta)
+    temporal = ruta.with_suffix(".tmp")
+    with open(temporal, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ip", "mac", "agente"])
+        for ip, mac, agente, _ in hosts:
+            agente = "" if agente is None else ("1" if agente else "0")
+            writer.writerow([entero_a_ip(ip), mac or "", agente])
+    os.replace(temporal, ruta)
+    return len(hosts)
+
+
 def parse_args():
     p = argparse.ArgumentParser(
         description="Optimized block scanner for custom IP ranges."
@@ -461,12 +1178,30 @@ def parse_args():
         "--per-subnet-timeout", type=float, default=DEFAULT_PER_SUBNET_TIMEOUT
     )
     p.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=SCAN_WORKERS,
+        help="Procesos del sweep para rangos grandes (0 = uno por núcleo)",
+    )
     p.add_argument("--probe-timeout", type=float, default=DEFAULT_PROBE_TIMEOUT)
     p.add_argument(
         "--use-broadcast-probe",
         action="store_true",
         help="use SSDP/mDNS probe before sweeping blocks",
     )
+    p.add_argument(
+        "--probe",
+        default=DEFAULT_SCAN_PROBE,
+        help="Sonda del sweep: icmp (ping) o tcp:puerto,... (connect). "
+        "Ej: --probe tcp:5256,445,135",
+    )
+    p.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continuar el escaneo interrumpido de estos mismos rangos y sonda "
+        "(output/scan_checkpoint.json)",
+    )
     p.add_argument("--csv", action="store_true", help="save CSV (default: yes)")
     return p.parse_args()
 
@@ -503,7 +1238,9 @@ def _ping_ip_sync(ip: str, timeout: float = 1.0) -> bool:
 
 
 # ------------------ ENTRYPOINT ------------------
-def main(callback_progreso=None, ranges=None):
+def main(
+    callback_progreso=None, ranges=None, probe=None, reanudar=False, sumideros=()
+):
     """
     Entry point principal del scanner.
 
@@ -511,6 +1248,13 @@ def main(callback_progreso=None, ranges=None):
         callback_progreso: Función opcional que recibe diccionarios con información de progreso.
                           Ejemplo: {'tipo': 'rango', 'rango_actual': '10.100.10.50-10.100.10.58', 'mensaje': '...'}
         ranges: Lista de rangos en formato ['10.100.2.1-10.100.2.254']. Si es None, usa argparse.
+        probe: Sonda del sweep ("icmp" o "tcp:5256,445,135"); default SCAN_PROBE.
+        reanudar: Continuar desde el checkpoint de un escaneo interrumpido con
+                  los mismos rangos y sonda (equivale a --resume).
+        sumideros: Corrutinas `async def sumidero(eventos)` que reciben cada
+                   host activo (EventoDescubrimiento) durante el escaneo. Con
+                   callback_progreso, además se emite {'tipo': 'host', 'ip',
+                   'metodo', 'rtt_ms', 'timestamp'} por cada uno.
     """
     # Si se pasan rangos directamente, usarlos; si no, parsear argumentos
     if ranges:
@@ -521,9 +1265,12 @@ def main(callback_progreso=None, ranges=None):
             chunk_size=256,
             per_host_timeout=1.0,
             per_subnet_timeout=5.0,
-            concurrency=100,
+            concurrency=DEFAULT_CONCURRENCY,
             probe_timeout=0.5,
             use_broadcast_probe=False,
+            probe=probe or DEFAULT_SCAN_PROBE,
+            workers=SCAN_WORKERS,
+            resume=reanudar,
         )
     else:
         args = parse_args()
@@ -537,21 +1284,40 @@ def main(callback_progreso=None, ranges=None):
         print("ERROR:", e)
 
     print(
-        f"Scanning custom ranges: {args.ranges} (use-broadcast={args.use_broadcast_probe})"
+        f"Scanning custom ranges: {args.ranges} "
+        f"(use-broadcast={args.use_broadcast_probe}, probe={args.probe})"
     )
+    resultados_puertos = {}
+    # La tabla `hosts` es el registro de lo descubierto: se completa durante
+    # el escaneo por lotes y el CSV se exporta desde ella al final
+    tipo_sonda, _ = parsear_sonda(args.probe)
+    sumideros = [
+        partial(
+            persistir_hosts,
+            resultados_puertos=resultados_puertos,
+            tipo_sonda=tipo_sonda,
+        ),
+        *sumideros,
+    ]
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
         alive = loop.run_until_complete(
-            scan_blocks(
-                args.ranges,
+            _escanear_con_sumideros(
+                sumideros,
+                callback_progreso,
+                ranges=args.ranges,
                 chunk_size=args.chunk_size,
                 per_host_timeout=args.per_host_timeout,
                 per_subnet_timeout=args.per_subnet_timeout,
                 concurrency=args.concurrency,
                 probe_timeout=args.probe_timeout,
                 use_broadcast_probe=args.use_broadcast_probe,
-                callback_progreso=callback_progreso,
+                probe=args.probe,
+                resultados_puertos=resultados_puertos,
+                workers=args.workers,
+                ruta_checkpoint=CHECKPOINT_FILENAME,
+                reanudar=args.resume,
             )
         )
     finally:
@@ -597,84 +1363,28 @@ def main(callback_progreso=None, ranges=None):
         except Exception:
             pass
 
-    # --- Guardar IPs descubiertas en CSV temporal (sin MACs todavía) ---
-    temp_csv = "discovered_devices.csv"
-
-    # 1. Leer dispositivos existentes del CSV (preservar lista histórica)
-    existing_devices = {}
-    if os.path.exists(CSV_FILENAME):
-        try:
-            with open(CSV_FILENAME, "r", newline="", encoding="utf-8") as f:
-                reader = csv.reader(f)
-                header = next(reader, None)
-                if header == ["ip", "mac"]:
-                    for row in reader:
-                        if len(row) == 2:
-                            existing_devices[row[0]] = row[1] if row[1] else ""
-        except Exception as e:
-            print(f"Advertencia: No se pudo leer CSV existente: {e}")
-
-    # 2. Agregar nuevas IPs del escaneo FILTRADAS (solo computadoras)
-    for ip, mac in merged:
-        if ip not in existing_devices:
-            existing_devices[ip] = mac or ""
-
-    # 3. Ordenar por IP (numéricamente)
-    sorted_devices = sorted(
-        existing_devices.items(), key=lambda item: tuple(map(int, item[0].split(".")))
-    )
-
-    # 4. Escribir CSV temporal con todas las IPs
+    # --- Exportar la tabla `hosts` a CSV (sin MACs: las envían los clientes) ---
     if callback_progreso:
         try:
             callback_progreso(
                 {
                     "tipo": "fase",
                     "fase": "guardando_csv",
-                    "mensaje": f"Guardando CSV con {len(sorted_devices)} dispositivos...",
+                    "mensaje": "Exportando hosts descubiertos a CSV...",
                 }
             )
         except Exception:
             pass
 
-    with open(temp_csv, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["ip", "mac"])
-        for ip, mac in sorted_devices:
-            writer.writerow([ip, mac])
-
-    print(f"\n>> Poblando MACs con get_mac.py (rapido: ~3.6s)...")
-
-    if callback_progreso:
-        try:
-            callback_progreso(
-                {
-                    "tipo": "fase",
-                    "fase": "poblando_macs",
-                    "mensaje": "Poblando direcciones MAC desde tabla ARP...",
-                }
-            )
-        except Exception:
-            pass
-
-    # 5. Copiar CSV sin poblar MACs (los clientes enviarán sus MACs)
     try:
-        import shutil
-
-        shutil.copy2(temp_csv, CSV_FILENAME)
-        print(f"[OK] CSV guardado: '{CSV_FILENAME}' con {len(merged)} dispositivos")
+        exportados = exportar_hosts_csv(CSV_FILENAME)
+        print(f"[OK] CSV exportado: '{CSV_FILENAME}' con {exportados} hosts")
         print("   - MACs serán enviadas por los clientes al conectarse")
-
     except Exception as e:
-        print(f"Error guardando CSV: {e}")
-        # Fallback: copiar temp_csv como resultado
-        import shutil
+        print(f"Error exportando CSV: {e}")
 
-        shutil.copy(temp_csv, CSV_FILENAME)
-    finally:
-        # Limpiar archivo temporal
-        if os.path.exists(temp_csv):
-            os.remove(temp_csv)
+    # Hosts registrados y CSV exportado: el checkpoint ya no hace falta
+    borrar_checkpoint(CHECKPOINT_FILENAME)
 
     return alive
 
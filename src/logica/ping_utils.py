@@ -1,9 +1,53 @@
 """Utilidades de ping asíncrono reutilizables para el proyecto.
-Provee `ping_one_cmd` y `ping_host` con manejo cross-platform y sin ventanas en Windows.
+Provee `ping_host`, `ping_rtt` y `ping_many` sobre un motor ICMP en proceso, y
+`ping_one_cmd` (un proceso `ping` por host) como último recurso, sin ventanas en
+Windows.
+
+El motor ICMP usa UN socket por event loop para todos los pings: envía los echo
+request y empareja las respuestas por identificador/secuencia, de modo que miles
+de pings pendientes no crean ningún proceso. Socket, en orden de preferencia:
+    1. ICMP datagrama sin privilegios (Linux con ping_group_range, macOS)
+    2. ICMP raw (Windows como administrador, root)
+    3. Sin socket disponible: `ping_one_cmd` por host
 """
 
-from asyncio import create_subprocess_exec, subprocess as asyncio_subprocess, wait_for
-from subprocess import STARTUPINFO, STARTF_USESHOWWINDOW, SW_HIDE, CREATE_NO_WINDOW
+from asyncio import (
+    create_subprocess_exec,
+    gather,
+    get_running_loop,
+    sleep,
+    subprocess as asyncio_subprocess,
+    wait_for,
+)
+from os import getpid, urandom
+from platform import system
+from socket import (
+    AF_INET,
+    IPPROTO_ICMP,
+    SOCK_DGRAM,
+    SOCK_RAW,
+    SOL_SOCKET,
+    SO_RCVBUF,
+    error as SocketError,
+    inet_aton,
+    socket,
+)
+from struct import pack, unpack_from
+from time import perf_counter
+from typing import Dict, Iterable, Optional
+from weakref import WeakKeyDictionary, finalize
+
+# Solo existen en Windows: en Linux/macOS el módulo debe importarse igual
+if system() == "Windows":
+    from subprocess import (
+        CREATE_NO_WINDOW,
+        STARTF_USESHOWWINDOW,
+        STARTUPINFO,
+        SW_HIDE,
+    )
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
 
 
 async def ping_one_cmd(host: str, per_host_timeout: float) -> bool:
@@ -12,27 +56,26 @@ async def ping_one_cmd(host: str, per_host_timeout: float) -> bool:
     per_host_timeout: segundos por ping (float)
     """
     try:
-
-        # Windows: usar ping -n 1 -w <ms>
-        cmd = ["ping", "-n", "1", "-w", str(int(per_host_timeout * 1000)), host]
-        # Ocultar ventana en Windows
-        startupinfo = STARTUPINFO()
-        try:
+        opciones = {}
+        if system() == "Windows":
+            # Windows: usar ping -n 1 -w <ms>
+            cmd = ["ping", "-n", "1", "-w", str(int(per_host_timeout * 1000)), host]
+            # Ocultar ventana en Windows
+            startupinfo = STARTUPINFO()
             startupinfo.dwFlags |= STARTF_USESHOWWINDOW
             startupinfo.wShowWindow = SW_HIDE
-        except Exception:
-            pass
-        creationflags = 0
-        try:
-            creationflags = CREATE_NO_WINDOW
-        except Exception:
-            creationflags = 0
+            opciones = {"startupinfo": startupinfo, "creationflags": CREATE_NO_WINDOW}
+        elif system() == "Darwin":
+            # macOS: -W en milisegundos
+            cmd = ["ping", "-c", "1", "-W", str(int(per_host_timeout * 1000)), host]
+        else:
+            # Linux: -W en segundos enteros
+            cmd = ["ping", "-c", "1", "-W", str(max(1, round(per_host_timeout))), host]
         proc = await create_subprocess_exec(
             *cmd,
             stdout=asyncio_subprocess.DEVNULL,
             stderr=asyncio_subprocess.DEVNULL,
-            startupinfo=startupinfo,
-            creationflags=creationflags
+            **opciones,
         )
 
         ret = await proc.wait()
@@ -41,13 +84,215 @@ async def ping_one_cmd(host: str, per_host_timeout: float) -> bool:
         return False
 
 
-async def ping_host(host: str, per_host_timeout: float) -> bool:
-    """Wrapper que aplica timeout alrededor de ping_one_cmd.
-    Devuelve False ante cualquier excepción o timeout.
+def _checksum(datos: bytes) -> int:
+    """Checksum de Internet (RFC 1071) de un mensaje ICMP."""
+    if len(datos) % 2:
+        datos += b"\x00"
+    total = sum(unpack_from(f"!{len(datos) // 2}H", datos))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class MotorICMP:
+    """Motor de ping ICMP en proceso ligado a un event loop.
+
+    Todos los echo request salen por un único socket y una sola tarea lectora
+    (activa solo mientras hay pings pendientes) resuelve el futuro de cada uno
+    al llegar su respuesta. Las respuestas se emparejan por secuencia, IP de
+    origen y una marca aleatoria en el payload: con sockets raw el kernel
+    entrega a cada socket los echo reply de todos los procesos.
+    """
+
+    def __init__(self, sock: socket, raw: bool):
+        self.sock = sock
+        self.raw = raw
+        # Con sockets datagrama el kernel reemplaza el id por el puerto local
+        self.identificador = (getpid() ^ int.from_bytes(urandom(2), "big")) & 0xFFFF
+        self.marca = urandom(8)
+        self._secuencia = 0
+        self._pendientes: Dict[int, tuple] = {}
+        self._lectora = None
+
+    @classmethod
+    def crear(cls) -> Optional["MotorICMP"]:
+        """Abre el socket ICMP disponible (datagrama o raw); None si ninguno."""
+        for tipo, raw in ((SOCK_DGRAM, False), (SOCK_RAW, True)):
+            try:
+                sock = socket(AF_INET, tipo, IPPROTO_ICMP)
+            except (OSError, ValueError):
+                continue
+            if raw:
+                try:
+                    # Windows rechaza recvfrom en un raw socket sin bind (WSAEINVAL)
+                    sock.bind(("0.0.0.0", 0))
+                except OSError:
+                    sock.close()
+                    continue
+            sock.setblocking(False)
+            try:
+                # Espacio para ráfagas de miles de respuestas de `ping_many`
+                sock.setsockopt(SOL_SOCKET, SO_RCVBUF, 1 << 20)
+            except OSError:
+                pass
+            return cls(sock, raw)
+        return None
+
+    def cerrar(self):
+        """Cierra el socket y da por perdidos los pings pendientes."""
+        for _, futuro, _ in self._pendientes.values():
+            if not futuro.done():
+                futuro.set_result(None)
+        self._pendientes.clear()
+        self.sock.close()
+
+    async def ping(self, ip: str, timeout: float) -> Optional[float]:
+        """Envía un echo request a `ip` (dirección IPv4).
+
+        Returns:
+            RTT en milisegundos, o None si no hubo respuesta dentro de `timeout`
+        """
+        loop = get_running_loop()
+        secuencia = self._siguiente_secuencia()
+        futuro = loop.create_future()
+        paquete = self._paquete(secuencia)
+        self._pendientes[secuencia] = (ip, futuro, perf_counter())
+        try:
+            try:
+                self.sock.sendto(paquete, (ip, 0))
+            except BlockingIOError:
+                await loop.sock_sendto(self.sock, paquete, (ip, 0))
+            if self._lectora is None:
+                self._lectora = loop.create_task(self._leer())
+            return await wait_for(futuro, timeout)
+        except Exception:
+            return None
+        finally:
+            self._pendientes.pop(secuencia, None)
+            # Sin pendientes, no dejar la lectora bloqueada en recvfrom
+            if not self._pendientes and self._lectora is not None:
+                self._lectora.cancel()
+                self._lectora = None
+
+    def _siguiente_secuencia(self) -> int:
+        """Secuencia de 16 bits que no esté en uso por un ping pendiente."""
+        for _ in range(0x10000):
+            self._secuencia = (self._secuencia + 1) & 0xFFFF
+            if self._secuencia not in self._pendientes:
+                return self._secuencia
+        raise RuntimeError("Demasiados pings ICMP pendientes")
+
+    def _paquete(self, secuencia: int) -> bytes:
+        def cabecera(suma):
+            return pack(
+                "!BBHHH", ICMP_ECHO_REQUEST, 0, suma, self.identificador, secuencia
+            )
+
+        return cabecera(_checksum(cabecera(0) + self.marca)) + self.marca
+
+    async def _leer(self):
+        """Recibe respuestas mientras queden pings pendientes."""
+        loop = get_running_loop()
+        while self._pendientes:
+            try:
+                datos, (origen, _) = await loop.sock_recvfrom(self.sock, 2048)
+            except SocketError:
+                await sleep(0.01)  # p.ej. ICMP de error asociado al socket
+                continue
+            self._procesar(datos, origen)
+
+    def _procesar(self, datos: bytes, origen: str):
+        # Sockets raw (y datagrama en macOS) incluyen la cabecera IPv4
+        if len(datos) >= 20 and datos[0] >> 4 == 4:
+            datos = datos[(datos[0] & 0x0F) * 4 :]
+        if len(datos) < 16 or datos[0] != ICMP_ECHO_REPLY:
+            return
+        identificador, secuencia = unpack_from("!HH", datos, 4)
+        if self.raw and identificador != self.identificador:
+            return
+        if datos[8:16] != self.marca:
+            return
+        pendiente = self._pendientes.get(secuencia)
+        if not pendiente or pendiente[0] != origen:
+            return
+        _, futuro, inicio = pendiente
+        if not futuro.done():
+            futuro.set_result((perf_counter() - inicio) * 1000)
+
+
+# Un motor por event loop: en Windows un socket solo puede asociarse a un
+# IOCP, y `run_async`/los hilos de la UI crean loops propios
+_motores: "WeakKeyDictionary" = WeakKeyDictionary()
+
+
+def obtener_motor() -> Optional[MotorICMP]:
+    """Motor ICMP del event loop actual (None si no hay socket ICMP usable)."""
+    loop = get_running_loop()
+    if loop not in _motores:
+        motor = MotorICMP.crear()
+        if motor is not None:
+            # Cerrar el socket cuando el loop deje de existir
+            finalize(loop, motor.sock.close)
+        _motores[loop] = motor
+    return _motores[loop]
+
+
+async def _resolver_ipv4(host: str) -> str:
+    """Devuelve `host` si ya es IPv4; si no, lo resuelve."""
+    try:
+        inet_aton(host)
+        return host
+    except OSError:
+        infos = await get_running_loop().getaddrinfo(host, None, family=AF_INET)
+        return infos[0][4][0]
+
+
+async def ping_rtt(host: str, per_host_timeout: float) -> Optional[float]:
+    """Hace ping a `host` y devuelve el RTT en milisegundos (None si no responde).
+
+    Sin socket ICMP disponible usa `ping_one_cmd`; en ese caso el RTT es el
+    tiempo total del proceso, no el del echo.
     """
     try:
-        return await wait_for(
-            ping_one_cmd(host, per_host_timeout), timeout=per_host_timeout + 0.5
-        )
+        motor = obtener_motor()
+        if motor is None:
+            inicio = perf_counter()
+            ok = await wait_for(
+                ping_one_cmd(host, per_host_timeout), timeout=per_host_timeout + 0.5
+            )
+            return (perf_counter() - inicio) * 1000 if ok else None
+        return await motor.ping(await _resolver_ipv4(host), per_host_timeout)
     except Exception:
-        return False
+        return None
+
+
+async def ping_host(host: str, per_host_timeout: float) -> bool:
+    """Devuelve True si `host` responde al ping dentro de `per_host_timeout`.
+    Devuelve False ante cualquier excepción o timeout.
+    """
+    return await ping_rtt(host, per_host_timeout) is not None
+
+
+async def ping_many(
+    ips: Iterable[str], timeout: float, lote_envio: int = 256
+) -> Dict[str, Optional[float]]:
+    """Hace ping a todas las IPs a la vez por el mismo socket.
+
+    Args:
+        ips: Direcciones a consultar
+        timeout: Segundos de espera por cada respuesta
+        lote_envio: Cada cuántos envíos ceder el loop (evita ráfagas que el
+            kernel o la red descartan)
+
+    Returns:
+        dict: {ip: RTT en milisegundos o None si no respondió}
+    """
+    tareas = {}
+    loop = get_running_loop()
+    for i, ip in enumerate(ips, 1):
+        if ip not in tareas:
+            tareas[ip] = loop.create_task(ping_rtt(ip, timeout))
+        if i % lote_envio == 0:
+            await sleep(0)
+    resultados = await gather(*tareas.values())
+    return dict(zip(tareas.keys(), resultados))
@@ -0,0 +1,474 @@
+"""Protocolo de mensajes con framing por longitud entre clientes y servidor.
+
+Formato de un mensaje (versión 1):
+
+    +--------+---------+-------+----------+-----------+------------------+
+    | magic  | version | flags | reservado| longitud  | payload          |
+    | 4 B    | 1 B     | 1 B   | 2 B      | 4 B (BE)  | `longitud` bytes |
+    +--------+---------+-------+----------+-----------+------------------+
+
+- `magic` es siempre b"SPNT" y permite distinguir mensajes enmarcados de los
+  clientes antiguos que envían el JSON crudo y cierran la conexión.
+- `flags`: bits 0-3 = formato del payload, bits 4-7 = compresión.
+
+Compresión negociada: el servidor anuncia en la solicitud las compresiones que
+acepta (`GET_SPECS ACCEPT=zstd,zlib`) y el daemon elige la primera que también
+tenga disponible. Con `REPLY=tls` (o `REPLY=plain`) el daemon responde por la
+misma conexión; en modo TLS el servidor hace de servidor TLS y el daemon de
+cliente TLS sobre esa conexión, sin abrir una segunda conexión al puerto 5255.
+Los daemons antiguos solo entienden el comando exacto `GET_SPECS`: el servidor
+usa estas extensiones únicamente con los daemons que las anuncian ("caps") en
+sus latidos o en la respuesta al sondeo de estado.
+
+`longitud` es siempre el tamaño del payload comprimido; el tamaño descomprimido
+se limita por separado al decodificar, de modo que el límite `MAX_BUFFER_SIZE`
+se respeta aunque el payload sea una "zip bomb".
+
+El receptor conoce el tamaño antes de leer el payload, lo rechaza si supera el
+límite configurado y lo lee en un único buffer preasignado (sin `buffer +=` ni
+reintentos de `json.loads` por cada bloque recibido).
+
+Datagramas UDP (latidos, sondeo de estado): un solo datagrama autenticado con
+HMAC-SHA256 del secreto compartido, sin conexión ni handshake:
+
+    +--------+-------------------+-------------------------------+
+    | magic  | HMAC-SHA256       | JSON (incluye "ts" de envío)  |
+    | 4 B    | 32 B              | resto del datagrama           |
+    +--------+-------------------+-------------------------------+
+"""
+
+import hmac
+import zlib
+from hashlib import sha256
+from json import dumps, loads
+from struct import Struct
+from time import time
+from typing import Iterable, NamedTuple, Optional
+
+# zstd es opcional: sin el paquete `zstandard` solo se negocia zlib
+try:
+    import zstandard  # type: ignore[import]
+except ImportError:
+    zstandard = None
+
+MAGIC = b"SPNT"
+PROTOCOLO_VERSION = 1
+
+# Formatos de payload (bits 0-3 de flags)
+FORMATO_JSON = 0x0
+
+# Compresión del payload (bits 4-7 de flags)
+COMPRESION_NINGUNA = 0x0
+COMPRESION_ZLIB = 0x1
+COMPRESION_ZSTD = 0x2
+
+# Nombres usados en la negociación (ACCEPT=...) y en la configuración
+NOMBRES_COMPRESION = {"zlib": COMPRESION_ZLIB, "zstd": COMPRESION_ZSTD}
+
+# Límite por defecto del payload descomprimido (igual al MAX_BUFFER_SIZE por defecto)
+MAX_DESCOMPRIMIDO = 10 * 1024 * 1024
+
+_CABECERA = Struct(">4sBBHI")
+TAMANO_CABECERA = _CABECERA.size
+
+MAGIC_DATAGRAMA = b"SPNU"
+TAMANO_FIRMA = 32  # HMAC-SHA256
+MAX_DATAGRAMA = 1200  # Cabe en un solo paquete sin fragmentar
+
+
+class ErrorProtocolo(ValueError):
+    """Mensaje mal formado, truncado o que excede los límites permitidos."""
+
+
+class Cabecera(NamedTuple):
+    version: int
+    formato: int
+    compresion: int
+    longitud: int
+
+
+def empaquetar(
+    payload: bytes,
+    formato: int = FORMATO_JSON,
+    compresion: int = COMPRESION_NINGUNA,
+) -> bytes:
+    """Antepone la cabecera de framing a `payload`.
+
+    Args:
+        payload: Bytes a enviar (ya comprimidos si `compresion` lo indica)
+        formato: Formato del payload (FORMATO_*)
+        compresion: Algoritmo aplicado al payload (COMPRESION_*)
+
+    Returns:
+        bytes: Mensaje listo para `sendall()`
+    """
+    flags = (formato & 0x0F) | ((compresion & 0x0F) << 4)
+    return _CABECERA.pack(MAGIC, PROTOCOLO_VERSION, flags, 0, len(payload)) + payload
+
+
+def codificar_json(
+    datos: dict, compresion: int = COMPRESION_NINGUNA, nivel: int = 6
+) -> bytes:
+    """Serializa `datos` como JSON y lo empaqueta en un mensaje enmarcado.
+
+    Args:
+        datos: Diccionario a enviar
+        compresion: Compresión negociada con el receptor (COMPRESION_*)
+        nivel: Nivel de compresión (zlib 1-9, zstd 1-22)
+    """
+    payload = dumps(datos).encode("utf-8")
+    if compresion != COMPRESION_NINGUNA:
+        comprimido = comprimir(payload, compresion, nivel)
+        # Payloads pequeños o ya comprimidos pueden crecer: enviar sin comprimir
+        if len(comprimido) < len(payload):
+            return empaquetar(comprimido, FORMATO_JSON, compresion)
+    return empaquetar(payload, FORMATO_JSON)
+
+
+# ------------------ COMPRESIÓN ------------------
+def compresiones_disponibles() -> list[str]:
+    """Nombres de las compresiones soportadas en este proceso, por preferencia."""
+    disponibles = ["zlib"]
+    if zstandard is not None:
+        disponibles.insert(0, "zstd")
+    return disponibles
+
+
+def parsear_compresiones(texto: str) -> list[str]:
+    """Convierte "zstd,zlib" en la lista de nombres conocidos y disponibles.
+
+    Nombres desconocidos o no instalados se ignoran; "none" o "" dan lista vacía.
+    """
+    disponibles = compresiones_disponibles()
+    nombres = [n.strip().lower() for n in (texto or "").split(",")]
+    return [n for n in nombres if n in disponibles]
+
+
+def elegir_compresion(aceptadas: Iterable[str], permitidas: Iterable[str]) -> int:
+    """Elige la primera compresión aceptada por el receptor que el emisor permite.
+
+    Args:
+        aceptadas: Compresiones anunciadas por el receptor (en su orden de preferencia)
+        permitidas: Compresiones habilitadas y disponibles en el emisor
+
+    Returns:
+        int: COMPRESION_* acordada (COMPRESION_NINGUNA si no hay coincidencia)
+    """
+    permitidas = set(permitidas)
+    for nombre in aceptadas:
+        if nombre in permitidas:
+            return NOMBRES_COMPRESION[nombre]
+    return COMPRESION_NINGUNA
+
+
+def comprimir(payload: bytes, compresion: int, nivel: int = 6) -> bytes:
+    """Comprime `payload` con el algoritmo indicado.
+
+    Raises:
+        ErrorProtocolo: Algoritmo desconocido o no disponible
+    """
+    if compresion == COMPRESION_NINGUNA:
+        return payload
+    if compresion == COMPRESION_ZLIB:
+        return zlib.compress(payload, max(1, min(nivel, 9)))
+    if compresion == COMPRESION_ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor(level=max(1, min(nivel, 22))).compress(payload)
+    raise ErrorProtocolo(f"Compresión no soportada: {compresion}")
+
+
+def descomprimir(payload: bytes, compresion: int, max_bytes: int) -> bytes:
+    """Descomprime `payload` sin producir nunca más de `max_bytes` bytes.
+
+    Raises:
+        ErrorProtocolo: Algoritmo no soportado, datos corruptos o tamaño
+            descomprimido mayor que `max_bytes`
+    """
+    if compresion == COMPRESION_NINGUNA:
+        return payload
+
+    try:
+        if compresion == COMPRESION_ZLIB:
+            descompresor = zlib.decompressobj()
+            datos = descompresor.decompress(payload, max_bytes + 1)
+            excedido = len(datos) > max_bytes or bool(descompresor.unconsumed_tail)
+            if not excedido and not descompresor.eof:
+                raise ErrorProtocolo("Payload zlib truncado")
+        elif compresion == COMPRESION_ZSTD and zstandard is not None:
+            lector = zstandard.ZstdDecompressor().stream_reader(payload)
+            datos = lector.read(max_bytes + 1)
+            excedido = len(datos) > max_bytes
+        else:
+            raise ErrorProtocolo(f"Compresión no soportada: {compresion}")
+    except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+        raise ErrorProtocolo(f"Payload comprimido inválido: {e}") from e
+
+    if excedido:
+        raise ErrorProtocolo(f"Payload descomprimido excede el máximo ({max_bytes})")
+    return datos
+
+
+# ------------------ SOLICITUDES DEL SERVIDOR AL DAEMON ------------------
+# Extensiones de la solicitud que entiende este daemon y anuncia en "caps":
+# GET_SPECS_IF_CHANGED, ACCEPT= y REPLY= (respuesta por la misma conexión)
+CAPACIDADES = ("if_changed", "accept", "reply")
+
+
+class Solicitud(NamedTuple):
+    comando: str
+    argumentos: list
+    aceptadas: list  # Compresiones aceptadas por el servidor (ACCEPT=)
+    respuesta: Optional[str]  # REPLY=: "tls"/"plain" = responder en la misma conexión
+
+
+def formatear_solicitud(
+    comando: str,
+    aceptadas: Iterable[str] = (),
+    argumentos: Iterable[str] = (),
+    respuesta: Optional[str] = None,
+) -> bytes:
+    """Construye una solicitud como b"GET_SPECS_IF_CHANGED <etag> ACCEPT=zlib REPLY=tls"
+
+    Sin argumentos ni opciones se envía solo el comando. Es lo que debe usar
+    quien habla con un daemon que no anunció `CAPACIDADES`: los daemons
+    antiguos solo responden al comando exacto `GET_SPECS`.
+    """
+    partes = [comando, *argumentos]
+    aceptadas = list(aceptadas)
+    if aceptadas:
+        partes.append(f"ACCEPT={','.join(aceptadas)}")
+    if respuesta:
+        partes.append(f"REPLY={respuesta}")
+    return " ".join(partes).encode("utf-8")
+
+
+def capacidades_anunciadas(datos: Optional[dict]) -> frozenset:
+    """Capacidades conocidas que anuncia un latido o respuesta de estado ("caps").
+
+    Sin el campo (daemons antiguos) o con un valor inválido devuelve un
+    conjunto vacío.
+    """
+    caps = datos.get("caps") if isinstance(datos, dict) else None
+    if not isinstance(caps, list):
+        return frozenset()
+    return frozenset(c for c in caps if c in CAPACIDADES)
+
+
+def parsear_solicitud(texto: str) -> Solicitud:
+    """Separa una solicitud en comando, argumentos y opciones (ACCEPT, REPLY)."""
+    partes = texto.strip().split()
+    if not partes:
+        return Solicitud("", [], [], None)
+
+    argumentos = []
+    aceptadas = []
+    respuesta = None
+    for parte in partes[1:]:
+        clave, igual, valor = parte.partition("=")
+        if igual and clave.upper() == "ACCEPT":
+            aceptadas = [n.strip().lower() for n in valor.split(",") if n.strip()]
+        elif igual and clave.upper() == "REPLY":
+            respuesta = valor.strip().lower() if valor.strip() else None
+        else:
+            argumentos.append(parte)
+    return Solicitud(partes[0], argumentos, aceptadas, respuesta)
+
+
+def desempaquetar_cabecera(cabecera: bytes, max_bytes: int) -> Cabecera:
+    """Valida y decodifica una cabecera de `TAMANO_CABECERA` bytes.
+
+    Args:
+        cabecera: Bytes de la cabecera
+        max_bytes: Tamaño máximo aceptado para el payload
+
+    Returns:
+        Cabecera: Campos decodificados
+
+    Raises:
+        ErrorProtocolo: Magic o versión desconocidos, o payload demasiado grande
+    """
+    magic, version, flags, _, longitud = _CABECERA.unpack(bytes(cabecera))
+    if magic != MAGIC:
+        raise ErrorProtocolo("Magic de protocolo inválido")
+    if version != PROTOCOLO_VERSION:
+        raise ErrorProtocolo(f"Versión de protocolo no soportada: {version}")
+    if longitud > max_bytes:
+        raise ErrorProtocolo(
+            f"Payload declarado de {longitud} bytes excede el máximo ({max_bytes})"
+        )
+    return Cabecera(version, flags & 0x0F, (flags >> 4) & 0x0F, longitud)
+
+
+def decodificar_payload(
+    cabecera: Optional[Cabecera], payload: bytes, max_bytes: Optional[int] = None
+) -> dict:
+    """Convierte el payload recibido en un diccionario.
+
+    Args:
+        cabecera: Cabecera del mensaje, o None si vino de un cliente sin framing
+        payload: Bytes del payload (posiblemente comprimido)
+        max_bytes: Tamaño máximo del payload descomprimido (None = MAX_DESCOMPRIMIDO;
+            los receptores pasan el mismo MAX_BUFFER_SIZE usado en la lectura)
+
+    Raises:
+        ErrorProtocolo: Formato o compresión no soportados, tamaño descomprimido
+            excesivo o JSON inválido
+    """
+    if cabecera is not None:
+        if cabecera.formato != FORMATO_JSON:
+            raise ErrorProtocolo(f"Formato de payload no soportado: {cabecera.formato}")
+        if cabecera.compresion != COMPRESION_NINGUNA:
+            if max_bytes is None:
+                max_bytes = MAX_DESCOMPRIMIDO
+            payload = descomprimir(payload, cabecera.compresion, max_bytes)
+
+    try:
+        return loads(payload.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ErrorProtocolo(f"JSON inválido: {e}") from e
+
+
+# ------------------ DATAGRAMAS UDP FIRMADOS ------------------
+def _firma(secreto: str, cuerpo: bytes) -> bytes:
+    return hmac.new(
+        (secreto or "").encode("utf-8"), MAGIC_DATAGRAMA + cuerpo, sha256
+    ).digest()
+
+
+def firmar_datagrama(datos: dict, secreto: str) -> bytes:
+    """Serializa `datos` (agregando "ts") y lo firma con HMAC-SHA256.
+
+    Raises:
+        ErrorProtocolo: Si el datagrama resultante excede MAX_DATAGRAMA
+    """
+    cuerpo = dumps({**datos, "ts": time()}, separators=(",", ":")).encode("utf-8")
+    datagrama = MAGIC_DATAGRAMA + _firma(secreto, cuerpo) + cuerpo
+    if len(datagrama) > MAX_DATAGRAMA:
+        raise ErrorProtocolo(f"Datagrama de {len(datagrama)} bytes excede el máximo")
+    return datagrama
+
+
+def verificar_datagrama(
+    datagrama: bytes, secreto: str, max_desfase: Optional[float] = 120.0
+) -> dict:
+    """Verifica la firma (y la antigüedad) de un datagrama y devuelve su JSON.
+
+    Args:
+        datagrama: Bytes recibidos
+        secreto: Secreto compartido (SHARED_SECRET)
+        max_desfase: Segundos máximos entre "ts" y el reloj local (None = no
+            verificar); limita la reutilización de datagramas capturados
+
+    Raises:
+        ErrorProtocolo: Magic, firma, JSON o marca de tiempo inválidos
+    """
+    inicio = len(MAGIC_DATAGRAMA) + TAMANO_FIRMA
+    if len(datagrama) <= inicio or not datagrama.startswith(MAGIC_DATAGRAMA):
+        raise ErrorProtocolo("Datagrama sin magic del protocolo")
+
+    firma, cuerpo = datagrama[len(MAGIC_DATAGRAMA) : inicio], datagrama[inicio:]
+    if not hmac.compare_digest(firma, _firma(secreto, cuerpo)):
+        raise ErrorProtocolo("Firma de datagrama inválida")
+
+    try:
+        datos = loads(cuerpo.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ErrorProtocolo(f"JSON inválido: {e}") from e
+    if not isinstance(datos, dict):
+        raise ErrorProtocolo("El datagrama no contiene un objeto JSON")
+
+    if max_desfase is not None:
+        try:
+            desfase = abs(time() - float(datos.get("ts", 0)))
+        except (TypeError, ValueError):
+            desfase = float("inf")
+        if desfase > max_desfase:
+            raise ErrorProtocolo("Datagrama vencido (marca de tiempo fuera de rango)")
+    return datos
+
+
+# ------------------ LECTURA CON SOCKETS SÍNCRONOS ------------------
+def recibir_exacto(sock, n: int) -> bytearray:
+    """Lee exactamente `n` bytes con `recv_into` sobre un buffer preasignado.
+
+    Raises:
+        ErrorProtocolo: Si la conexión se cierra antes de completar la lectura
+    """
+    buffer = bytearray(n)
+    vista = memoryview(buffer)
+    recibidos = 0
+    while recibidos < n:
+        leidos = sock.recv_into(vista[recibidos:], n - recibidos)
+        if leidos == 0:
+            raise ErrorProtocolo(
+                f"Conexión cerrada tras {recibidos} de {n} bytes esperados"
+            )
+        recibidos += leidos
+    return buffer
+
+
+def recibir_mensaje(sock, max_bytes: int) -> tuple[Optional[Cabecera], bytes]:
+    """Recibe un mensaje completo desde un socket bloqueante.
+
+    Si los primeros bytes no son el magic del protocolo se asume un cliente
+    antiguo sin framing: se lee hasta EOF respetando `max_bytes`.
+
+    Returns:
+        tuple: (cabecera o None si es legacy, payload)
+
+    Raises:
+        ErrorProtocolo: Mensaje truncado o que excede `max_bytes`
+    """
+    prefijo = recibir_exacto(sock, len(MAGIC))
+    if bytes(prefijo) == MAGIC:
+        resto = recibir_exacto(sock, TAMANO_CABECERA - len(MAGIC))
+        cabecera = desempaquetar_cabecera(prefijo + resto, max_bytes)
+        return cabecera, bytes(recibir_exacto(sock, cabecera.longitud))
+
+    # Cliente legacy: JSON crudo hasta que cierre la conexión
+    buffer = bytearray(prefijo)
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        buffer += data
+        if len(buffer) > max_bytes:
+            raise ErrorProtocolo(f"Payload legacy excede el máximo ({max_bytes})")
+    return None, bytes(buffer)
+
+
+# ------------------ LECTURA CON ASYNCIO ------------------
+async def leer_mensaje(reader, max_bytes: int) -> tuple[Optional[Cabecera], bytes]:
+    """Equivalente asíncrono de `recibir_mensaje` para un `asyncio.StreamReader`.
+
+    Raises:
+        ErrorProtocolo: Mensaje truncado o que excede `max_bytes`
+    """
+    from asyncio import IncompleteReadError
+
+    try:
+        prefijo = await reader.readexactly(len(MAGIC))
+    except IncompleteReadError as e:
+        if not e.partial:
+            return None, b""
+        raise ErrorProtocolo("Conexión cerrada antes de recibir la cabecera") from e
+
+    if prefijo == MAGIC:
+        try:
+            resto = await reader.readexactly(TAMANO_CABECERA - len(MAGIC))
+            cabecera = desempaquetar_cabecera(prefijo + resto, max_bytes)
+            return cabecera, await reader.readexactly(cabecera.longitud)
+        except IncompleteReadError as e:
+            raise ErrorProtocolo(
+                f"Mensaje truncado ({len(e.partial)} de {e.expected} bytes)"
+            ) from e
+
+    # Cliente legacy: JSON crudo hasta EOF
+    buffer = bytearray(prefijo)
+    while True:
+        chunk = await reader.read(65536)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise ErrorProtocolo(f"Payload legacy excede el máximo ({max_bytes})")
+    return None, bytes(buffer)
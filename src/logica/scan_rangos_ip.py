@@ -1,114 +1,244 @@
-import ipaddress
-from re import compile
+"""
+scan_rangos_ip.py
 
+Motor de rangos de IPs para el escáner.
 
-romper = False
+Convierte las entradas de `--ranges` (inicio-fin, CIDR, IPs sueltas o listas
+separadas por comas) en intervalos enteros exactos, fusiona los solapamientos
+entre todas las entradas y recorre las direcciones de forma perezosa (sin
+materializar listas): cada dirección pedida se escanea exactamente una vez.
 
+Ejemplo:
+    rangos = ConjuntoIPs.desde_textos(["10.100.1.100-10.100.1.120", "10.100.1.0/24"])
+    len(rangos)        # 254 direcciones (el /24 sin red ni broadcast)
+    rangos.bloques()   # Bloques CIDR exactos que cubren el conjunto
+    for ip in rangos:  # Generador de strings, en orden
+        ...
+"""
+
+from bisect import bisect_right
+from itertools import islice
+from ipaddress import IPv4Address, IPv4Network, ip_network, summarize_address_range
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+Intervalo = Tuple[int, int]  # (inicio, fin) inclusivos, como enteros
+
+
+def ip_a_entero(ip: str) -> int:
+    """Convierte "10.100.1.5" en entero. Lanza ValueError si no es IPv4."""
+    return int(IPv4Address(ip.strip()))
+
+
+def entero_a_ip(valor: int) -> str:
+    return str(IPv4Address(valor))
+
+
+def parsear_rango(texto: str) -> Intervalo:
+    """Convierte una entrada en un intervalo (inicio, fin) inclusivo.
+
+    Formatos:
+        "10.100.1.50-10.100.1.58"  rango exacto
+        "10.100.1.0/24"            CIDR (sin dirección de red ni broadcast,
+                                   como `ip_network(...).hosts()`)
+        "10.100.1.7"               IP suelta
 
-def calculate_ip_range(ip_start="10.100.0.0", ip_end=None):
-    """
-    Calcula el rango de IPs entre dos direcciones IP dadas.
-    Si la mascara es mayor a /16 advertir que puede tardar (hacer calculo de tiempo estimado realista)
-    Args:
-        ip_start (str): Dirección IP de inicio en formato decimal con puntos.
-        ip_end (str): Dirección IP de fin en formato decimal con puntos.
-    Returns:
-        tuple: (subred1, subred2) donde cada subred es un objeto ipaddress.IPv4Network.
-               Si hay error, retorna (red_simple, None) con una red /32 del ip_start
     Raises:
-        ValueError: Si las direcciones IP no son válidas.
+        ValueError: Si la entrada no es válida o inicio > fin
+    """
+    texto = texto.strip()
+    if "-" in texto:
+        inicio_txt, fin_txt = texto.split("-", 1)
+        inicio, fin = ip_a_entero(inicio_txt), ip_a_entero(fin_txt)
+        if inicio > fin:
+            raise ValueError(f"inicio mayor que fin en {texto!r}")
+        return inicio, fin
+    if "/" in texto:
+        red = ip_network(texto, strict=False)
+        inicio = int(red.network_address)
+        fin = int(red.broadcast_address)
+        if red.prefixlen <= 30:
+            return inicio + 1, fin - 1
+        return inicio, fin
+    valor = ip_a_entero(texto)
+    return valor, valor
+
+
+def parsear_rangos(texto: str) -> List[Intervalo]:
+    """Como `parsear_rango`, aceptando listas separadas por comas."""
+    return [parsear_rango(parte) for parte in texto.split(",") if parte.strip()]
+
+
+def fusionar_intervalos(intervalos: Iterable[Intervalo]) -> List[Intervalo]:
+    """Ordena y fusiona intervalos solapados o contiguos."""
+    fusionados: List[Intervalo] = []
+    for inicio, fin in sorted(intervalos):
+        if fusionados and inicio <= fusionados[-1][1] + 1:
+            if fin > fusionados[-1][1]:
+                fusionados[-1] = (fusionados[-1][0], fin)
+        else:
+            fusionados.append((inicio, fin))
+    return fusionados
+
+
+def bloques_cidr(inicio: int, fin: int) -> List[IPv4Network]:
+    """Bloques CIDR mínimos que cubren exactamente el intervalo."""
+    return list(summarize_address_range(IPv4Address(inicio), IPv4Address(fin)))
+
+
+def red_contenedora(inicio: int, fin: int) -> IPv4Network:
+    """Menor red CIDR que contiene todo el intervalo (para probes broadcast)."""
+    prefijo = 32 - (inicio ^ fin).bit_length()
+    mascara = (0xFFFFFFFF << (32 - prefijo)) & 0xFFFFFFFF
+    return IPv4Network((inicio & mascara, prefijo))
+
+
+class ConjuntoIPs:
+    """Conjunto de direcciones IPv4 como intervalos enteros disjuntos y ordenados.
+
+    Ocupa memoria proporcional a la cantidad de intervalos, no de direcciones:
+    un /12 son dos enteros.
     """
-    from config.security_config import PATTERN
-
-    reg_ex = compile(PATTERN)
-    global romper
-    if not ip_start:
-        # Retornar una red /32 por defecto en vez de None
-        return (ipaddress.ip_network("10.100.0.0/32"), None)
-    if not ip_end:
-        ip_end = ip_start[:-1] + str(int(ip_start[-1]) + 3)
-    try:
-        a = reg_ex.match(ip_start)
-        if not a:
-            romper = True
-            print("IP de inicio no válida")
-            # Retornar red /32 del ip_start si es una IP válida
-            try:
-                return (ipaddress.ip_network(f"{ip_start}/32"), None)
-            except:
-                return (ipaddress.ip_network("10.100.0.0/32"), None)
-    except Exception:
-        romper = True
-        print("Error al validar IP de inicio")
-        try:
-            return (ipaddress.ip_network(f"{ip_start}/32"), None)
-        except:
-            return (ipaddress.ip_network("10.100.0.0/32"), None)
-
-    def ip_to_binary_string(ip):
+
+    def __init__(self, intervalos: Iterable[Intervalo] = ()):
+        self.intervalos = fusionar_intervalos(intervalos)
+        self._inicios = [inicio for inicio, _ in self.intervalos]
+
+    @classmethod
+    def desde_textos(cls, textos: Iterable[str]) -> "ConjuntoIPs":
+        """Construye el conjunto desde entradas de `--ranges`.
+
+        Raises:
+            ValueError: Si alguna entrada no es válida
         """
-        Convierte una IP en cadena binaria dividida en octetos.
-        Args:
-            ip (str): Dirección IP en formato decimal con puntos.
-        Returns:
-            tuple: (primer_octeto, segundo_octeto, tercer_octeto, cuarto_octeto
+        intervalos = []
+        for texto in textos:
+            intervalos.extend(parsear_rangos(texto))
+        return cls(intervalos)
+
+    def __len__(self) -> int:
+        return sum(fin - inicio + 1 for inicio, fin in self.intervalos)
+
+    def __bool__(self) -> bool:
+        return bool(self.intervalos)
+
+    def __contains__(self, ip) -> bool:
+        valor = ip if isinstance(ip, int) else ip_a_entero(str(ip))
+        return self.tramo_de(valor) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for valor in self.enteros():
+            yield entero_a_ip(valor)
+
+    def __repr__(self) -> str:
+        return f"ConjuntoIPs({self.textos()})"
+
+    def tramo_de(self, valor: int) -> Optional[Intervalo]:
+        """Intervalo del conjunto que contiene `valor`, o None."""
+        i = bisect_right(self._inicios, valor) - 1
+        if i >= 0 and valor <= self.intervalos[i][1]:
+            return self.intervalos[i]
+        return None
+
+    def agregar(self, valor: int):
+        """Suma una dirección, uniéndola a los intervalos vecinos.
+
+        Pensado para ir registrando hosts barridos: llegan casi en orden, así
+        que la cantidad de intervalos se mantiene chica.
         """
-        ip_int = int(ipaddress.ip_address(ip))  # Convierte IP a entero
-        binary_str = bin(ip_int)[2:].zfill(32)  # Quita '0b' y rellena a 32 bits
-        return binary_str
-
-    #   conversor a subredes
-    def calculate_network_mask(ip_bin_start, ip_bin_end):
-        ip_bin = int(ip_bin_end, 2) - int(ip_bin_start, 2)
-        print(ip_bin, "ip binaria restada")
-
-        def obtener_mascara(ip_bin):
-            potencia = 0
-            resultado = 1
-            while 2**potencia < ip_bin:
-                resultado *= 2
-                potencia += 1
-            return potencia
-
-        potencia = obtener_mascara(ip_bin)
-        mascara = 32 - potencia
-        print("Máscara calculada:", mascara)
-
-        def Calcular_IP_base(ip_bin_start, mascara):
-            ip_start_int = int(ip_bin_start, 2)
-            block_size = 2 ** (32 - mascara)
-            base_int = (ip_start_int // block_size) * block_size
-            base_ip = ipaddress.ip_address(base_int)
-            subnet1 = ipaddress.ip_network(f"{base_ip}/{mascara}", strict=False)
-            return subnet1
-
-        ip_mask1 = Calcular_IP_base(ip_bin_start, mascara)
-        diferencia = int(ip_bin_end, 2) - int(
-            ip_to_binary_string(ip_mask1.compressed[:-3]), 2
-        )
-
-        restante = diferencia - ip_mask1.num_addresses
-        print("Diferencia con potencia encontrada:", restante)
-        if restante > 0:
-            potencia = obtener_mascara(restante)
-            mascara = 32 - potencia
-        ip_mask2 = Calcular_IP_base(
-            ip_to_binary_string(ip_mask1.broadcast_address + 1), mascara
-        )
-        return ip_mask1, ip_mask2 if ip_mask2 else None
-
-    return calculate_network_mask(
-        ip_to_binary_string(ip_start), ip_to_binary_string(ip_end)
-    )
+        i = bisect_right(self._inicios, valor) - 1
+        if i >= 0 and valor <= self.intervalos[i][1]:
+            return
+        une_anterior = i >= 0 and self.intervalos[i][1] == valor - 1
+        une_siguiente = i + 1 < len(self._inicios) and self._inicios[i + 1] == valor + 1
+        if une_anterior and une_siguiente:
+            self.intervalos[i] = (self.intervalos[i][0], self.intervalos[i + 1][1])
+            del self.intervalos[i + 1]
+            del self._inicios[i + 1]
+        elif une_anterior:
+            self.intervalos[i] = (self.intervalos[i][0], valor)
+        elif une_siguiente:
+            self.intervalos[i + 1] = (valor, self.intervalos[i + 1][1])
+            self._inicios[i + 1] = valor
+        else:
+            self.intervalos.insert(i + 1, (valor, valor))
+            self._inicios.insert(i + 1, valor)
+
+    def recortar(self, inicio: int, fin: int) -> "ConjuntoIPs":
+        """Parte del conjunto dentro de [inicio, fin]."""
+        desde = max(0, bisect_right(self._inicios, inicio) - 1)
+        recortados = []
+        for a, b in islice(self.intervalos, desde, None):
+            if a > fin:
+                break
+            if b >= inicio:
+                recortados.append((max(a, inicio), min(b, fin)))
+        return ConjuntoIPs(recortados)
+
+    def restar(self, otro: "ConjuntoIPs") -> "ConjuntoIPs":
+        """Direcciones de este conjunto que no están en `otro`."""
+        restantes = []
+        for inicio, fin in self.intervalos:
+            actual = inicio
+            for a, b in otro.recortar(inicio, fin).intervalos:
+                if a > actual:
+                    restantes.append((actual, a - 1))
+                actual = b + 1
+            if actual <= fin:
+                restantes.append((actual, fin))
+        return ConjuntoIPs(restantes)
+
+    def enteros(self) -> Iterator[int]:
+        """Genera las direcciones como enteros, en orden, sin materializarlas."""
+        for inicio, fin in self.intervalos:
+            yield from range(inicio, fin + 1)
+
+    def bloques(self) -> List[IPv4Network]:
+        """Conjunto mínimo de bloques CIDR que cubre exactamente las direcciones."""
+        bloques = []
+        for inicio, fin in self.intervalos:
+            bloques.extend(bloques_cidr(inicio, fin))
+        return bloques
+
+    def repartir(self, partes: int) -> List["ConjuntoIPs"]:
+        """Divide el conjunto en hasta `partes` fragmentos contiguos y parejos.
+
+        Los fragmentos no se solapan y juntos cubren exactamente el conjunto
+        (p. ej. para repartir un barrido entre procesos).
+        """
+        total = len(self)
+        if not total:
+            return []
+        partes = max(1, min(partes, total))
+        tamanos = iter(total // partes + (k < total % partes) for k in range(partes))
+        fragmentos: List[ConjuntoIPs] = []
+        actual: List[Intervalo] = []
+        falta = next(tamanos)
+        for inicio, fin in self.intervalos:
+            while inicio <= fin:
+                tomar = min(falta, fin - inicio + 1)
+                actual.append((inicio, inicio + tomar - 1))
+                inicio += tomar
+                falta -= tomar
+                if not falta:
+                    fragmentos.append(ConjuntoIPs(actual))
+                    actual = []
+                    falta = next(tamanos, 0)
+        return fragmentos
+
+    def textos(self) -> List[str]:
+        """Intervalos como texto "inicio-fin" (o la IP si es una sola)."""
+        return [
+            entero_a_ip(inicio)
+            if inicio == fin
+            else f"{entero_a_ip(inicio)}-{entero_a_ip(fin)}"
+            for inicio, fin in self.intervalos
+        ]
 
 
 if __name__ == "__main__":
-    try:
-        ip_inicio = "10.100.1.100"
-        ip_fin = "10.100.1.120"
-        print("IP inicio:", ip_inicio)
-        print("IP fin:", ip_fin)
-        remaining_last_octet = calculate_ip_range(ip_inicio, ip_fin)
-        print(remaining_last_octet, "IPs en el rango")
-    except Exception:
-        print("Error inesperado:", Exception)
+    rangos = ConjuntoIPs.desde_textos(
+        ["10.100.1.100-10.100.1.120", "10.100.1.110-10.100.1.130", "10.101.0.1"]
+    )
+    print("Intervalos:", rangos.textos())
+    print("Bloques CIDR:", [str(b) for b in rangos.bloques()])
+    print(len(rangos), "IPs en el rango")
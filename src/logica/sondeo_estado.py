@@ -0,0 +1,255 @@
+"""Sondeo de estado UDP de los daemons cliente.
+
+Saber si el agente de un equipo está corriendo costaba una conexión TCP (y su
+handshake TLS) por equipo. Con este sondeo el servidor envía a cada daemon un
+datagrama firmado con un nonce y el daemon contesta en un solo datagrama:
+
+    servidor → daemon   {"type": "status_request", "nonce": ...}
+    daemon → servidor   {"type": "status", "nonce": ..., "version": ...,
+                         "etag": ..., "last_collection": ..., "uptime": ...,
+                         "system_uptime": ..., "caps": [...]}
+
+- El daemon solo responde solicitudes con firma válida y dentro de la ventana
+  de tiempo (`verificar_datagrama`): sin el secreto no hay respuesta, de modo
+  que el puerto no sirve como reflector.
+- El servidor solo acepta respuestas firmadas que repitan el nonce enviado a
+  esa misma IP.
+
+`sondear_agentes` envía todas las solicitudes desde un único socket UDP y
+reintenta solo las IPs que no respondieron: una flota de miles de equipos se
+revisa en uno o dos segundos.
+"""
+
+from asyncio import (
+    DatagramProtocol,
+    Event,
+    TimeoutError,
+    get_running_loop,
+    sleep,
+    wait_for,
+)
+from secrets import token_hex
+from socket import AF_INET, SOCK_DGRAM, socket
+from socket import timeout as socket_timeout
+from threading import Event as EventoHilo
+from time import time
+from typing import Dict, Iterable, Optional
+
+from logica.protocolo import (
+    CAPACIDADES,
+    ErrorProtocolo,
+    firmar_datagrama,
+    verificar_datagrama,
+)
+
+VERSION_AGENTE = "1.0"
+
+TIPO_SOLICITUD = "status_request"
+TIPO_ESTADO = "status"
+
+_MAX_NONCE = 64
+_inicio = time()  # Arranque del proceso del daemon (para "uptime")
+
+
+# ------------------ DAEMON (CLIENTE) ------------------
+def construir_estado(nonce: str) -> dict:
+    """Respuesta de estado: versión, última recolección, uptime y capacidades."""
+    import psutil
+
+    from logica.logica_specs import leer_cache_etag
+
+    cache = leer_cache_etag() or {}
+    ahora = time()
+    return {
+        "type": TIPO_ESTADO,
+        "nonce": nonce,
+        "version": VERSION_AGENTE,
+        "etag": cache.get("etag"),
+        "last_collection": cache.get("fecha"),
+        "uptime": int(ahora - _inicio),
+        "system_uptime": int(ahora - psutil.boot_time()),
+        "caps": list(CAPACIDADES),
+    }
+
+
+def responder_solicitud_estado(datagrama: bytes, secreto: str) -> Optional[bytes]:
+    """Valida una solicitud de estado y arma la respuesta firmada.
+
+    Returns:
+        bytes | None: Datagrama de respuesta, o None si la solicitud no es
+            válida (se descarta sin responder)
+    """
+    try:
+        datos = verificar_datagrama(datagrama, secreto)
+    except ErrorProtocolo:
+        return None
+
+    nonce = datos.get("nonce")
+    if (
+        datos.get("type") != TIPO_SOLICITUD
+        or not isinstance(nonce, str)
+        or len(nonce) > _MAX_NONCE
+    ):
+        return None
+    return firmar_datagrama(construir_estado(nonce), secreto)
+
+
+def atender_sondeos(
+    port: Optional[int] = None, detener: Optional[EventoHilo] = None
+):
+    """Bucle del daemon: responde las solicitudes de estado UDP del servidor.
+
+    Pensado para un hilo daemon junto a `escuchar_solicitudes`.
+
+    Args:
+        port: Puerto UDP donde escuchar (default STATUS_PORT)
+        detener: threading.Event opcional para terminar el bucle
+    """
+    try:
+        from config.security_config import SHARED_SECRET, STATUS_PORT
+    except ImportError:
+        SHARED_SECRET = ""
+        STATUS_PORT = 5256
+
+    from logica.latidos import recordar_servidor
+
+    port = port or STATUS_PORT
+    detener = detener or EventoHilo()
+    sock = socket(AF_INET, SOCK_DGRAM)
+    sock.settimeout(1.0)
+
+    try:
+        sock.bind(("0.0.0.0", port))
+        print(f"[ESTADO] Respondiendo sondeos de estado en puerto UDP {port}")
+        while not detener.is_set():
+            try:
+                datagrama, addr = sock.recvfrom(2048)
+            except (socket_timeout, ConnectionResetError):
+                # ConnectionResetError: en Windows, ICMP "port unreachable" de
+                # una respuesta anterior se informa en el siguiente recvfrom
+                continue
+
+            try:
+                respuesta = responder_solicitud_estado(datagrama, SHARED_SECRET)
+                if respuesta is None:
+                    continue
+                recordar_servidor(addr[0])  # Destino de los latidos UDP
+                sock.sendto(respuesta, addr)
+            except Exception as e:
+                print(f"[ESTADO] Error respondiendo a {addr[0]}: {e}")
+    except OSError as e:
+        print(f"[ESTADO] No se pudo abrir el puerto UDP {port}: {e}")
+    finally:
+        sock.close()
+
+
+# ------------------ SERVIDOR ------------------
+class _ProtocoloSondeo(DatagramProtocol):
+    """Entrega cada respuesta recibida a la función de `sondear_agentes`."""
+
+    def __init__(self, al_recibir):
+        self.al_recibir = al_recibir
+
+    def datagram_received(self, datagrama, addr):
+        self.al_recibir(datagrama, addr[0])
+
+    def error_received(self, exc):
+        pass  # "Port unreachable" de equipos sin daemon: quedan sin respuesta
+
+
+async def sondear_agentes(
+    ips: Iterable[str],
+    timeout: Optional[float] = None,
+    reintentos: Optional[int] = None,
+    port: Optional[int] = None,
+    lote_envio: int = 256,
+) -> Dict[str, Optional[dict]]:
+    """Consulta el estado de los daemons de todas las IPs desde un solo socket.
+
+    Cada ronda envía una solicitud a las IPs que todavía no respondieron y
+    espera hasta `timeout` segundos (o hasta que respondan todas).
+
+    Args:
+        ips: Direcciones a consultar
+        timeout: Segundos de espera por ronda (default STATUS_PROBE_TIMEOUT)
+        reintentos: Rondas extra para las IPs sin respuesta
+            (default STATUS_PROBE_RETRIES)
+        port: Puerto UDP de los daemons (default STATUS_PORT)
+        lote_envio: Cada cuántos envíos ceder el loop (evita ráfagas que el
+            kernel o la red descartan)
+
+    Returns:
+        dict: {ip: datos de la respuesta + "rtt_ms", o None si no respondió}
+    """
+    try:
+        from config.security_config import (
+            SHARED_SECRET,
+            STATUS_PORT,
+            STATUS_PROBE_RETRIES,
+            STATUS_PROBE_TIMEOUT,
+        )
+    except ImportError:
+        SHARED_SECRET = ""
+        STATUS_PORT = 5256
+        STATUS_PROBE_RETRIES = 2
+        STATUS_PROBE_TIMEOUT = 0.5
+
+    timeout = timeout or STATUS_PROBE_TIMEOUT
+    reintentos = STATUS_PROBE_RETRIES if reintentos is None else reintentos
+    port = port or STATUS_PORT
+
+    loop = get_running_loop()
+    resultados: Dict[str, Optional[dict]] = dict.fromkeys(ips)
+    # Un nonce por IP para todas las rondas: una respuesta tardía de la
+    # ronda anterior también vale
+    pendientes = {ip: token_hex(8) for ip in resultados if ip and ip != "-"}
+    enviado: Dict[str, float] = {}
+    completo = Event()
+
+    def al_recibir(datagrama, ip):
+        nonce = pendientes.get(ip)
+        if nonce is None:
+            return  # IP no consultada o ya respondida
+        try:
+            datos = verificar_datagrama(datagrama, SHARED_SECRET)
+        except ErrorProtocolo:
+            return
+        if datos.get("type") != TIPO_ESTADO or datos.get("nonce") != nonce:
+            return
+        datos["rtt_ms"] = round((loop.time() - enviado[ip]) * 1000, 2)
+        resultados[ip] = datos
+        del pendientes[ip]
+        if not pendientes:
+            completo.set()
+
+    inicio = loop.time()
+    transporte, _ = await loop.create_datagram_endpoint(
+        lambda: _ProtocoloSondeo(al_recibir), family=AF_INET
+    )
+    try:
+        for _ in range(reintentos + 1):
+            if not pendientes:
+                break
+            for i, (ip, nonce) in enumerate(list(pendientes.items()), 1):
+                if ip not in pendientes:
+                    continue  # Respondió mientras se enviaba esta ronda
+                solicitud = {"type": TIPO_SOLICITUD, "nonce": nonce}
+                enviado[ip] = loop.time()
+                transporte.sendto(
+                    firmar_datagrama(solicitud, SHARED_SECRET), (ip, port)
+                )
+                if i % lote_envio == 0:
+                    await sleep(0)
+            try:
+                await wait_for(completo.wait(), timeout=timeout)
+            except TimeoutError:
+                pass
+    finally:
+        transporte.close()
+
+    respondieron = sum(1 for datos in resultados.values() if datos)
+    print(
+        f"[SondeoEstado] {respondieron}/{len(resultados)} agentes respondieron "
+        f"en {loop.time() - inicio:.2f}s"
+    )
+    return resultados
@@ -0,0 +1,99 @@
+"""Sonda TCP connect para el escáner (`--probe tcp:5256,445,135`).
+
+ICMP dice si hay un equipo; lo que interesa es si hay un daemon SpecsNet
+escuchando en 5256. Esta sonda abre conexiones TCP no bloqueantes (miles en
+vuelo, limitadas por la ventana del escáner) y clasifica cada puerto:
+
+    open         el connect se completó (se cierra enseguida con RST)
+    closed       el equipo respondió RST: existe, pero no escucha en el puerto
+    filtered     sin respuesta dentro del timeout (firewall o equipo apagado)
+    unreachable  la red o el host son inalcanzables (ICMP unreachable)
+    error        cualquier otro error de socket
+
+Un equipo está activo si algún puerto quedó `open` o `closed`, y tiene agente
+si PUERTO_AGENTE quedó `open`.
+"""
+
+from asyncio import Protocol, TimeoutError, gather, get_running_loop, wait_for
+from errno import EHOSTUNREACH, ENETUNREACH
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PUERTO_AGENTE = 5256  # Daemon del cliente (specs.py --tarea)
+
+ABIERTO = "open"
+CERRADO = "closed"
+FILTRADO = "filtered"
+INALCANZABLE = "unreachable"
+ERROR = "error"
+
+_ERRNO_INALCANZABLE = {EHOSTUNREACH, ENETUNREACH}
+# Windows: ERROR_NETWORK_UNREACHABLE, ERROR_HOST_UNREACHABLE y sus WSAE*
+_WINERROR_INALCANZABLE = {1231, 1232, 10051, 10065}
+
+
+def parsear_sonda(texto: Optional[str]) -> Tuple[str, List[int]]:
+    """Interpreta el valor de `--probe`.
+
+    Returns:
+        tuple: ("icmp", []) o ("tcp", [puertos])
+
+    Raises:
+        ValueError: Si el formato o algún puerto no son válidos
+    """
+    texto = (texto or "icmp").strip().lower()
+    if texto == "icmp":
+        return "icmp", []
+    tipo, _, lista = texto.partition(":")
+    if tipo != "tcp" or not lista:
+        raise ValueError(f"sonda no válida {texto!r} (usar icmp o tcp:puerto,...)")
+    puertos = list(dict.fromkeys(int(p) for p in lista.split(",") if p.strip()))
+    if not puertos or any(not 0 < p < 65536 for p in puertos):
+        raise ValueError(f"puertos no válidos en {texto!r}")
+    return "tcp", puertos
+
+
+async def conectar(ip: str, puerto: int, timeout: float) -> str:
+    """Intenta un connect TCP y clasifica el resultado (ver docstring del módulo)."""
+    loop = get_running_loop()
+    try:
+        transporte, _ = await wait_for(
+            loop.create_connection(Protocol, ip, puerto), timeout=timeout
+        )
+    except TimeoutError:
+        return FILTRADO
+    except ConnectionRefusedError:
+        return CERRADO
+    except OSError as e:
+        if (
+            e.errno in _ERRNO_INALCANZABLE
+            or getattr(e, "winerror", None) in _WINERROR_INALCANZABLE
+        ):
+            return INALCANZABLE
+        return ERROR
+    transporte.abort()  # RST inmediato: sin TIME_WAIT por cada sonda
+    return ABIERTO
+
+
+async def sondear_puertos(
+    ip: str, puertos: Iterable[int], timeout: float
+) -> Dict[int, str]:
+    """Sondea todos los `puertos` de `ip` a la vez.
+
+    Returns:
+        dict: {puerto: estado}
+    """
+    puertos = list(puertos)
+    estados = await gather(*(conectar(ip, p, timeout) for p in puertos))
+    return dict(zip(puertos, estados))
+
+
+def host_activo(estados: Dict[int, str]) -> bool:
+    """True si algún puerto respondió (connect completo o RST)."""
+    return any(estado in (ABIERTO, CERRADO) for estado in estados.values())
+
+
+def tiene_agente(estados: Dict[int, str]) -> Optional[bool]:
+    """True/False según PUERTO_AGENTE, o None si ese puerto no se sondeó."""
+    if PUERTO_AGENTE not in estados:
+        return None
+    return estados[PUERTO_AGENTE] == ABIERTO
@@ -12,20 +12,19 @@ from traceback import print_exc
 from PySide6 import QtWidgets, QtCore
 from PySide6.QtGui import QColor, QBrush
 from PySide6.QtWidgets import QMainWindow
-from asyncio import set_event_loop, new_event_loop, sleep, gather
+from asyncio import set_event_loop, new_event_loop
 from ui.inventario_ui import Ui_MainWindow  # Importar el .ui convertido
 from sql.ejecutar_sql import (
     cursor,
     connection,
     abrir_consulta,
-    setDevice,
 )  # Funciones de DB
 import sql.ejecutar_sql as sql_mod
 from logica import logica_servidor as ls  # Importar lógica del servidor
 from logica.logica_Hilo import Hilo, HiloConProgreso  # Para operaciones en background
 
-# Utilitario compartido de ping asíncrono (evitar duplicación)
-from logica.ping_utils import ping_host
+# Servicio compartido de estado de conexión (un solo sondeo para toda la app)
+from logica.estado_conexion import obtener_servicio_conexion
 from logica.logica_Hilo import HiloConProgreso
 
 # Constantes de colores para estados de dispositivos
@@ -99,8 +98,6 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
         self.hilo_escaneo = None
         self.hilo_escaneo_rangos = None
         self.hilo_consulta = None
-        self.hilo_procesamiento = None
-        self.procesamiento_en_curso = False
         self.consulta_en_curso = False  # Flag para evitar consultas simultáneas
         self._last_csv = None
 
@@ -144,6 +141,12 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
         # Deshabilitar botones hasta seleccionar dispositivo
         self.deshabilitar_botones_detalle()
 
+        # Sondeo periódico de estados compartido con el monitor y la consulta;
+        # el timer de la UI lee del cache del servicio. Antes de cargar los
+        # datos: `cargar_dispositivos` ya puede lanzar `_verificar_estados_ping`
+        self.servicio_conexion = obtener_servicio_conexion()
+        self.servicio_conexion.iniciar_sondeo(ls.obtener_ips_dispositivos)
+
         # Iniciar servidor en segundo plano
         self.iniciar_servidor()
         self.cargar_datos_iniciales()
@@ -292,11 +295,9 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
                     # Inicialmente "Verificando..." (haremos ping)
                     actualizar_estado_item(estado_item, "verificando")
                 else:
-                    # Cargar estado desde tabla 'activo' (ya verificado por escaneo completo)
+                    # Estado actual desde 'device_state' (verificado por el escaneo)
                     try:
-                        sql_activo = "SELECT powerOn FROM activo WHERE Dispositivos_serial = ? ORDER BY date DESC LIMIT 1"
-                        cursor.execute(sql_activo, (serial,))
-                        estado_db = cursor.fetchone()
+                        estado_db = sql_mod.getEstadoActual(serial)
 
                         if estado_db:
                             actualizar_estado_item(
@@ -392,19 +393,8 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
         """
 
         def verificar_estados():
-            async def ping_dispositivo(row, ip):
-                """Hace ping a un dispositivo y retorna resultado"""
-                try:
-                    if not ip or ip == "-":
-                        return (row, False, "sin_ip")
-                    conectado = await ping_host(ip, 0.5)
-                    return (row, conectado, ip)
-                except Exception:
-                    return (row, False, ip)
-
             async def verificar_todos():
-                # Crear tareas para todos los dispositivos
-                tareas = []
+                filas = []
                 for item in dispositivos_data:
                     # Detectar formato: (row, ip) o tupla de DB
                     if isinstance(item, tuple) and len(item) == 2:
@@ -413,19 +403,18 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
                         # Tupla de DB: IP está en posición 10
                         row = dispositivos_data.index(item)
                         ip = item[10]
+                    filas.append((row, ip))
 
-                    tareas.append(ping_dispositivo(row, ip))
-
-                # Ejecutar todos los pings en paralelo
-                BATCH_SIZE = 25
-                resultados_batch = []
-                for i in range(0, len(tareas), BATCH_SIZE):
-                    batch = tareas[i : i + BATCH_SIZE]
-                    resultados_batch.extend(
-                        await gather(*batch, return_exceptions=True)
-                    )
-                    await sleep(0.1)  # Pequeña pausa entre batches
-                return resultados_batch
+                # Estados vigentes salen del cache; solo se hace ping a los expirados
+                estados = await self.servicio_conexion.consultar(
+                    [ip for _, ip in filas if ip and ip != "-"], 0.5
+                )
+                return [
+                    (row, estados[ip].activo, ip)
+                    if ip and ip != "-"
+                    else (row, False, "sin_ip")
+                    for row, ip in filas
+                ]
                 # TODO: posible integracion consulta datos
 
             # Ejecutar verificación asíncrona
@@ -725,122 +714,46 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
             f"Mostrando {visible_count} dispositivos encontrados"
         )
 
-    def procesar_ips_encontradas_async(self, ips_list):
-        """Procesa las IPs encontradas en la DB de forma asíncrona para evitar bloquear la UI"""
-
-        # Evitar múltiples procesamientos simultáneos
-        if self.procesamiento_en_curso:
-            print(">> Ya hay un procesamiento de DB en curso, esperando...")
-            return
-
-        self.procesamiento_en_curso = True
-
-        def procesar_en_lotes(ips_list, callback_progreso=None):
-            """Procesa las IPs en lotes para mostrar progreso"""
-            total = len(ips_list)
-            procesadas = 0
-
-            try:
-                for i in range(0, total, 10):  # Procesar en lotes de 10
-                    lote = ips_list[i : i + 10]
-
-                    for ip in lote:
-                        # Verificar si ya existe en DB
-                        sql, params = abrir_consulta(
-                            "Dispositivos-select.sql", {"ip": ip}
-                        )
-                        cursor.execute(sql, params)
-                        if not cursor.fetchone():
-                            # Crear serial temporal único
-                            serial_temp = f"TEMP_IP_{ip.replace('.', '_')}"
-                            info_basico = (
-                                serial_temp,
-                                0,
-                                "",
-                                "",
-                                "",
-                                "",
-                                "",
-                                "",
-                                0,
-                                "",
-                                ip,
-                                1,
-                            )
-                            setDevice(info_basico)
-
-                        procesadas += 1
-
-                        # Reportar progreso cada 10 IPs
-                        if callback_progreso and procesadas % 10 == 0:
-                            callback_progreso(
-                                {
-                                    "tipo": "procesamiento_db",
-                                    "procesadas": procesadas,
-                                    "total": total,
-                                    "mensaje": f"Procesando DB: {procesadas}/{total} IPs",
-                                }
-                            )
-
-                    # Pequeña pausa para no bloquear completamente
-                    from time import sleep
-
-                    sleep(0.01)
-
-                return total
+    def mostrar_host_descubierto(self, datos):
+        """Refleja en la tabla un host activo apenas el escaneo lo encuentra.
 
-            except Exception as e:
-                print(f"Error procesando lote de IPs: {e}")
-                connection.rollback()
-                return 0
+        Args:
+            datos (dict): Evento {'tipo': 'host', 'ip', 'metodo', 'rtt_ms',
+                'timestamp'} emitido por el escáner; el alta en la DB la hace
+                el propio escaneo (ver ls.persistir_descubrimientos)
+        """
+        ip = datos["ip"]
+        tabla = self.ui.tableDispositivos
 
-        # Usar HiloConProgreso para procesar sin bloquear UI
-        self.hilo_procesamiento = HiloConProgreso(procesar_en_lotes, ips_list)
-        self.hilo_procesamiento.progreso.connect(self.on_procesamiento_progreso)
-        self.hilo_procesamiento.terminado.connect(
-            lambda resultado: self.on_procesamiento_terminado(resultado, ips_list)
-        )
-        self.hilo_procesamiento.error.connect(self.on_procesamiento_error)
-        self.hilo_procesamiento.start()
+        if ip in self.ip_to_row:
+            estado_item = tabla.item(self.ip_to_row[ip], 0)
+            if estado_item:
+                actualizar_estado_item(estado_item, "encendido")
+        else:
+            # Fila provisoria: se reemplaza al recargar desde la DB al final
+            ordenada = tabla.isSortingEnabled()
+            tabla.setSortingEnabled(False)
+            row_position = tabla.rowCount()
+            tabla.insertRow(row_position)
+            estado_item = QtWidgets.QTableWidgetItem()
+            actualizar_estado_item(estado_item, "encendido")
+            tabla.setItem(row_position, 0, estado_item)
+            tabla.setItem(
+                row_position,
+                2,
+                QtWidgets.QTableWidgetItem(f"TEMP_IP_{ip.replace('.', '_')}"),
+            )
+            ip_item = IPAddressTableWidgetItem(ip)
+            tabla.setItem(row_position, 9, ip_item)
+            tabla.setSortingEnabled(ordenada)
+            self.ip_to_row[ip] = ip_item.row()
 
+        rtt = datos.get("rtt_ms")
+        detalle = f", {rtt:.1f} ms" if rtt is not None else ""
         self.ui.statusbar.showMessage(
-            "Procesando IPs encontradas en base de datos...", 0
+            f">> Host activo: {ip} ({datos.get('metodo')}{detalle})", 0
         )
 
-    def on_procesamiento_progreso(self, datos):
-        """Muestra progreso del procesamiento de DB"""
-        if datos.get("tipo") == "procesamiento_db":
-            procesadas = datos.get("procesadas", 0)
-            total = datos.get("total", 0)
-            mensaje = datos.get("mensaje", "")
-            self.ui.statusbar.showMessage(mensaje, 0)
-            print(f">> {mensaje}")
-
-    def on_procesamiento_terminado(self, resultado, ips_list):
-        """Finaliza procesamiento de IPs"""
-        self.procesamiento_en_curso = False  # Resetear flag
-
-        if resultado > 0:
-            print(f">> Procesadas {resultado} IPs en DB")
-            self.ui.statusbar.showMessage(
-                f"DB actualizada con {resultado} nuevas IPs", 3000
-            )
-
-            # Recargar tabla con datos actualizados (sin ping para no demorar más)
-            self.cargar_dispositivos(verificar_ping=False)
-
-            # Filtrar para mostrar solo las IPs encontradas
-            self.filtrar_por_ips(ips_list)
-        else:
-            self.ui.statusbar.showMessage("Error procesando IPs en DB", 5000)
-
-    def on_procesamiento_error(self, error):
-        """Error en procesamiento de DB"""
-        self.procesamiento_en_curso = False  # Resetear flag en error también
-
-        self.ui.statusbar.showMessage(f"Error procesando DB: {error}", 5000)
-        print(f"Error en procesamiento de DB: {error}")
-
     def ver_diagnostico(self):
         """Abre ventana de diagnóstico completo"""
         selected = self.ui.tableDispositivos.selectedItems()
@@ -1316,6 +1229,29 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
         scanner = ls.Scanner()
         print(">> Instancia creada.")
 
+        # Escaneo interrumpido del mismo rango: ofrecer continuarlo
+        reanudar = False
+        pendiente = scanner.checkpoint_pendiente(start_ip, end_ip)
+        if pendiente:
+            from PySide6.QtWidgets import QMessageBox
+
+            fecha = (
+                datetime.fromtimestamp(pendiente["fecha"]).strftime("%d/%m/%Y %H:%M")
+                if pendiente["fecha"]
+                else "fecha desconocida"
+            )
+            respuesta = QMessageBox.question(
+                self,
+                "Reanudar Escaneo",
+                f"Hay un escaneo interrumpido de este rango ({fecha}): "
+                f"{pendiente['barridos']}/{pendiente['total']} hosts barridos, "
+                f"{pendiente['activos']} activos.\n\n"
+                "¿Desea continuarlo en lugar de empezar de cero?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes,
+            )
+            reanudar = respuesta == QMessageBox.StandardButton.Yes
+
         # Usar HiloConProgreso para ejecutar el escaneo sin congelar la UI
         def funcion_escaneo(callback_progreso=None):
             # Aquí pasamos los rangos al scanner
@@ -1323,7 +1259,10 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
             print(">> Ejecutando escaneo con rangos...")
             try:
                 return scanner.run_scan_con_rangos(
-                    start_ip, end_ip, callback_progreso=callback_progreso
+                    start_ip,
+                    end_ip,
+                    callback_progreso=callback_progreso,
+                    reanudar=reanudar,
                 )
             except Exception as e:
                 print(f">> Error en escaneo: {e}")
@@ -1332,12 +1271,12 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
                 return []
 
         def on_progreso(datos):
+            # Cada host activo llega apenas se lo encuentra; el alta en la DB la
+            # hace otro suscriptor del escaneo y puede no haber terminado aún
+            if datos.get("tipo") == "host":
+                self.mostrar_host_descubierto(datos)
+                return
             print(f">> Progreso: {datos}")
-            # Actualizar UI con progreso (ej: barra de progreso, tabla)
-            if "ip" in datos:
-                # Ejemplo: Actualizar una tabla o label con el estado de la IP
-                print(f"Procesando IP: {datos['ip']} - Activo: {datos['activo']}")
-                # Aquí puedes actualizar una QTableWidget o QLabel con el progreso
 
         def on_terminado(resultado):
             # Manejar resultado final (ej: mostrar mensaje)
@@ -1348,8 +1287,13 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
                 )
 
                 if resultado:
-                    # Procesar IPs encontradas de forma asíncrona para evitar bloquear UI
-                    self.procesar_ips_encontradas_async(resultado)
+                    # Los hosts ya se registraron en la DB durante el escaneo:
+                    # recargar sin ping y mostrar solo los encontrados
+                    self.cargar_dispositivos(verificar_ping=False)
+                    self.filtrar_por_ips(resultado)
+                    self.ui.statusbar.showMessage(
+                        f"Escaneo completado: {num_ips} IPs activas", 3000
+                    )
 
                 else:
                     print("Escaneo Completado", "No se encontraron IPs activas.")
@@ -1530,6 +1474,9 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
 
         if respuesta == QMessageBox.StandardButton.Yes:
             print("[INFO] Cerrando aplicación...")
+            self.servicio_conexion.detener_sondeo()
+            if self.server_mgr:
+                self.server_mgr.stop_tcp_server()
             self.close()
 
     def ver_estadisticas(self):
@@ -1555,19 +1502,8 @@ class InventarioWindow(QMainWindow, Ui_MainWindow):
             cursor.execute("SELECT COUNT(*) FROM Dispositivos WHERE activo = 1")
             stats["activos"] = cursor.fetchone()[0]
 
-            # Dispositivos encendidos (último estado)
-            cursor.execute(
-                """
-                SELECT COUNT(DISTINCT Dispositivos_serial) 
-                FROM activo 
-                WHERE powerOn = 1 
-                AND (Dispositivos_serial, date) IN (
-                    SELECT Dispositivos_serial, MAX(date) 
-                    FROM activo 
-                    GROUP BY Dispositivos_serial
-                )
-            """
-            )
+            # Dispositivos encendidos (estado actual)
+            cursor.execute("SELECT COUNT(*) FROM device_state WHERE powerOn = 1")
             stats["encendidos"] = cursor.fetchone()[0]
 
             # Sin licencia
@@ -1831,4 +1767,8 @@ def main():
 
 
 if __name__ == "__main__":
+    # Ejecutable congelado: los procesos del sweep (spawn) arrancan por aquí
+    from multiprocessing import freeze_support
+
+    freeze_support()
     main()
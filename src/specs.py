@@ -25,6 +25,8 @@ def escuchar_solicitudes(port=5256):
 
     print(f"[DAEMON] Cliente escuchando solicitudes en puerto {port}...")
     from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, timeout
+    from logica.protocolo import parsear_solicitud
+    from logica.latidos import recordar_servidor
 
     server_socket = socket(AF_INET, SOCK_STREAM)
     server_socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
@@ -45,19 +47,24 @@ def escuchar_solicitudes(port=5256):
                 request_count += 1
 
                 print(f"\n[SOLICITUD #{request_count}] Servidor conectado: {addr[0]}")
+                recordar_servidor(addr[0])  # Destino de los latidos UDP
 
                 try:
                     conn.settimeout(5)
                     data = conn.recv(1024).decode("utf-8").strip()
+                    # "GET_SPECS_IF_CHANGED <etag> ACCEPT=zstd,zlib REPLY=tls":
+                    # comando + argumentos + opciones del servidor
+                    solicitud = parsear_solicitud(data)
+                    comando = solicitud.comando
 
-                    if data == "GET_SPECS":
-                        print("[PROCESO] Recopilando especificaciones...")
-                        from logica.logica_specs import enviar_a_servidor
+                    if comando in ("GET_SPECS", "GET_SPECS_IF_CHANGED"):
+                        print("[PROCESO] Atendiendo solicitud de especificaciones...")
+                        from logica.logica_specs import responder_solicitud
 
-                        enviar_a_servidor()
-                        print("[OK] Datos enviados")
+                        resultado = responder_solicitud(conn, solicitud)
+                        print(f"[OK] Solicitud atendida: {resultado}\n")
 
-                    elif data == "PING":
+                    elif comando == "PING":
                         response = {"status": "alive"}
                         conn.sendall(dumps(response).encode("utf-8"))
                         print("[OK] PING respondido\n")
@@ -90,6 +97,15 @@ if modo_tarea:
         configurar_tarea(0)
         print("[MODO TAREA] Nueva tarea programada creada.")
 
+    # Latidos UDP al servidor en segundo plano (vivacidad sin depender de ICMP)
+    from threading import Thread
+    from logica.latidos import enviar_latidos
+    from logica.sondeo_estado import atender_sondeos
+
+    Thread(target=enviar_latidos, name="latidos", daemon=True).start()
+    # Sondeos de estado UDP del servidor (versión, última recolección, uptime)
+    Thread(target=atender_sondeos, name="sondeo-estado", daemon=True).start()
+
     # Escuchar solicitudes del servidor
     escuchar_solicitudes(port=5256)
 
@@ -46,6 +46,21 @@ def inicializar_db():
             cur.executescript(schema_sql)
             conn.commit()
             print("[OK] Base de datos creada correctamente")
+        else:
+            # DB existente: crear las tablas agregadas después (IF NOT EXISTS)
+            for sentencia in schema_sql.split(";"):
+                if "IF NOT EXISTS" in sentencia.upper():
+                    cur.execute(sentencia)
+
+            # Estado actual inicial desde el histórico de `activo` (último registro)
+            cur.execute("SELECT COUNT(*) FROM device_state")
+            if not cur.fetchone()[0]:
+                cur.execute(
+                    """INSERT INTO device_state
+                       SELECT Dispositivos_serial, powerOn, MAX(date), MAX(date)
+                       FROM activo GROUP BY Dispositivos_serial"""
+                )
+            conn.commit()
 
         conn.close()
     except Exception as e:
@@ -369,6 +384,13 @@ def actualizar_serial_temporal(serial_real, mac):
         (serial_real, serial_temporal),
     )
 
+    # 2b. device_state / device_state_transitions
+    for tabla in ("device_state", "device_state_transitions"):
+        cursor.execute(
+            f"UPDATE {tabla} SET Dispositivos_serial = ? WHERE Dispositivos_serial = ?",
+            (serial_real, serial_temporal),
+        )
+
     # 3. registro_cambios
     cursor.execute(
         """UPDATE registro_cambios 
@@ -409,32 +431,80 @@ def actualizar_serial_temporal(serial_real, mac):
         (serial_real, serial_temporal),
     )
 
+    # 8. huellas_contenido
+    cursor.execute(
+        """UPDATE huellas_contenido 
+                     SET Dispositivos_serial = ? 
+                     WHERE Dispositivos_serial = ?""",
+        (serial_real, serial_temporal),
+    )
+
     connection.commit()
     print(f"[OK] Serial actualizado exitosamente en todas las tablas")
     return True
 
 
 def setActive(dispositivoEstado=tuple(), conn=None):
-    """Inserta estado de actividad de un dispositivo (encendido/apagado).
+    """Registra el estado de actividad de un dispositivo (encendido/apagado).
+
+    Actualiza en su lugar la fila de `device_state` (1 registro por dispositivo)
+    y agrega una fila a `device_state_transitions` SOLO si el estado cambió
+    (o es la primera vez que se ve el dispositivo).
 
     Args:
         dispositivoEstado (tuple): Tupla con (serial_dispositivo, powerOn, date)
-                                  Schema: Dispositivos_serial, powerOn, date
-                                  (sin id porque no tiene PRIMARY KEY AUTOINCREMENT)
 
     Returns:
-        None
+        bool: True si hubo transición de estado
+    """
+    serial, power_on, fecha = dispositivoEstado[:3]
+    power_on = bool(power_on)
+    cur = conn.cursor() if conn else cursor
+    cur.execute(
+        "SELECT powerOn FROM device_state WHERE Dispositivos_serial = ?", (serial,)
+    )
+    fila = cur.fetchone()
 
-    Warning:
-        SIEMPRE usar DELETE antes de INSERT para evitar duplicados (1 registro por dispositivo).
-        Ver logica_servidor.py para implementación correcta.
+    if fila is not None and bool(fila[0]) == power_on:
+        cur.execute(
+            "UPDATE device_state SET last_checked = ? WHERE Dispositivos_serial = ?",
+            (fecha, serial),
+        )
+        return False
+
+    cur.execute(
+        """INSERT INTO device_state_transitions (Dispositivos_serial, powerOn, date)
+           VALUES (?,?,?)""",
+        (serial, power_on, fecha),
+    )
+    cur.execute(
+        """INSERT INTO device_state VALUES (?,?,?,?)
+           ON CONFLICT(Dispositivos_serial) DO UPDATE SET
+               powerOn = excluded.powerOn,
+               last_change = excluded.last_change,
+               last_checked = excluded.last_checked""",
+        (serial, power_on, fecha, fecha),
+    )
+    return True
+
+
+def getEstadoActual(serial, conn=None):
+    """Obtiene el estado actual de un dispositivo desde `device_state`.
+
+    Args:
+        serial (str): Serial del dispositivo
+        conn (sqlite3.Connection): Conexión opcional. Si None, usa la global.
+
+    Returns:
+        tuple: (powerOn, last_change, last_checked) o None si nunca se verificó
     """
     cur = conn.cursor() if conn else cursor
     cur.execute(
-        """INSERT INTO activo 
-                   VALUES (?,?,?)""",
-        (dispositivoEstado[0], dispositivoEstado[1], dispositivoEstado[2]),
+        """SELECT powerOn, last_change, last_checked
+           FROM device_state WHERE Dispositivos_serial = ?""",
+        (serial,),
     )
+    return cur.fetchone()
 
 
 def set_dispositivo_inicial(ip, mac):
@@ -495,12 +565,14 @@ def registrar_cambio_hardware(
         connection.commit()
 
 
-def limpiar_datos_dispositivo_threadsafe(serial, conn):
+def limpiar_datos_dispositivo_threadsafe(serial, conn, tablas=None):
     """Limpia todos los datos anteriores de un dispositivo antes de insertar nuevos.
 
     Args:
         serial (str): Serial del dispositivo
         conn (sqlite3.Connection): Conexión thread-safe
+        tablas (iterable, optional): Limitar la limpieza a estas tablas (p. ej.
+            solo las secciones que cambiaron). None = todas.
 
     Note:
         Usa DELETE en todas las tablas relacionadas para evitar duplicados.
@@ -509,10 +581,125 @@ def limpiar_datos_dispositivo_threadsafe(serial, conn):
     cur = conn.cursor()
 
     # Limpiar datos anteriores
-    cur.execute("DELETE FROM activo WHERE Dispositivos_serial = ?", (serial,))
-    cur.execute("DELETE FROM memoria WHERE Dispositivos_serial = ?", (serial,))
-    cur.execute("DELETE FROM almacenamiento WHERE Dispositivos_serial = ?", (serial,))
-    cur.execute("DELETE FROM aplicaciones WHERE Dispositivos_serial = ?", (serial,))
+    for tabla in (
+        "memoria",
+        "almacenamiento",
+        "aplicaciones",
+        "informacion_diagnostico",
+    ):
+        if tablas is None or tabla in tablas:
+            cur.execute(f"DELETE FROM {tabla} WHERE Dispositivos_serial = ?", (serial,))
+
+
+def getHuellasContenido(serial, conn=None):
+    """Obtiene los hashes de contenido guardados de un dispositivo.
+
+    Args:
+        serial (str): Serial del dispositivo
+        conn (sqlite3.Connection): Conexión opcional. Si None, usa la global.
+
+    Returns:
+        dict: {seccion: hash} (vacío si el dispositivo nunca envió datos)
+    """
+    cur = conn.cursor() if conn else cursor
+    cur.execute(
+        "SELECT seccion, hash FROM huellas_contenido WHERE Dispositivos_serial = ?",
+        (serial,),
+    )
+    return dict(cur.fetchall())
+
+
+def getEtagPorIp(ip, conn=None):
+    """Obtiene el último ETag informado por el daemon del dispositivo con esa IP.
+
+    Args:
+        ip (str): IP del dispositivo
+        conn (sqlite3.Connection): Conexión opcional. Si None, usa la global.
+
+    Returns:
+        str | None: ETag guardado, o None si el dispositivo nunca lo informó
+    """
+    cur = conn.cursor() if conn else cursor
     cur.execute(
-        "DELETE FROM informacion_diagnostico WHERE Dispositivos_serial = ?", (serial,)
+        """SELECT h.hash FROM huellas_contenido h
+           JOIN Dispositivos d ON d.serial = h.Dispositivos_serial
+           WHERE d.ip = ? AND h.seccion = 'etag'""",
+        (ip,),
+    )
+    fila = cur.fetchone()
+    return fila[0] if fila else None
+
+
+def setHuellasContenido(serial, huellas, fecha, conn=None):
+    """Guarda (UPSERT) los hashes de contenido de un dispositivo.
+
+    Args:
+        serial (str): Serial del dispositivo
+        huellas (dict): {seccion: hash} a guardar
+        fecha (str): Fecha ISO del envío que produjo los hashes
+        conn (sqlite3.Connection): Conexión opcional. Si None, usa la global.
+    """
+    cur = conn.cursor() if conn else cursor
+    cur.executemany(
+        """INSERT INTO huellas_contenido (Dispositivos_serial, seccion, hash, fecha)
+           VALUES (?,?,?,?)
+           ON CONFLICT(Dispositivos_serial, seccion) DO UPDATE SET
+               hash = excluded.hash,
+               fecha = excluded.fecha""",
+        [(serial, seccion, h, fecha) for seccion, h in huellas.items()],
     )
+
+
+def setHosts(hosts, conn=None):
+    """Registra (UPSERT por lotes) los hosts activos encontrados por el escaneo.
+
+    Args:
+        hosts (iterable): Tuplas (ip, mac, fecha, metodo, agente) con la IP como
+            entero, la MAC o None, la fecha ISO en que se vio el host, el método
+            que lo encontró (icmp, tcp, ssdp, ...) y si el puerto del agente
+            respondió (True/False, o None si no se sondeó)
+        conn (sqlite3.Connection): Conexión opcional. Si None, usa la global.
+
+    Note:
+        `first_seen` se conserva; la MAC y el estado del agente solo se pisan
+        con valores conocidos.
+    """
+    cur = conn.cursor() if conn else cursor
+    cur.executemany(
+        """INSERT INTO hosts
+               (ip, mac, first_seen, last_seen, last_method, agent_port_open)
+           VALUES (?1, ?2, ?3, ?3, ?4, ?5)
+           ON CONFLICT(ip) DO UPDATE SET
+               mac = COALESCE(excluded.mac, hosts.mac),
+               last_seen = excluded.last_seen,
+               last_method = excluded.last_method,
+               agent_port_open = COALESCE(
+                   excluded.agent_port_open, hosts.agent_port_open
+               )""",
+        hosts,
+    )
+
+
+def getHosts(desde=None, conn=None):
+    """Obtiene los hosts descubiertos, ordenados por IP.
+
+    Args:
+        desde (str): Fecha ISO opcional: solo los vistos desde entonces
+            (índice hosts_last_seen)
+        conn (sqlite3.Connection): Conexión opcional. Si None, usa la global.
+
+    Returns:
+        list: Tuplas (ip, mac, agent_port_open, last_seen) con la IP como entero
+    """
+    cur = conn.cursor() if conn else cursor
+    if desde is None:
+        cur.execute(
+            "SELECT ip, mac, agent_port_open, last_seen FROM hosts ORDER BY ip"
+        )
+    else:
+        cur.execute(
+            """SELECT ip, mac, agent_port_open, last_seen FROM hosts
+               WHERE last_seen >= ? ORDER BY ip""",
+            (desde,),
+        )
+    return cur.fetchall()
@@ -0,0 +1,210 @@
+"""Escritor único de la base de datos con commit agrupado (group commit).
+
+Todas las rutas de ingesta encolan sus operaciones de escritura en un hilo
+dedicado que es dueño de la única conexión de escritura. El hilo agrupa las
+operaciones de muchos dispositivos en una sola transacción (cada
+`DB_WRITER_BATCH_MS` ms o `DB_WRITER_BATCH_SIZE` operaciones), de modo que el
+costo de fsync se paga una vez por lote y no una vez por dispositivo, y
+desaparecen los errores "database is locked" entre escritores concurrentes.
+
+Uso:
+    from sql.escritor_db import obtener_escritor
+
+    futuro = obtener_escritor().enviar(sql.setActive, (serial, True, fecha))
+    futuro.result()  # bloquea hasta que el lote que la contiene hizo COMMIT
+
+Contrato de las operaciones:
+    - Se invocan como `operacion(*args, conn=conn, **kwargs)`, igual que las
+      funciones de `ejecutar_sql` que aceptan `conn`.
+    - NO deben llamar a `commit()`, `rollback()` ni `close()`.
+    - Cada operación corre dentro de un SAVEPOINT: si lanza una excepción solo
+      se deshacen sus cambios y el resto del lote se confirma igual.
+"""
+
+import sqlite3
+from atexit import register as atexit_register
+from concurrent.futures import Future
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import monotonic
+from typing import Callable, Optional
+
+from sql.ejecutar_sql import DB_PATH
+
+_FIN = object()  # Centinela de apagado
+
+
+class EscritorDB:
+    """Hilo escritor que consume una cola de operaciones y hace commit por lotes."""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_operaciones: Optional[int] = None,
+        intervalo_ms: Optional[float] = None,
+    ):
+        try:
+            from config.security_config import DB_WRITER_BATCH_SIZE, DB_WRITER_BATCH_MS
+        except ImportError:
+            DB_WRITER_BATCH_SIZE = 200
+            DB_WRITER_BATCH_MS = 50.0
+
+        self.db_path = db_path or DB_PATH
+        self.max_operaciones = max(1, max_operaciones or DB_WRITER_BATCH_SIZE)
+        self.intervalo = (intervalo_ms or DB_WRITER_BATCH_MS) / 1000.0
+
+        self._cola: Queue = Queue()
+        self._hilo: Optional[Thread] = None
+        self._lock = Lock()
+        self._activo = False
+
+        # Estadísticas acumuladas (operaciones / lotes = tamaño medio de lote)
+        self.estadisticas = {"operaciones": 0, "lotes": 0, "errores": 0}
+
+    # ------------------ CICLO DE VIDA ------------------
+    def iniciar(self):
+        """Arranca el hilo escritor (idempotente)."""
+        with self._lock:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._activo = True
+            self._hilo = Thread(target=self._bucle, name="escritor-db", daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout: Optional[float] = 10.0):
+        """Procesa lo ya encolado, confirma el último lote y termina el hilo."""
+        with self._lock:
+            if not self._activo:
+                return
+            self._activo = False
+            self._cola.put(_FIN)
+        if self._hilo:
+            self._hilo.join(timeout)
+
+    # ------------------ API PÚBLICA ------------------
+    def enviar(self, operacion: Callable, *args, **kwargs) -> Future:
+        """Encola una operación de escritura.
+
+        Returns:
+            concurrent.futures.Future: Se resuelve con el valor de retorno de
+            la operación cuando su lote hizo COMMIT (o con su excepción).
+
+        Raises:
+            RuntimeError: Si el escritor no está en ejecución
+        """
+        if not self._activo:
+            raise RuntimeError("EscritorDB no está en ejecución")
+        futuro: Future = Future()
+        self._cola.put((operacion, args, kwargs, futuro))
+        return futuro
+
+    def ejecutar(self, operacion: Callable, *args, **kwargs):
+        """Encola una operación y espera su confirmación (uso desde hilos)."""
+        return self.enviar(operacion, *args, **kwargs).result()
+
+    # ------------------ HILO ESCRITOR ------------------
+    def _bucle(self):
+        # isolation_level=None: las transacciones se controlan explícitamente
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False
+        )
+        try:
+            # WAL: los lectores (UI, exportación) no bloquean al escritor
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+        except sqlite3.Error as e:
+            print(f"[EscritorDB] No se pudo configurar la conexión: {e}")
+
+        try:
+            while True:
+                lote, fin = self._tomar_lote()
+                if lote:
+                    self._ejecutar_lote(conn, lote)
+                if fin:
+                    break
+        finally:
+            conn.close()
+
+    def _tomar_lote(self):
+        """Bloquea hasta la primera operación y agrupa las que lleguen después.
+
+        Returns:
+            tuple: (lista de operaciones, True si se solicitó el apagado)
+        """
+        primero = self._cola.get()
+        if primero is _FIN:
+            return [], True
+
+        lote = [primero]
+        limite = monotonic() + self.intervalo
+        while len(lote) < self.max_operaciones:
+            restante = limite - monotonic()
+            try:
+                item = (
+                    self._cola.get(timeout=restante)
+                    if restante > 0
+                    else self._cola.get_nowait()
+                )
+            except Empty:
+                break
+            if item is _FIN:
+                return lote, True
+            lote.append(item)
+        return lote, False
+
+    def _ejecutar_lote(self, conn, lote):
+        """Ejecuta el lote en una transacción y resuelve los futures tras el COMMIT."""
+        cur = conn.cursor()
+        resultados = []
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for operacion, args, kwargs, futuro in lote:
+                if not futuro.set_running_or_notify_cancel():
+                    continue  # Cancelado por el llamador antes de ejecutarse
+
+                cur.execute("SAVEPOINT operacion")
+                try:
+                    valor = operacion(*args, conn=conn, **kwargs)
+                    cur.execute("RELEASE operacion")
+                    resultados.append((futuro, valor, None))
+                except Exception as e:
+                    cur.execute("ROLLBACK TO operacion")
+                    cur.execute("RELEASE operacion")
+                    resultados.append((futuro, None, e))
+            cur.execute("COMMIT")
+        except Exception as e:
+            # Falla del lote completo (BEGIN/COMMIT): ninguna operación quedó escrita
+            print(f"[EscritorDB] Error confirmando lote de {len(lote)} operaciones: {e}")
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            self.estadisticas["errores"] += len(lote)
+            for _, _, _, futuro in lote:
+                if futuro.running():
+                    futuro.set_exception(e)
+            return
+
+        self.estadisticas["lotes"] += 1
+        self.estadisticas["operaciones"] += len(resultados)
+        for futuro, valor, error in resultados:
+            if error is not None:
+                self.estadisticas["errores"] += 1
+                futuro.set_exception(error)
+            else:
+                futuro.set_result(valor)
+
+
+_escritor: Optional[EscritorDB] = None
+_escritor_lock = Lock()
+
+
+def obtener_escritor() -> EscritorDB:
+    """Devuelve el escritor compartido del proceso, iniciándolo si hace falta."""
+    global _escritor
+    with _escritor_lock:
+        if _escritor is None:
+            _escritor = EscritorDB()
+            _escritor.iniciar()
+            atexit_register(_escritor.detener)
+    return _escritor
@@ -91,3 +91,51 @@ CREATE TABLE registro_cambios(
     FOREIGN KEY ("Dispositivos_serial") REFERENCES "Dispositivos" (serial)
 );
 
+
+CREATE TABLE IF NOT EXISTS huellas_contenido(
+  "Dispositivos_serial" VARCHAR NOT NULL,
+  seccion VARCHAR NOT NULL,
+  hash VARCHAR NOT NULL,
+  fecha DATETIME,
+  PRIMARY KEY("Dispositivos_serial", seccion),
+  CONSTRAINT serial_huellas_contenido
+    FOREIGN KEY ("Dispositivos_serial") REFERENCES "Dispositivos" (serial)
+);
+
+
+CREATE TABLE IF NOT EXISTS device_state(
+  "Dispositivos_serial" VARCHAR NOT NULL,
+  "powerOn" BOOLEAN,
+  last_change DATETIME,
+  last_checked DATETIME,
+  PRIMARY KEY("Dispositivos_serial"),
+  CONSTRAINT serial_device_state
+    FOREIGN KEY ("Dispositivos_serial") REFERENCES "Dispositivos" (serial)
+);
+
+
+CREATE TABLE IF NOT EXISTS device_state_transitions(
+  id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+  "Dispositivos_serial" VARCHAR NOT NULL,
+  "powerOn" BOOLEAN,
+  date DATETIME,
+  CONSTRAINT serial_device_state_transitions
+    FOREIGN KEY ("Dispositivos_serial") REFERENCES "Dispositivos" (serial)
+);
+
+
+CREATE INDEX IF NOT EXISTS device_state_transitions_serial_date
+  ON device_state_transitions("Dispositivos_serial", date);
+
+
+CREATE TABLE IF NOT EXISTS hosts(
+  ip INTEGER PRIMARY KEY NOT NULL,
+  mac VARCHAR,
+  first_seen DATETIME,
+  last_seen DATETIME,
+  last_method VARCHAR,
+  agent_port_open BOOLEAN
+);
+
+
+CREATE INDEX IF NOT EXISTS hosts_last_seen ON hosts(last_seen);
@@ -0,0 +1,79 @@
+"""EscritorDB: commit agrupado con un SAVEPOINT por operación."""
+
+import sqlite3
+from pathlib import Path
+from sys import path
+
+import pytest
+
+# Agregar src/ al path de Python (igual que run_servidor.py)
+path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from sql.escritor_db import EscritorDB  # noqa: E402
+
+
+class OperacionFallida(Exception):
+    pass
+
+
+def crear_tabla(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS t (valor TEXT)")
+
+
+def insertar(valor, conn):
+    conn.execute("INSERT INTO t (valor) VALUES (?)", (valor,))
+    return valor
+
+
+def insertar_y_fallar(valor, conn):
+    conn.execute("INSERT INTO t (valor) VALUES (?)", (valor,))
+    raise OperacionFallida(valor)
+
+
+@pytest.fixture
+def escritor(tmp_path):
+    # Ventana larga: las operaciones enviadas juntas caen en el mismo lote
+    escritor = EscritorDB(tmp_path / "test.db", max_operaciones=100, intervalo_ms=300)
+    escritor.iniciar()
+    escritor.ejecutar(crear_tabla)
+    yield escritor
+    escritor.detener()
+
+
+def valores(escritor):
+    with sqlite3.connect(escritor.db_path) as conn:
+        return sorted(v for (v,) in conn.execute("SELECT valor FROM t"))
+
+
+def test_falla_deshace_solo_su_savepoint(escritor):
+    lotes = escritor.estadisticas["lotes"]
+    futuros = [
+        escritor.enviar(insertar, "a"),
+        escritor.enviar(insertar_y_fallar, "b"),
+        escritor.enviar(insertar, "c"),
+    ]
+
+    assert futuros[0].result(5) == "a"
+    with pytest.raises(OperacionFallida):
+        futuros[1].result(5)
+    assert futuros[2].result(5) == "c"
+
+    assert escritor.estadisticas["lotes"] == lotes + 1  # Un solo COMMIT
+    assert escritor.estadisticas["errores"] == 1
+    assert valores(escritor) == ["a", "c"]
+
+
+def test_ejecutar_propaga_la_excepcion(escritor):
+    with pytest.raises(OperacionFallida, match="x"):
+        escritor.ejecutar(insertar_y_fallar, "x")
+    assert escritor.ejecutar(insertar, "y") == "y"
+    assert valores(escritor) == ["y"]
+
+
+def test_detener_confirma_lo_encolado(escritor):
+    futuros = [escritor.enviar(insertar, str(i)) for i in range(50)]
+    escritor.detener()
+    assert [f.result(0) for f in futuros] == [str(i) for i in range(50)]
+    assert len(valores(escritor)) == 50
+    with pytest.raises(RuntimeError):
+        escritor.enviar(insertar, "tarde")
@@ -0,0 +1,65 @@
+"""Monitor periódico: una pasada con dispositivos activos por latido.
+
+Los estados por latido no traen RTT (no se les hizo ping); la pasada debe
+imprimirlos y guardarlos igual, sin cortarse antes de la transacción.
+"""
+
+from os import environ
+from pathlib import Path
+from sys import path
+from threading import Event
+
+import pytest
+
+# Agregar src/ al path de Python (igual que run_servidor.py)
+path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+# logica_servidor crea la QApplication al importarse
+pytest.importorskip("PySide6")
+environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from logica import estado_conexion  # noqa: E402
+from logica import logica_servidor as servidor  # noqa: E402
+
+DISPOSITIVOS = [("SERIAL-1", "10.9.8.7")]
+
+
+class EscritorFalso:
+    """Registra las operaciones en lugar de escribirlas en la DB."""
+
+    def __init__(self):
+        self.operaciones = []
+
+    def ejecutar(self, operacion, *args):
+        self.operaciones.append((operacion, args))
+        return 0
+
+
+def test_pasada_con_latido_guarda_estados(monkeypatch):
+    servicio = estado_conexion.ServicioEstadoConexion()
+    servicio.registrar_latido("10.9.8.7")
+    escritor = EscritorFalso()
+    monkeypatch.setattr(estado_conexion, "_servicio", servicio)
+    monkeypatch.setattr(
+        servidor, "obtener_dispositivos_monitoreo", lambda: DISPOSITIVOS
+    )
+    monkeypatch.setattr(servidor, "obtener_escritor", lambda: escritor)
+
+    detener = Event()
+    metricas = servidor.monitorear_dispositivos_periodicamente(
+        intervalo_minutos=1,
+        callback_progreso=lambda ip, total, i: detener.set(),
+        detener=detener,
+    )
+
+    assert metricas["pasadas"] == 1
+    assert escritor.operaciones == [
+        (servidor.registrar_estados, ([("SERIAL-1", True)],))
+    ]
+    assert servicio.estadisticas["por_latido"] == 1
+
+
+@pytest.mark.parametrize("intervalo", [0, -1])
+def test_intervalo_no_positivo_se_rechaza(intervalo):
+    with pytest.raises(ValueError):
+        servidor.monitorear_dispositivos_periodicamente(intervalo_minutos=intervalo)
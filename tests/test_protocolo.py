@@ -0,0 +1,195 @@
+"""Framing por longitud, compresión acotada y solicitudes al daemon."""
+
+import asyncio
+import zlib
+from json import dumps
+from pathlib import Path
+from socket import socketpair
+from sys import path
+from threading import Thread
+
+import pytest
+
+# Agregar src/ al path de Python (igual que run_servidor.py)
+path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from logica.protocolo import (  # noqa: E402
+    CAPACIDADES,
+    COMPRESION_ZLIB,
+    MAGIC,
+    TAMANO_CABECERA,
+    ErrorProtocolo,
+    capacidades_anunciadas,
+    codificar_json,
+    decodificar_payload,
+    descomprimir,
+    desempaquetar_cabecera,
+    empaquetar,
+    formatear_solicitud,
+    leer_mensaje,
+    parsear_solicitud,
+    recibir_mensaje,
+)
+
+MAXIMO = 64 * 1024
+DATOS = {"SerialNumber": "ABC123", "MAC Address": "00:11:22:33:44:55", "n": 1}
+
+
+def recibir_sync(datos: bytes, max_bytes=MAXIMO):
+    """Envía `datos` por un socketpair, cierra y lee con `recibir_mensaje`."""
+    emisor, receptor = socketpair()
+
+    def enviar():
+        # En un hilo: el buffer del socket puede ser menor que `datos`
+        with emisor:
+            try:
+                emisor.sendall(datos)
+            except OSError:
+                pass  # El receptor rechazó el mensaje y cerró antes
+
+    hilo = Thread(target=enviar)
+    hilo.start()
+    try:
+        with receptor:
+            return recibir_mensaje(receptor, max_bytes)
+    finally:
+        hilo.join()
+
+
+def leer_async(datos: bytes, max_bytes=MAXIMO):
+    """Alimenta un StreamReader con `datos` + EOF y lee con `leer_mensaje`."""
+
+    async def leer():
+        reader = asyncio.StreamReader()
+        reader.feed_data(datos)
+        reader.feed_eof()
+        return await leer_mensaje(reader, max_bytes)
+
+    return asyncio.run(leer())
+
+
+LECTORES = [recibir_sync, leer_async]
+
+
+# ------------------ IDA Y VUELTA ------------------
+@pytest.mark.parametrize("leer", LECTORES)
+@pytest.mark.parametrize("compresion", [0, COMPRESION_ZLIB])
+def test_ida_y_vuelta(leer, compresion):
+    datos = {**DATOS, "relleno": "x" * 4096}  # Comprimible
+    cabecera, payload = leer(codificar_json(datos, compresion))
+    assert cabecera.compresion == compresion
+    assert cabecera.longitud == len(payload)
+    assert decodificar_payload(cabecera, payload, MAXIMO) == datos
+
+
+@pytest.mark.parametrize("leer", LECTORES)
+def test_payload_vacio(leer):
+    cabecera, payload = leer(empaquetar(b""))
+    assert cabecera.longitud == 0 and payload == b""
+
+
+@pytest.mark.parametrize("leer", LECTORES)
+def test_cliente_legacy_sin_framing(leer):
+    crudo = dumps(DATOS).encode("utf-8")
+    cabecera, payload = leer(crudo)
+    assert cabecera is None
+    assert decodificar_payload(cabecera, payload) == DATOS
+
+
+def test_conexion_cerrada_sin_datos_async():
+    assert leer_async(b"") == (None, b"")
+
+
+# ------------------ MENSAJES INVÁLIDOS ------------------
+@pytest.mark.parametrize("leer", LECTORES)
+def test_cabecera_truncada(leer):
+    with pytest.raises(ErrorProtocolo):
+        leer(empaquetar(b"{}")[: TAMANO_CABECERA - 3])
+
+
+@pytest.mark.parametrize("leer", LECTORES)
+def test_payload_truncado(leer):
+    with pytest.raises(ErrorProtocolo):
+        leer(empaquetar(dumps(DATOS).encode("utf-8"))[:-5])
+
+
+def test_magic_invalido():
+    mensaje = b"XXXX" + empaquetar(b"{}")[len(MAGIC) :]
+    with pytest.raises(ErrorProtocolo, match="Magic"):
+        desempaquetar_cabecera(mensaje[:TAMANO_CABECERA], MAXIMO)
+
+
+@pytest.mark.parametrize("leer", LECTORES)
+def test_magic_invalido_no_es_json(leer):
+    # Sin el magic se lee como cliente legacy; la decodificación lo rechaza
+    cabecera, payload = leer(b"XXXX" + empaquetar(b"{}")[len(MAGIC) :])
+    assert cabecera is None
+    with pytest.raises(ErrorProtocolo):
+        decodificar_payload(cabecera, payload)
+
+
+@pytest.mark.parametrize("leer", LECTORES)
+def test_longitud_declarada_excesiva(leer):
+    # Solo la cabecera: se rechaza antes de leer (o reservar) el payload
+    cabecera = empaquetar(b"x" * (MAXIMO + 1))[:TAMANO_CABECERA]
+    with pytest.raises(ErrorProtocolo, match="excede"):
+        leer(cabecera)
+
+
+@pytest.mark.parametrize("leer", LECTORES)
+def test_legacy_excesivo(leer):
+    with pytest.raises(ErrorProtocolo, match="excede"):
+        leer(b"{" + b" " * MAXIMO + b"}")
+
+
+# ------------------ DESCOMPRESIÓN ACOTADA ------------------
+def test_bomba_zlib_se_corta_en_el_limite():
+    bomba = zlib.compress(b"\0" * (50 * 1024 * 1024), 9)
+    assert len(bomba) < MAXIMO  # Pasa el límite del framing...
+    with pytest.raises(ErrorProtocolo, match="excede"):
+        descomprimir(bomba, COMPRESION_ZLIB, MAXIMO)  # ...pero no se expande
+
+
+def test_bomba_zlib_en_un_mensaje():
+    bomba = zlib.compress(dumps({"x": "a" * (MAXIMO * 4)}).encode("utf-8"), 9)
+    cabecera, payload = recibir_sync(empaquetar(bomba, compresion=COMPRESION_ZLIB))
+    with pytest.raises(ErrorProtocolo, match="excede"):
+        decodificar_payload(cabecera, payload, MAXIMO)
+
+
+def test_descomprimir_justo_en_el_limite():
+    datos = b"a" * MAXIMO
+    assert descomprimir(zlib.compress(datos), COMPRESION_ZLIB, MAXIMO) == datos
+
+
+def test_zlib_truncado_o_corrupto():
+    comprimido = zlib.compress(b"a" * 1000)
+    with pytest.raises(ErrorProtocolo):
+        descomprimir(comprimido[:-4], COMPRESION_ZLIB, MAXIMO)
+    with pytest.raises(ErrorProtocolo):
+        descomprimir(b"no es zlib", COMPRESION_ZLIB, MAXIMO)
+
+
+# ------------------ SOLICITUDES AL DAEMON ------------------
+def test_solicitud_sin_opciones_es_el_comando_antiguo():
+    assert formatear_solicitud("GET_SPECS") == b"GET_SPECS"
+
+
+def test_solicitud_ida_y_vuelta():
+    texto = formatear_solicitud(
+        "GET_SPECS_IF_CHANGED", ["zstd", "zlib"], ["abc123"], "tls"
+    ).decode("utf-8")
+    solicitud = parsear_solicitud(texto)
+    assert solicitud.comando == "GET_SPECS_IF_CHANGED"
+    assert solicitud.argumentos == ["abc123"]
+    assert solicitud.aceptadas == ["zstd", "zlib"]
+    assert solicitud.respuesta == "tls"
+
+
+def test_capacidades_anunciadas():
+    assert capacidades_anunciadas({"caps": list(CAPACIDADES)}) == set(CAPACIDADES)
+    assert capacidades_anunciadas({"caps": ["reply", "desconocida"]}) == {"reply"}
+    # Daemons antiguos (sin "caps") o valores inválidos: ninguna
+    assert capacidades_anunciadas({"serial": "X"}) == frozenset()
+    assert capacidades_anunciadas({"caps": "reply"}) == frozenset()
+    assert capacidades_anunciadas(None) == frozenset()
@@ -0,0 +1,155 @@
+"""Regresión: cancelar un escaneo y reanudarlo no debe perder hosts activos.
+
+Si la sonda convierte la cancelación en "sin respuesta" (como `ping_rtt` cuando
+`wait_for` la transforma en TimeoutError), los hosts cortados a mitad de la
+sonda no pueden quedar en el checkpoint como barridos e inactivos.
+"""
+
+import asyncio
+from os import environ
+from pathlib import Path
+from sys import path
+
+# Agregar src/ al path de Python (igual que run_servidor.py)
+path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from logica import optimized_block_scanner as scan  # noqa: E402
+from logica.async_utils import ventana_deslizante  # noqa: E402
+from logica.checkpoint_escaneo import leer_checkpoint  # noqa: E402
+
+RANGOS = ["10.0.0.1-10.0.15.254"]  # 4094 hosts, todos "activos" en la sonda falsa
+RANGOS_REPARTIDOS = ["10.0.0.1-10.0.63.254"]  # 16382 hosts
+
+
+async def sonda_que_traga_cancelacion(ip, per_host_timeout):
+    try:
+        await asyncio.sleep(0.02)
+        return 1.0
+    except asyncio.CancelledError:
+        return None
+
+
+def barrer_con_sonda_falsa(indice, intervalos, textos, opciones):
+    """Tarea de los procesos del pool ("spawn"): instala la sonda falsa en el hijo
+    y anota cuántos hosts barrió (todos son activos en la sonda falsa)."""
+    scan.ping_rtt = sonda_que_traga_cancelacion
+    barridos = scan._barrer_fragmento(indice, intervalos, textos, opciones)
+    conteos = Path(environ["CONTEOS_SWEEP"])
+    (conteos / f"fragmento-{indice}").write_text(str(barridos))
+    return barridos
+
+
+def test_ventana_no_informa_trabajos_cancelados():
+    completados = []
+    tomados = []
+
+    def elementos():
+        for i in range(10_000):
+            tomados.append(i)
+            yield i
+
+    async def trabajo(i):
+        try:
+            await asyncio.sleep(0.02)
+            return True
+        except asyncio.CancelledError:
+            return False
+
+    async def cortar():
+        tarea = asyncio.ensure_future(
+            ventana_deslizante(
+                elementos(), trabajo, 50, lambda i, r: completados.append(r)
+            )
+        )
+        await asyncio.sleep(0.1)
+        tarea.cancel()
+        try:
+            await tarea
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cortar())
+    assert completados and all(completados)
+    assert len(tomados) < 10_000  # Los workers no vaciaron el iterador
+
+
+def test_cancelar_y_reanudar_no_pierde_activos(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan, "ping_rtt", sonda_que_traga_cancelacion)
+    monkeypatch.setattr(scan, "get_local_supernet", lambda: None)
+    ruta = tmp_path / "scan_checkpoint.json"
+    opciones = dict(
+        chunk_size=256,
+        per_host_timeout=1.0,
+        per_subnet_timeout=60.0,
+        concurrency=200,
+        probe_timeout=0.3,
+        use_broadcast_probe=False,
+        ruta_checkpoint=ruta,
+    )
+
+    async def cortar():
+        tarea = asyncio.ensure_future(scan.scan_blocks(RANGOS, **opciones))
+        await asyncio.sleep(0.2)
+        tarea.cancel()
+        try:
+            await tarea
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cortar())
+    datos = leer_checkpoint(ruta)
+    barridos = sum(fin - inicio + 1 for inicio, fin in datos["completados"])
+    assert 0 < barridos < 4094
+    assert barridos == len(datos["activos"])  # Nada cortado quedó como inactivo
+
+    alive = asyncio.run(scan.scan_blocks(RANGOS, reanudar=True, **opciones))
+    assert len(alive) == 4094
+
+
+def test_cancelar_y_reanudar_repartido_no_pierde_activos(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan, "_barrer_fragmento", barrer_con_sonda_falsa)
+    monkeypatch.setattr(scan, "SCAN_SHARD_MIN_HOSTS", 0)
+    monkeypatch.setattr(scan, "get_local_supernet", lambda: None)
+    monkeypatch.setenv("CONTEOS_SWEEP", str(tmp_path))  # Lo heredan los procesos
+    ruta = tmp_path / "scan_checkpoint.json"
+    opciones = dict(
+        chunk_size=256,
+        per_host_timeout=1.0,
+        per_subnet_timeout=60.0,
+        concurrency=40,
+        probe_timeout=0.3,
+        use_broadcast_probe=False,
+        workers=2,
+        ruta_checkpoint=ruta,
+    )
+
+    async def cortar():
+        avanzo = asyncio.Event()
+        tarea = asyncio.ensure_future(
+            scan.scan_blocks(
+                RANGOS_REPARTIDOS,
+                callback_progreso=lambda datos: datos.get("hechos") and avanzo.set(),
+                **opciones,
+            )
+        )
+        # Cortar con los procesos ya barriendo (arrancarlos lleva un rato)
+        await asyncio.wait_for(avanzo.wait(), timeout=60)
+        await asyncio.sleep(0.2)
+        tarea.cancel()
+        try:
+            await tarea
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cortar())
+    datos = leer_checkpoint(ruta)
+    barridos = sum(fin - inicio + 1 for inicio, fin in datos["completados"])
+    en_procesos = sum(int(p.read_text()) for p in tmp_path.glob("fragmento-*"))
+    assert 0 < barridos < 16382
+    assert barridos == len(datos["activos"])
+    assert barridos == en_procesos  # Ningún avance se perdió al cortar
+
+    alive = asyncio.run(
+        scan.scan_blocks(RANGOS_REPARTIDOS, reanudar=True, **opciones)
+    )
+    assert len(alive) == 16382
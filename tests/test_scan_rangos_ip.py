@@ -0,0 +1,136 @@
+"""ConjuntoIPs: rangos exactos, fusiones, recortes y reparto entre procesos."""
+
+from pathlib import Path
+from sys import path
+
+import pytest
+
+# Agregar src/ al path de Python (igual que run_servidor.py)
+path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from logica.scan_rangos_ip import (  # noqa: E402
+    ConjuntoIPs,
+    entero_a_ip,
+    ip_a_entero,
+)
+
+
+def conjunto(*textos):
+    return ConjuntoIPs.desde_textos(textos)
+
+
+def intervalo(inicio, fin):
+    return ip_a_entero(inicio), ip_a_entero(fin)
+
+
+def test_rango_inicio_fin_que_no_es_potencia_de_dos():
+    rangos = conjunto("10.0.0.3-10.0.1.9")
+    assert len(rangos) == 263
+    assert list(rangos)[0] == "10.0.0.3"
+    assert list(rangos)[-1] == "10.0.1.9"
+    # Los bloques CIDR cubren exactamente el rango, sin sobrantes
+    assert sum(b.num_addresses for b in rangos.bloques()) == 263
+    assert [str(b) for b in rangos.bloques()][:2] == ["10.0.0.3/32", "10.0.0.4/30"]
+
+
+def test_cidr_excluye_red_y_broadcast():
+    rangos = conjunto("192.168.5.0/24")
+    assert len(rangos) == 254
+    assert "192.168.5.0" not in rangos
+    assert "192.168.5.255" not in rangos
+    assert rangos.intervalos == [intervalo("192.168.5.1", "192.168.5.254")]
+    # /31 y /32 no tienen red ni broadcast que descartar
+    assert len(conjunto("192.168.5.0/31")) == 2
+    assert len(conjunto("192.168.5.7/32")) == 1
+
+
+def test_rango_invertido_es_invalido():
+    with pytest.raises(ValueError):
+        conjunto("10.0.0.9-10.0.0.1")
+
+
+def test_fusiona_solapados_y_contiguos():
+    rangos = conjunto(
+        "10.0.0.100-10.0.0.120",
+        "10.0.0.110-10.0.0.130",  # Solapado
+        "10.0.0.131-10.0.0.140",  # Contiguo
+        "10.0.0.142",  # Separado por un hueco de una IP
+    )
+    assert rangos.textos() == ["10.0.0.100-10.0.0.140", "10.0.0.142"]
+    assert len(rangos) == 42
+    # Cada IP pedida se recorre una sola vez
+    assert len(list(rangos)) == len(set(rangos)) == 42
+
+
+def test_fusiona_cidr_con_rango_contenido():
+    rangos = conjunto("10.100.1.100-10.100.1.120", "10.100.1.0/24")
+    assert rangos.textos() == ["10.100.1.1-10.100.1.254"]
+
+
+def test_agregar_une_vecinos():
+    rangos = conjunto("10.0.0.1-10.0.0.3", "10.0.0.5-10.0.0.7")
+    rangos.agregar(ip_a_entero("10.0.0.4"))
+    assert rangos.textos() == ["10.0.0.1-10.0.0.7"]
+    rangos.agregar(ip_a_entero("10.0.0.5"))  # Ya presente: sin cambios
+    assert rangos.textos() == ["10.0.0.1-10.0.0.7"]
+
+
+def test_recortar_en_los_bordes():
+    rangos = conjunto("10.0.0.10-10.0.0.20", "10.0.0.30-10.0.0.40")
+    a = ip_a_entero
+
+    assert rangos.recortar(a("10.0.0.20"), a("10.0.0.30")).textos() == [
+        "10.0.0.20",
+        "10.0.0.30",
+    ]
+    assert rangos.recortar(a("10.0.0.21"), a("10.0.0.29")).intervalos == []
+    assert rangos.recortar(a("10.0.0.0"), a("10.0.0.10")).textos() == ["10.0.0.10"]
+    assert rangos.recortar(a("10.0.0.40"), a("10.0.0.255")).textos() == ["10.0.0.40"]
+    assert rangos.recortar(a("10.0.0.0"), a("10.0.0.255")).intervalos == (
+        rangos.intervalos
+    )
+
+
+def test_restar_en_los_bordes():
+    rangos = conjunto("10.0.0.10-10.0.0.20")
+
+    assert rangos.restar(conjunto("10.0.0.10")).textos() == ["10.0.0.11-10.0.0.20"]
+    assert rangos.restar(conjunto("10.0.0.20")).textos() == ["10.0.0.10-10.0.0.19"]
+    assert rangos.restar(conjunto("10.0.0.15")).textos() == [
+        "10.0.0.10-10.0.0.14",
+        "10.0.0.16-10.0.0.20",
+    ]
+    # Lo que cae fuera del conjunto no resta nada
+    assert rangos.restar(conjunto("10.0.0.0-10.0.0.9")).intervalos == (
+        rangos.intervalos
+    )
+    assert not rangos.restar(conjunto("10.0.0.0-10.0.0.255"))
+    assert rangos.restar(ConjuntoIPs()).intervalos == rangos.intervalos
+
+
+@pytest.mark.parametrize("partes", [1, 2, 3, 7, 64])
+def test_repartir_cubre_cada_direccion_una_vez(partes):
+    rangos = conjunto("10.0.0.3-10.0.1.9", "10.0.2.0/28", "10.0.5.77")
+    fragmentos = rangos.repartir(partes)
+
+    assert len(fragmentos) == partes
+    direcciones = [ip for fragmento in fragmentos for ip in fragmento]
+    assert direcciones == list(rangos)  # Contiguos, en orden y sin repetidos
+    tamanos = [len(fragmento) for fragmento in fragmentos]
+    assert max(tamanos) - min(tamanos) <= 1  # Parejos
+
+
+def test_repartir_en_mas_partes_que_direcciones():
+    rangos = conjunto("10.0.0.1-10.0.0.3")
+    fragmentos = rangos.repartir(8)
+    assert [f.textos() for f in fragmentos] == [
+        ["10.0.0.1"],
+        ["10.0.0.2"],
+        ["10.0.0.3"],
+    ]
+    assert ConjuntoIPs().repartir(4) == []
+
+
+def test_enteros_y_textos_son_inversos():
+    for ip in ["0.0.0.0", "10.0.0.1", "255.255.255.255"]:
+        assert entero_a_ip(ip_a_entero(ip)) == ip